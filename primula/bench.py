@@ -0,0 +1,168 @@
+#
+# primula.bench
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+import array
+from collections.abc import Iterable, Sequence
+import dataclasses
+import json
+import math
+import statistics
+from typing import Any, IO
+
+from . import core
+from ._typing import Path
+
+
+__all__ = ['STATS', 'Bench', 'aggregate', 'is_bench', 'load', 'dump']
+
+STATS = ('min', 'median', 'p95', 'mean', 'stddev')
+
+_FORMAT = 'primula-bench'
+_VERSION = 1
+
+
+@dataclasses.dataclass
+class Bench:
+
+    runs: int
+    # blocks of scripts and functions with statistics of their times
+    scripts: list[dict[str, Any]] = dataclasses.field(default_factory=list)
+    functions: list[dict[str, Any]] = dataclasses.field(default_factory=list)
+
+    def profile(self, stat: str = 'median', mapping: bool = True, path: Path = '') -> core.Profile:
+        i = STATS.index(stat)
+        scripts = []
+        for b in self.scripts:
+            scripts.append(core.Script(b['path'], b['sourced'], b['total_time'][i], b['self_time'][i], lines=_lines(b, stat)))
+        functions = []
+        for b in self.functions:
+            f = core.Function(b['name'], b['called'], _stat(b['total_time'], i), _stat(b['self_time'], i), lines=_lines(b, stat))
+            f.defined = (b['defined'][0], b['defined'][1]) if b['defined'] else None
+            functions.append(f)
+        p = core.Profile._new(path, scripts, functions)
+        if mapping:
+            p._map_all()
+        return p
+
+
+def aggregate(profiles: Sequence[core.Profile]) -> Bench:
+    # profiles must be unmapped
+    n = len(profiles)
+    scripts: dict[str, list[core.Script | None]] = {}
+    functions: dict[tuple[str | int | None, ...], list[core.Function | None]] = {}
+    for i, p in enumerate(profiles):
+        # functions which are defined more than once in a run
+        p = core.merge_profiles([p])
+        for s in p.scripts.values():
+            scripts.setdefault(s.path, [None] * n)[i] = s
+        for f in p.functions:
+            functions.setdefault(core._function_key(f), [None] * n)[i] = f
+
+    bench = Bench(n)
+    for path, ss in scripts.items():
+        b = _block([s.lines if s else None for s in ss], f'SCRIPT  {path}')
+        b.update(path=path,
+                 sourced=_count(s.sourced if s else 0 for s in ss),
+                 total_time=_stats([s.total_time if s else 0.0 for s in ss]),
+                 self_time=_stats([s.self_time if s else 0.0 for s in ss]))
+        bench.scripts.append(b)
+    for fs in functions.values():
+        f = next(f for f in fs if f)
+        b = _block([f.lines if f else None for f in fs], f'FUNCTION  {f.name}')
+        b.update(name=f.name,
+                 defined=f.defined,
+                 called=_count(f.called if f else 0 for f in fs),
+                 total_time=_stats([f.total_time or 0.0 if f else 0.0 for f in fs]) if any(f and f.total_time is not None for f in fs) else None,
+                 self_time=_stats([f.self_time or 0.0 if f else 0.0 for f in fs]) if any(f and f.self_time is not None for f in fs) else None)
+        bench.functions.append(b)
+    return bench
+
+
+def is_bench(path: Path) -> bool:
+    # profiles start with SCRIPT or FUNCTION
+    with open(path, 'rb') as fp:
+        return fp.read(1) == b'{'
+
+
+def load(path: Path) -> Bench:
+    with open(path, encoding='utf-8') as fp:
+        data = json.load(fp)
+    if (not isinstance(data, dict)
+        or data.get('format') != _FORMAT
+        or data.get('version') != _VERSION):
+        raise ValueError(f'not a bench file: {path}')
+    return Bench(data['runs'], data['scripts'], data['functions'])
+
+
+def dump(bench: Bench, fp: IO[str]) -> None:
+    json.dump({'format': _FORMAT, 'version': _VERSION, 'stats': STATS, **dataclasses.asdict(bench)}, fp, separators=(',', ':'))
+    fp.write('\n')
+
+
+def _block(lines: list[core.Lines | None], name: str) -> dict[str, Any]:
+    text = next(l for l in lines if l is not None).text
+    if any(l is not None and l.text != text for l in lines):
+        raise ValueError(f'lines are mismatched: {name}')
+    counts = []
+    total_times: list[list[int]] = [[] for _ in STATS]
+    self_times: list[list[int]] = [[] for _ in STATS]
+    for i in range(len(text)):
+        v = [l.counts[i] if l is not None else core._NONE for l in lines]
+        if all(c == core._NONE for c in v):
+            counts.append(core._NONE)
+            for a in (*total_times, *self_times):
+                a.append(core._NONE)
+            continue
+        counts.append(_count(max(c, 0) for c in v))
+        for stats, times in ((total_times, [_total(l, i) for l in lines]), (self_times, [_self(l, i) for l in lines])):
+            for a, t in zip(stats, _stats(times)):
+                a.append(round(t))
+    return {
+        'text': text,
+        'counts': counts,
+        'total_times': dict(zip(STATS, total_times)),
+        'self_times': dict(zip(STATS, self_times)),
+    }
+
+
+def _stats(v: Sequence[float]) -> list[float]:
+    # runs where blocks or lines were not executed take 0
+    v = sorted(v)
+    mean = statistics.fmean(v)
+    return [v[0], statistics.median(v), v[math.ceil(len(v) * 0.95) - 1], mean, statistics.stdev(v, mean) if len(v) > 1 else 0.0]
+
+
+def _count(v: Iterable[int]) -> int:
+    return round(statistics.median(list(v)))
+
+
+def _total(lines: core.Lines | None, i: int) -> int:
+    # total time is omitted when it equals to self time
+    if lines is None:
+        return 0
+    elif (t := lines.total_times[i]) == core._NONE:
+        return max(lines.self_times[i], 0)
+    return t
+
+
+def _self(lines: core.Lines | None, i: int) -> int:
+    return max(lines.self_times[i], 0) if lines is not None else 0
+
+
+def _stat(v: list[float] | None, i: int) -> float | None:
+    return v[i] if v is not None else None
+
+
+def _lines(block: dict[str, Any], stat: str) -> core.Lines:
+    lines = core.Lines()
+    lines.counts = array.array('q', block['counts'])
+    lines.total_times = array.array('q', block['total_times'][stat])
+    lines.self_times = array.array('q', block['self_times'][stat])
+    lines.text = list(block['text'])
+    return lines
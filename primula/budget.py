@@ -0,0 +1,93 @@
+#
+# primula.budget
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+from collections.abc import Mapping
+import dataclasses
+import fnmatch
+
+import coverage.files
+
+
+__all__ = ['KEYS', 'Budget', 'Violation', 'parse', 'check']
+
+KEYS = ('self', 'total', 'per-call')
+
+# count, total time, and self time
+Times = tuple[int, float, float]
+
+
+@dataclasses.dataclass
+class Budget:
+
+    pattern: str
+    key: str
+    limit: float
+
+    def __post_init__(self) -> None:
+        # script paths are matched as [run] include
+        self._paths = coverage.files.GlobMatcher(coverage.files.prep_patterns([self.pattern]))
+
+    def match_path(self, path: str) -> bool:
+        return self._paths.match(path)
+
+    def match_name(self, name: str) -> bool:
+        return fnmatch.fnmatchcase(name, self.pattern)
+
+    def value(self, times: Times) -> float:
+        count, total_time, self_time = times
+        if self.key == 'self':
+            return self_time
+        elif self.key == 'total':
+            return total_time
+        return total_time / count if count > 0 else 0.0
+
+
+@dataclasses.dataclass
+class Violation:
+
+    budget: Budget
+    # path of the script, or name of the function
+    name: str
+    value: float
+
+    @property
+    def ratio(self) -> float:
+        return self.value / self.budget.limit if self.budget.limit > 0.0 else float('inf')
+
+
+def parse(s: str) -> list[Budget]:
+    budgets = []
+    for l in s.splitlines():
+        if not (l := l.strip()):
+            continue
+        v = l.rsplit(None, 2)
+        if (len(v) != 3
+            or v[1] not in KEYS):
+            raise ValueError(l)
+        limit = float(v[2])
+        if limit < 0.0:
+            raise ValueError(l)
+        budgets.append(Budget(v[0], v[1], limit))
+    return budgets
+
+
+def check(budgets: list[Budget], scripts: Mapping[str, Times], functions: Mapping[str, Times]) -> list[Violation]:
+    violations = []
+    for b in budgets:
+        for path, times in scripts.items():
+            if (b.match_path(path)
+                and (v := b.value(times)) > b.limit):
+                violations.append(Violation(b, path, v))
+        for name, times in functions.items():
+            if (b.match_name(name)
+                and (v := b.value(times)) > b.limit):
+                violations.append(Violation(b, name, v))
+    # the worst first
+    violations.sort(key=lambda v: -v.ratio)
+    return violations
@@ -0,0 +1,232 @@
+#
+# primula.cache
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+import array
+import hashlib
+import marshal
+import os
+import re
+import sys
+import tempfile
+from typing import Any
+import zlib
+
+from . import __version__, core
+from ._typing import Path
+
+
+__all__ = ['ProfileCache', 'RunCache']
+
+_MAGIC = b'primula\0'
+# suffixes of entries which share the cache directory
+_SUFFIXES = ('.prof', '.run')
+
+_script_re = re.compile(rb'^SCRIPT  (.+?)\r?$', re.MULTILINE)
+
+
+class _Cache:
+
+    def __init__(self, root: Path, max_size: int) -> None:
+        self.root = root
+        self.max_size = max_size
+
+    def clear(self) -> int:
+        n = 0
+        for e in self._entries():
+            try:
+                os.unlink(e.path)
+                n += 1
+            except FileNotFoundError:
+                pass
+        return n
+
+    def _entries(self) -> list[os.DirEntry[str]]:
+        try:
+            with os.scandir(self.root) as it:
+                return [e for e in it if e.name.endswith(_SUFFIXES) and e.is_file()]
+        except FileNotFoundError:
+            return []
+
+    def _evict(self) -> None:
+        entries = []
+        size = 0
+        for e in self._entries():
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, e.path))
+            size += st.st_size
+        entries.sort()
+        for _, n, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= n
+
+    def _dump(self, entry: str, data: Any) -> None:
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', prefix='primula-', dir=self.root)
+            try:
+                with os.fdopen(fd, 'wb') as fp:
+                    fp.write(_MAGIC)
+                    marshal.dump(data, fp)
+                os.replace(tmp, entry)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            pass
+
+    def _load(self, entry: str) -> Any:
+        with open(entry, 'rb') as fp:
+            if fp.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(entry)
+            return marshal.load(fp)
+
+
+class ProfileCache(_Cache):
+
+    def profile(self, path: Path, jobs: int = 1) -> core.Profile:
+        entry = os.path.join(self.root, self.key(path) + '.prof')
+        try:
+            p = self._read(entry, path)
+        except (OSError, EOFError, ValueError, TypeError):
+            p = core.Profile(path, jobs=jobs)
+            self._write(entry, p)
+            self._evict()
+        else:
+            # least recently used
+            os.utime(entry)
+        return p
+
+    def key(self, path: Path) -> str:
+        m = hashlib.sha256(f'{__version__}\0{sys.byteorder}\0'.encode())
+        with open(path, 'rb') as fp:
+            while data := fp.read(1 << 20):
+                m.update(data)
+        return m.hexdigest()
+
+    def _read(self, entry: str, path: Path) -> core.Profile:
+        scripts, functions = self._load(entry)
+        # sources which were read by the parser
+        for name, st, *_ in scripts:
+            if _stat(name) != st:
+                raise ValueError(name)
+        return core.Profile._new(path, [_script(*v) for v in scripts], [_function(*v) for v in functions])
+
+    def _write(self, entry: str, profile: core.Profile) -> None:
+        data = (
+            [(s.path, _stat(s.path), s.sourced, s.total_time, s.self_time, _dump_lines(s.lines)) for s in profile.scripts.values()],
+            [(f.name, f.defined, f.called, f.total_time, f.self_time, f.mapped, _dump_lines(f.lines)) for f in profile.functions],
+        )
+        self._dump(entry, data)
+
+
+class RunCache(_Cache):
+
+    def restore(self, args: list[str], path: Path) -> bool:
+        entry = os.path.join(self.root, self.key(args) + '.run')
+        try:
+            sources, data = self._load(entry)
+            # sources which were recorded in the profile
+            for name, st, digest in sources:
+                if not (_stat(name) == st
+                        or _digest(name) == digest):
+                    return False
+            data = zlib.decompress(data)
+            with open(path, 'wb') as fp:
+                fp.write(data)
+        except (OSError, EOFError, ValueError, TypeError, zlib.error):
+            return False
+        # least recently used
+        os.utime(entry)
+        return True
+
+    def store(self, args: list[str], path: Path) -> None:
+        entry = os.path.join(self.root, self.key(args) + '.run')
+        try:
+            with open(path, 'rb') as fp:
+                data = fp.read()
+        except OSError:
+            return
+        sources = []
+        for name in dict.fromkeys(os.fsdecode(m) for m in _script_re.findall(data)):
+            if (digest := _digest(name)) is None:
+                return
+            sources.append((name, _stat(name), digest))
+        self._dump(entry, (sources, zlib.compress(data)))
+        self._evict()
+
+    def key(self, args: list[str]) -> str:
+        m = hashlib.sha256(f'{__version__}\0{os.getcwd()}\0'.encode())
+        for a in args:
+            m.update(os.fsencode(a) + b'\0')
+            # command itself, vimrc and scripts
+            if os.path.isfile(a):
+                m.update(_digest(a) or b'')
+        return m.hexdigest()
+
+
+def _digest(path: str) -> bytes | None:
+    m = hashlib.sha256()
+    try:
+        with open(path, 'rb') as fp:
+            while data := fp.read(1 << 20):
+                m.update(data)
+    except OSError:
+        return None
+    return m.digest()
+
+
+def _stat(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _dump_lines(lines: core.Lines) -> tuple[bytes, bytes, bytes, list[str]]:
+    return (lines.counts.tobytes(), lines.total_times.tobytes(), lines.self_times.tobytes(), lines.text)
+
+
+def _lines(data: Any) -> core.Lines:
+    lines = core.Lines()
+    lines.counts = array.array('q', data[0])
+    lines.total_times = array.array('q', data[1])
+    lines.self_times = array.array('q', data[2])
+    lines.text = data[3]
+    if not (len(lines.counts) == len(lines.total_times) == len(lines.self_times) == len(lines.text)):
+        raise ValueError('lines')
+    return lines
+
+
+def _script(path: str, st: Any, sourced: int, total_time: float, self_time: float, lines: Any) -> core.Script:
+    return core.Script(path, sourced, total_time, self_time, lines=_lines(lines))
+
+
+def _function(name: str, defined: tuple[str, int] | None, called: int, total_time: float | None, self_time: float | None, mapped: bool,
+              lines: Any) -> core.Function:
+    f = core.Function(name, called, total_time, self_time, lines=_lines(lines))
+    f.defined = defined
+    f.mapped = mapped
+    return f
+
+
+def _parse_size(s: str) -> int:
+    s = s.strip().upper().removesuffix('B')
+    for i, unit in enumerate('KMG', 1):
+        if s.endswith(unit):
+            return int(float(s[:-1]) * 1024 ** i)
+    return int(s)
@@ -0,0 +1,33 @@
+" primula/calibrate.vim
+"
+"   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+"
+"   SPDX-License-Identifier: Apache-2.0
+"
+" Measures the overhead of profiling per line. The same loop runs with and
+" without profiling by turns, and primula compares the times of lines in the
+" profile with the time without profiling, which is written next to it.
+
+execute 'profile start' $PRIMULA_PROFILE
+profile func PrimulaCalibrate
+
+function! PrimulaCalibrate(n) abort
+  for l:i in range(a:n)
+    let l:x = 0
+    let l:x = 0
+    let l:x = 0
+    let l:x = 0
+  endfor
+endfunction
+
+let s:base = 0.0
+for s:i in range(5)
+  profile pause
+  let s:start = reltime()
+  call PrimulaCalibrate(10000)
+  let s:base += reltimefloat(reltime(s:start))
+  profile continue
+  call PrimulaCalibrate(10000)
+endfor
+call writefile([printf('%.9f', s:base)], $PRIMULA_PROFILE . '.base')
+qall!
@@ -0,0 +1,62 @@
+#
+# primula.calibration
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+import json
+import os
+import tempfile
+
+from . import core
+
+
+__all__ = ['ENVIRON', 'SCRIPT', 'measure', 'load', 'save']
+
+ENVIRON = 'PRIMULA_PROFILE'
+# Vim script which measures the overhead of profiling
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibrate.vim')
+
+_FUNCTION = 'PrimulaCalibrate()'
+# suffix of the file which records the time without profiling
+_BASE = '.base'
+
+
+def measure(path: str) -> tuple[float, int]:
+    with open(path + _BASE, encoding='utf-8') as fp:
+        base = float(fp.read())
+    try:
+        f = core.Profile(path, mapping=False).function(_FUNCTION)
+    except KeyError:
+        raise ValueError(f'{_FUNCTION} is not profiled')
+    lines = sum(c for c in f.lines.counts if c != core._NONE)
+    if lines <= 0:
+        raise ValueError(f'{_FUNCTION} is not executed')
+    # times of lines include the overhead
+    t = sum(t for t in f.lines.self_times if t != core._NONE) / 1e9
+    return max((t - base) / lines, 0.0), lines
+
+
+def load(path: str) -> float | None:
+    try:
+        with open(path, encoding='utf-8') as fp:
+            data = json.load(fp)
+    except (OSError, ValueError):
+        return None
+    v = data.get('overhead') if isinstance(data, dict) else None
+    return float(v) if isinstance(v, (int, float)) and v >= 0 else None
+
+
+def save(path: str, overhead: float, vim: str, lines: int) -> None:
+    root = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', prefix='primula-', dir=root)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+            json.dump({'overhead': overhead, 'vim': vim, 'lines': lines}, fp, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -0,0 +1,151 @@
+#
+# primula.callgrind
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+from collections.abc import Iterator
+import re
+from typing import IO
+
+from . import __version__, core
+
+
+__all__ = ['write_callgrind']
+
+# function calls in a line
+_call_re = re.compile(r'(?<![\w#:.>])((?:<SID>|<SNR>\d+_|[gs]:)?[A-Za-z_][\w#]*)\s*\(')
+_snr_re = re.compile(r'<SNR>\d+_')
+
+
+def write_callgrind(profile: core.Profile, fp: IO[str]) -> None:
+    graph = _Graph(profile)
+    fp.write('# callgrind format\n'
+             'version: 1\n'
+             f'creator: primula {__version__}\n'
+             'positions: line\n'
+             'event: ns : Time (ns)\n'
+             'event: count : Count\n'
+             'events: ns count\n'
+             '\n')
+    names = _Names()
+    for s in profile.scripts.values():
+        linenos = [i + 1 if i not in graph.bodies[s.path] else None for i in range(len(s.lines))]
+        fp.write(f'fl={names.file(s.path)}\n'
+                 f'fn={names.fn(s.path)}\n')
+        fp.writelines(_block(graph, names, s.path, s.lines, linenos))
+        fp.write('\n')
+    for i, f in enumerate(graph.functions):
+        path = f.defined[0] if f.defined else '???'
+        fp.write(f'fl={names.file(path)}\n'
+                 f'fn={names.fn(f.name)}\n')
+        fp.writelines(_block(graph, names, path, f.lines, graph.linenos[i]))
+        fp.write('\n')
+
+
+class _Graph:
+
+    def __init__(self, profile: core.Profile) -> None:
+        # merged profiles can have functions of the same name
+        self.functions = list(profile.functions)
+        # line numbers of function bodies in scripts
+        self.bodies: dict[str, set[int]] = {path: set() for path in profile.scripts}
+        self.linenos: list[list[int | None]] = []
+        for f in self.functions:
+            if (f.defined
+                and (s := profile.scripts.get(f.defined[0])) is not None):
+                self.linenos.append(self._body(s, f))
+            else:
+                self.linenos.append(list(range(1, len(f.lines) + 1)))
+        # indices of callees by names in calls
+        self.names: dict[str, list[int]] = {}
+        for i, f in enumerate(self.functions):
+            name = f.name.removesuffix('()')
+            if m := _snr_re.match(name):
+                self.names.setdefault(name, []).append(i)
+                name = 's:' + name[m.end():]
+            self.names.setdefault(name, []).append(i)
+
+    def _body(self, script: core.Script, function: core.Function) -> list[int | None]:
+        assert function.defined is not None
+        body = self.bodies[script.path]
+        text = script.lines.text
+        linenos: list[int | None] = []
+        j = function.defined[1]
+        while (len(linenos) < len(function.lines)
+               and j < len(text)):
+            linenos.append(j + 1)
+            body.add(j)
+            j += 1
+            # line continuations
+            while (j < len(text)
+                   and text[j].lstrip().startswith('\\')):
+                body.add(j)
+                j += 1
+        # endfunction
+        body.add(j)
+        return linenos + [None] * (len(function.lines) - len(linenos))
+
+    def callees(self, path: str, line: str) -> list[int]:
+        callees = []
+        for m in _call_re.finditer(line):
+            name = m.group(1)
+            if name.startswith('<SID>'):
+                name = 's:' + name[5:]
+            elif name.startswith('g:'):
+                name = name[2:]
+            if not (cands := self.names.get(name)):
+                continue
+            elif len(cands) > 1:
+                # script-local functions of the same script
+                cands = [i for i in cands if (d := self.functions[i].defined) and d[0] == path]
+                if len(cands) != 1:
+                    continue
+            callees.append(cands[0])
+        return callees
+
+
+class _Names:
+
+    def __init__(self) -> None:
+        self._files: dict[str, int] = {}
+        self._fns: dict[str, int] = {}
+
+    def file(self, name: str) -> str:
+        return self._compress(self._files, name)
+
+    def fn(self, name: str) -> str:
+        return self._compress(self._fns, name)
+
+    def _compress(self, ids: dict[str, int], name: str) -> str:
+        if (i := ids.get(name)) is not None:
+            return f'({i})'
+        i = ids[name] = len(ids) + 1
+        return f'({i}) {name}'
+
+
+def _block(graph: _Graph, names: _Names, path: str, lines: core.Lines, linenos: list[int | None]) -> Iterator[str]:
+    for i, count in enumerate(lines.counts):
+        if (count == core._NONE
+            or (lineno := linenos[i]) is None):
+            continue
+        self_time = max(lines.self_times[i], 0)
+        total_time = lines.total_times[i]
+        yield f'{lineno} {self_time} {count}\n'
+        if (total_time <= self_time
+            or not (callees := graph.callees(path, lines.text[i]))):
+            continue
+        # split time spent in callees by their time per call
+        functions = [graph.functions[j] for j in callees]
+        weights = [(f.total_time or 0.0) / f.called if f.called else 0.0 for f in functions]
+        total = sum(weights)
+        for j, f, w in zip(callees, functions, weights):
+            cpath = f.defined[0] if f.defined else '???'
+            start = next((n for n in graph.linenos[j] if n is not None), 0)
+            yield (f'cfl={names.file(cpath)}\n'
+                   f'cfn={names.fn(f.name)}\n'
+                   f'calls={count} {start}\n'
+                   f'{lineno} {round((total_time - self_time) * (w / total if total else 1 / len(callees)))}\n')
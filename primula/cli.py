@@ -7,11 +7,20 @@
 #
 
 from __future__ import annotations
-from collections.abc import Iterable
+import array
+from collections.abc import Iterable, Iterator
+import concurrent.futures
+import contextlib
+import dataclasses
+import functools
+import json
+import math
 import optparse
 import os
-import subprocess
+import re
+import shlex
 import sys
+import tempfile
 from typing import cast, no_type_check, Any
 
 import coverage
@@ -19,23 +28,45 @@ import coverage.cmdline
 import coverage.config
 import coverage.control
 import coverage.env
+import coverage.files
 try:
     import coverage.report_core as coverage_report
 except ImportError:
     import coverage.report as coverage_report
 
-from . import __version__, core, lcov, plugin
+from . import __version__, bench, budget, cache, calibration, callgrind, core, hotspot, lcov, perfdiff, plugin, runner, sqldata, stack, suite, timing
 from ._typing import MorF
-from .exception import ProfileError
+from .exception import PoolError, ProfileError
 
 
 __all__ = ['run']
 
 _FILE_TRACER = f'{__package__}.{plugin.VimScriptPlugin.__name__}'
+# options which override plugin options
+_OPTIONS = ('jobs', 'pool', 'timeout', 'total_timeout')
 # defaults values
+_CACHE_SIZE = '256M'
 _ENVIRON = 'PROFILE'
 _PROFILE = 'profile.txt'
+_TIMINGS = '.primula_timings.json'
+_CALIBRATION = '.primula_calibration.json'
 _LCOV_OUTPUT = 'lcov.info'
+_BENCH_OUTPUT = 'bench.json'
+_EXPORT_OUTPUT = {
+    'callgrind': 'callgrind.out',
+    'folded': 'profile.folded',
+    'speedscope': 'profile.speedscope.json',
+}
+# sort keys of hotspots
+_SORT_KEYS = {
+    'self': 'self time',
+    'total': 'total time',
+    'count': 'count',
+    'per-call': 'time per call',
+}
+
+_change_re = re.compile(r'(?P<path>.+):(?P<lines>\d+(?:-\d+)?(?:,\d+(?:-\d+)?)*)\Z')
+_vim_re = re.compile(r'g?vim(?:\.exe)?\Z', re.IGNORECASE)
 
 
 def run(args: list[str] | None = None) -> None:
@@ -44,21 +75,312 @@ def run(args: list[str] | None = None) -> None:
 
 class _CoverageScript(coverage.cmdline.CoverageScript):
 
+    def __init__(self) -> None:
+        self._options: dict[str, str] = {}
+        super().__init__()
+
+    def command_line(self, argv: list[str]) -> int:
+        self._options = {}
+        if (argv
+            and (parser := _COMMANDS.get(argv[0])) is not None):
+            ok, options, args = parser.parse_args_ok(argv[1:])
+            if not ok:
+                return coverage.cmdline.ERR
+            # override plugin options
+            for name in _OPTIONS:
+                if (v := getattr(options, name, None)) is not None:
+                    self._options[name] = str(v)
+            if argv[0] in _PRIMULA_COMMANDS:
+                assert options is not None
+                if self.do_help(options, args, parser):
+                    return coverage.cmdline.OK
+                kwargs = {}
+                if options.data_file:
+                    kwargs['data_file'] = options.data_file
+                self.coverage = coverage.cmdline.Coverage(config_file=options.rcfile, **kwargs)
+                return cast(int, getattr(self, f'do_{options.action}')(options, args))
+        if coverage.version_info < (6, 3):
+            self._lcov_as_xml(argv)
+        rc = super().command_line(argv)
+        if (rc == coverage.cmdline.OK
+            and argv
+            and argv[0] == 'combine'):
+            rc = self._check_budgets()
+        return rc
+
     if coverage.version_info < (6, 3):
         @no_type_check
-        def command_line(self, argv: list[str]) -> int:
+        def _lcov_as_xml(self, argv: list[str]) -> None:
             if (argv
                 and argv[0] == 'lcov'):
                 argv[0] = 'xml'
                 coverage.cmdline.CMDS['xml'] = coverage.cmdline.CMDS['lcov']
                 coverage.cmdline.Coverage.xml_report = coverage.cmdline.Coverage.lcov_report
-            return super().command_line(argv)
 
-    def do_run(self, options: optparse.Values, args: list[str]) -> int:
+    @property
+    def coverage(self) -> coverage.control.Coverage:
+        return self.__coverage
+
+    @coverage.setter
+    def coverage(self, cov: coverage.control.Coverage) -> None:
+        self.__coverage = cov
+        if cov is not None:
+            for k, v in self._options.items():
+                cov.set_option(f'{__package__}:{k}', v)
+
+    def do_affected(self, options: optparse.Values, args: list[str]) -> int:
+        if not args:
+            coverage.cmdline.show_help("Nothing to do.")
+            return coverage.cmdline.ERR
+
+        changes: dict[str, set[int] | None] = {}
+        for a in args:
+            if m := _change_re.match(a):
+                path = _normpath(m.group('path'))
+                lines = changes.get(path, set())
+                if lines is not None:
+                    for r in m.group('lines').split(','):
+                        i, _, j = r.partition('-')
+                        lines.update(range(int(i), int(j or i) + 1))
+                changes[path] = lines
+            else:
+                changes[_normpath(a)] = None
+
+        contexts = self._contexts()
+        data = self.coverage.get_data()
+        tests = set()
+        for path in data.measured_files():
+            if (norm := _normpath(path)) not in changes:
+                continue
+            lines = changes[norm]
+            for lineno, v in data.contexts_by_lineno(path).items():
+                if (lines is None
+                    or lineno in lines):
+                    tests.update(v)
+        # changed scripts of tests
+        for c in contexts:
+            try:
+                if any(_normpath(a) in changes for a in shlex.split(c, posix=sys.platform != 'win32')):
+                    tests.add(c)
+            except ValueError:
+                pass
+        for c in sorted(tests & contexts):
+            print(c)
+        return coverage.cmdline.OK
+
+    def do_bench(self, options: optparse.Values, args: list[str]) -> int:
+        if not args:
+            coverage.cmdline.show_help("Nothing to do.")
+            return coverage.cmdline.ERR
+        elif options.runs < 1:
+            coverage.cmdline.show_help(f"Invalid runs: {options.runs}")
+            return coverage.cmdline.ERR
+
+        assert isinstance(self.coverage, _Coverage)
+        self.coverage._init()
+        plugin_options = cast(dict[str, str], self.coverage.config.get_plugin_options(__package__))
+        name = plugin_options.get('environ') or _ENVIRON
+        excmd = _profile_cmd(name, [os.path.abspath(path) for path in self.coverage.config.source or () if os.path.isdir(path)],
+                             coverage.files.prep_patterns(self.coverage.config.run_include))
+        cmd = _inject(args, excmd)
+        cmd[0] = self._which(cmd[0])
+        profiles = self._profile_paths(options.runs)
+        # run one by one not to disturb each other
+        rn = runner.Runner(name, timeout=self.coverage._timeout('timeout'), total_timeout=self.coverage._timeout('total_timeout'))
+        results = rn.run([cmd] * options.runs, profiles)
+        if any(r.returncode or r.timed_out for r in results):
+            return coverage.cmdline.ERR
+
+        try:
+            b = bench.aggregate(list(self._profiles(profiles, mapping=False, raw=True)))
+        except ValueError as e:
+            raise coverage.CoverageException(f"Couldn't aggregate profiles: {e}")
+        with open(options.outfile or _BENCH_OUTPUT, 'w', encoding='utf-8') as fp:
+            bench.dump(b, fp)
+        for path in profiles:
+            os.unlink(path)
+        v = bench._stats([r.wall for r in results])
+        print(f'Ran {len(results)} time{"s" if len(results) != 1 else ""} in {sum(r.wall for r in results):.3f} s: '
+              + ', '.join(f'{k} {t:.3f} s' for k, t in zip(bench.STATS, v) if k != 'mean'))
+        return coverage.cmdline.OK
+
+    def do_calibrate(self, options: optparse.Values, args: list[str]) -> int:
+        if not args:
+            coverage.cmdline.show_help("Nothing to do.")
+            return coverage.cmdline.ERR
+
+        assert isinstance(self.coverage, _Coverage)
+        plugin_options = cast(dict[str, str], self.coverage.config.get_plugin_options(__package__))
+        path = os.path.expanduser(plugin_options.get('calibration') or _CALIBRATION)
+        vim = self._which(args[0])
+        with tempfile.TemporaryDirectory(prefix='primula-') as tmp:
+            profile = os.path.join(tmp, _PROFILE)
+            rn = runner.Runner(calibration.ENVIRON, timeout=self.coverage._timeout('timeout'))
+            r = rn.run([[vim, *args[1:], '-S', calibration.SCRIPT]], [profile])[0]
+            if (r.returncode
+                or r.timed_out):
+                return coverage.cmdline.ERR
+            try:
+                overhead, lines = calibration.measure(profile)
+            except (OSError, ProfileError, ValueError) as e:
+                raise coverage.CoverageException(f'Calibration failed: {e}')
+        try:
+            calibration.save(path, overhead, vim, lines)
+        except OSError as e:
+            raise coverage.CoverageException(f"Couldn't write calibration: {e}")
+        print(f'Overhead of profiling: {overhead * 1e9:.1f} ns per line in {lines} lines')
+        return coverage.cmdline.OK
+
+    def do_cache(self, options: optparse.Values, args: list[str]) -> int:
+        if args != ['clear']:
+            coverage.cmdline.show_help("Nothing to do." if not args else f"Unknown action: {' '.join(args)!r}")
+            return coverage.cmdline.ERR
+
+        assert isinstance(self.coverage, _Coverage)
+        pcache = self.coverage._profile_cache()
+        if pcache is None:
+            coverage.cmdline.show_help("No cache directory is configured.")
+            return coverage.cmdline.ERR
+        n = pcache.clear()
+        print(f'Cleared {n} cached profile{"s" if n != 1 else ""} in {pcache.root}')
+        return coverage.cmdline.OK
+
+    def do_minimize(self, options: optparse.Values, args: list[str]) -> int:
+        if args:
+            coverage.cmdline.show_help(f"Unexpected arguments: {' '.join(args)!r}")
+            return coverage.cmdline.ERR
+
+        contexts = self._contexts()
+        data = self.coverage.get_data()
+        tests: dict[str, set[tuple[int, int]]] = {c: set() for c in contexts}
+        for i, path in enumerate(sorted(data.measured_files())):
+            for lineno, v in data.contexts_by_lineno(path).items():
+                for c in v:
+                    if c in tests:
+                        tests[c].add((i, lineno))
+        # previous wall times of tests
+        plugin_options = cast(dict[str, str], self.coverage.config.get_plugin_options(__package__))
+        timings = timing.Timings(os.path.expanduser(plugin_options.get('timings') or _TIMINGS))
+        known = {c: cost for c in tests if (cost := timings.cost(c)) is not None}
+        mean = sum(known.values()) / len(known) if known else 1.0
+        costs = {c: known.get(c, mean) for c in tests}
+
+        selected = suite.minimize(tests, costs)
+        unique = suite.unique(tests)
+        rest = sorted(set(tests) - set(selected), key=lambda c: (-costs[c], c))
+        total = sum(costs.values())
+        print(f'Selected {len(selected)} of {len(tests)} tests in {sum(costs[c] for c in selected):.3f} s of {total:.3f} s')
+        for c in selected:
+            n = len(tests[c])
+            print(f'  {c}: {costs[c]:.3f} s, {n} line{"s" if n != 1 else ""}, {unique[c]} unique')
+        if rest:
+            print(f'Redundant {len(rest)} test{"s" if len(rest) != 1 else ""} in {sum(costs[c] for c in rest):.3f} s')
+            for c in rest:
+                n = len(tests[c])
+                print(f'  {c}: {costs[c]:.3f} s, {n} line{"s" if n != 1 else ""}')
+        if options.outfile:
+            with open(options.outfile, 'w', encoding='utf-8') as fp:
+                fp.writelines(f'{c}\n' for c in selected)
+        return coverage.cmdline.OK
+
+    def do_export(self, options: optparse.Values, args: list[str]) -> int:
+        if not args:
+            coverage.cmdline.show_help("Nothing to do.")
+            return coverage.cmdline.ERR
+
+        # function bodies are not mapped to scripts
+        p = self._merge(args, mapping=False, stat=options.stat, raw=options.raw)
+        outfile = options.outfile or _EXPORT_OUTPUT[options.format]
+        with (open(outfile, 'w', encoding='utf-8') if outfile != '-' else contextlib.nullcontext(sys.stdout)) as fp:
+            if options.format == 'callgrind':
+                callgrind.write_callgrind(p, fp)
+            elif options.format == 'folded':
+                stack.write_folded(p, fp)
+            else:
+                stack.write_speedscope(p, fp, os.path.basename(args[0]) if len(args) == 1 else '')
+        return coverage.cmdline.OK
+
+    def do_hotspots(self, options: optparse.Values, args: list[str]) -> int:
+        if not args:
+            coverage.cmdline.show_help("Nothing to do.")
+            return coverage.cmdline.ERR
+        elif options.top < 1:
+            coverage.cmdline.show_help(f"Invalid top: {options.top}")
+            return coverage.cmdline.ERR
+
+        assert isinstance(self.coverage, _Coverage)
+        self.coverage._init()
+        p = self._merge(args, stat=options.stat, raw=options.raw)
+        include = coverage.cmdline.unshell_list(options.include) or self.coverage.config.report_include
+        omit = coverage.cmdline.unshell_list(options.omit) or self.coverage.config.report_omit
+        match = None
+        if (include
+            or omit):
+            im = coverage.files.GlobMatcher(coverage.files.prep_patterns(include)) if include else None
+            om = coverage.files.GlobMatcher(coverage.files.prep_patterns(omit)) if omit else None
+
+            def match(path: str) -> bool:
+                return (im is None or im.match(path)) and not (om is not None and om.match(path))
+
+        results = {
+            'scripts': hotspot.scripts(p, options.top, options.sort, match),
+            'functions': hotspot.functions(p, options.top, options.sort, match),
+            'lines': hotspot.lines(p, options.top, options.sort, match),
+        }
+        if options.json:
+            json.dump({k: [dataclasses.asdict(h) for h in v] for k, v in results.items()}, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+            return coverage.cmdline.OK
+
+        def fmt(v: float | None) -> str:
+            return f'{v:10.6f}' if v is not None else ' ' * 10
+
+        for k, v in results.items():
+            if not v:
+                continue
+            elif k != 'scripts':
+                print()
+            print(f'{k.title()} by {_SORT_KEYS[options.sort]}:')
+            print(f'{"Count":>7} {"Total (s)":>10} {"Self (s)":>10} {"Call (s)":>10}  {k.title()[:-1]}')
+            for h in v:
+                if k == 'scripts':
+                    name = coverage.files.relative_filename(h.name)
+                elif k == 'functions':
+                    name = h.name if h.path is None else f'{h.name} ({coverage.files.relative_filename(h.path)}:{h.lineno})'
+                else:
+                    name = f'{coverage.files.relative_filename(h.name) if h.path else h.name}:{h.lineno}: {h.line.strip() if h.line else ""}'
+                print(f'{h.count:7} {fmt(h.total_time)} {fmt(h.self_time)} {fmt(h.per_call)}  {name}')
+        return coverage.cmdline.OK
+
+    def do_merge(self, options: optparse.Values, args: list[str]) -> int:
         if not args:
             coverage.cmdline.show_help("Nothing to do.")
             return coverage.cmdline.ERR
 
+        # keep raw times in the format of Vim, and correct them when reporting
+        p = self._merge(args, mapping=False, stat=options.stat, raw=True)
+        if options.outfile:
+            with open(options.outfile, 'w', encoding='utf-8') as fp:
+                core.write_profile(p, fp)
+        else:
+            core.write_profile(p, sys.stdout)
+        return coverage.cmdline.OK
+
+    def do_run(self, options: optparse.Values, args: list[str]) -> int:
+        if not (args
+                or options.manifest):
+            coverage.cmdline.show_help("Nothing to do.")
+            return coverage.cmdline.ERR
+
+        assert isinstance(self.coverage, _Coverage)
+        if options.manifest:
+            keys = self._manifest(options.manifest)
+            entries = [shlex.split(k, posix=sys.platform != 'win32') for k in keys]
+            cmds = [_substitute(args, e) for e in entries]
+        else:
+            keys = []
+            entries = []
+            cmds = [args]
         if options.append:
             self.coverage.load()
         # prevent to install tracer
@@ -71,14 +393,228 @@ class _CoverageScript(coverage.cmdline.CoverageScript):
         # options
         plugin_options = cast(dict[str, str], self.coverage.config.get_plugin_options(__package__))
         name = plugin_options.get('environ') or _ENVIRON
-        os.environ[name] = plugin_options.get('profile') or _PROFILE
+        inorout = self.coverage._inorout
+        excmd = _profile_cmd(name, [os.path.abspath(path) for path in self.coverage.config.source or () if os.path.isdir(path)],
+                             coverage.files.prep_patterns(self.coverage.config.run_include))
+        cmds = [_inject(cmd, excmd) for cmd in cmds]
+        profiles = self._profile_paths(len(cmds))
+        timings = timing.Timings(os.path.expanduser(plugin_options.get('timings') or _TIMINGS)) if keys else None
+        pool = plugin._to_bool(plugin_options.get('pool')) and bool(entries)
+        if pool:
+            for k, e in zip(keys, entries):
+                if len(e) != 1:
+                    raise coverage.CoverageException(f'Invalid script in manifest: {k}')
         try:
-            args[0] = self._which(args[0])
-            proc = subprocess.run(args)
-            self.coverage.combine([os.environ[name]])
+            for cmd in cmds:
+                cmd[0] = self._which(cmd[0])
+            results = [runner.Result() for _ in cmds]
+            # reuse profiles of unchanged commands
+            rcache = self.coverage._run_cache()
+            for cmd, path, r in zip(cmds, profiles, results):
+                r.cached = rcache is not None and rcache.restore(cmd, path)
+            todo = [i for i, r in enumerate(results) if not r.cached]
+            jobs = max(min(self.coverage._jobs(), len(todo)), 1)
+            timeout = self.coverage._timeout('timeout')
+            total_timeout = self.coverage._timeout('total_timeout')
+            order = None
+            if timings:
+                pos = {i: j for j, i in enumerate(todo)}
+                order = [pos[i] for i in timings.order(keys) if i in pos]
+            load = functools.partial(_load, pcache=self.coverage._profile_cache(), overhead=self.coverage._overhead())
+            # parse profiles while other commands are running
+            with (concurrent.futures.ProcessPoolExecutor(jobs) if jobs > 1 else
+                  concurrent.futures.ThreadPoolExecutor(1)) as executor:
+                ran = None
+                if (pool
+                    and todo):
+                    # source the driver in place of scripts
+                    pargs = _inject([cmds[0][0], '--not-a-term', *_substitute(args, [runner.DRIVER])[1:]], excmd)
+                    pl = runner.Pool(pargs, name, jobs, timeout=timeout, total_timeout=total_timeout)
+                    try:
+                        ran = pl.run([entries[i] for i in todo], [profiles[i] for i in todo], order, load, executor)
+                    except PoolError as e:
+                        self.coverage._warn(f'{e}, falling back to a new process for each script')
+                if (ran is None
+                    and todo):
+                    rn = runner.Runner(name, jobs, timeout=timeout, total_timeout=total_timeout, multiplex=len(cmds) > 1)
+                    ran = rn.run([cmds[i] for i in todo], [profiles[i] for i in todo], order, load, executor)
+                for i, r in zip(todo, ran or ()):
+                    results[i] = r
+                cached = [i for i, r in enumerate(results) if r.cached]
+                for i, data in zip(cached, executor.map(load, [profiles[i] for i in cached])):
+                    results[i].data = data
+            if rcache is not None:
+                for i in todo:
+                    r = results[i]
+                    if (r.returncode == 0
+                        and not r.timed_out
+                        and os.path.isfile(profiles[i])):
+                        rcache.store(cmds[i], profiles[i])
+            if (keys
+                and plugin._to_bool(plugin_options.get('contexts'))):
+                # record lines under each command of the manifest
+                for k, r in zip(keys, results):
+                    if r.data is not None:
+                        r.data.context = k
+            if (omit := inorout.omit_match) is not None:
+                # Vim cannot exclude files from profiling
+                for r in results:
+                    if r.data is not None:
+                        r.data.scripts = {path: v for path, v in r.data.scripts.items() if not omit.match(path)}
+            self.coverage._combine([(path, r.data) for path, r in zip(profiles, results)
+                                    if not r.timed_out and os.path.isfile(path)])
         finally:
             self.coverage.save()
-        return coverage.cmdline.ERR if proc.returncode else coverage.cmdline.OK
+        if timings:
+            for k, path, r in zip(keys, profiles, results):
+                if not (r.timed_out
+                        or r.cached):
+                    timings.update(k, r.wall, self.coverage._profile_times.get(path))
+            timings.save()
+        if jobs > 1:
+            self._summary(jobs, results)
+        if cached:
+            print(f'Reused {len(cached)} cached profile{"s" if len(cached) != 1 else ""}')
+        rc = self._check_budgets()
+        return coverage.cmdline.ERR if any(r.returncode or r.timed_out for r in results) else rc
+
+    def do_perfdiff(self, options: optparse.Values, args: list[str]) -> int:
+        if len(args) != 2:
+            coverage.cmdline.show_help("Nothing to do." if not args else "Need a base profile and a new profile.")
+            return coverage.cmdline.ERR
+        elif options.top < 1:
+            coverage.cmdline.show_help(f"Invalid top: {options.top}")
+            return coverage.cmdline.ERR
+
+        assert isinstance(self.coverage, _Coverage)
+        self.coverage._init()
+        base, new = (self._merge([path], stat=options.stat, raw=options.raw) for path in args)
+        threshold = options.threshold if options.sort != 'count' else 0.0
+        results = {k: perfdiff.top(getattr(perfdiff, k)(base, new), options.top, options.sort, options.relative, threshold)
+                   for k in ('scripts', 'functions', 'lines')}
+        if options.json:
+            def change(c: perfdiff.Change) -> dict[str, Any]:
+                ratio = c.ratio(options.sort)
+                return {
+                    'name': c.name,
+                    'base': dataclasses.asdict(c.base) if c.base else None,
+                    'new': dataclasses.asdict(c.new) if c.new else None,
+                    'delta': c.delta(options.sort),
+                    'ratio': ratio if math.isfinite(ratio) else None,
+                }
+
+            json.dump({k: {'regressions': [change(c) for c in regressions], 'improvements': [change(c) for c in improvements]}
+                       for k, (regressions, improvements) in results.items()}, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+            return coverage.cmdline.OK
+
+        def fmt(v: float, sign: str = '') -> str:
+            return f'{v:{sign}10.6f}' if options.sort != 'count' else f'{round(v):{sign}10}'
+
+        first = True
+        for k, v in results.items():
+            for title, changes in zip(('regressions', 'improvements'), v):
+                if not changes:
+                    continue
+                elif not first:
+                    print()
+                first = False
+                print(f'{k.title()[:-1]} {title} by {_SORT_KEYS[options.sort]}:')
+                print(f'{"Base":>10} {"New":>10} {"Delta":>10} {"Change":>8}  {k.title()[:-1]}')
+                for c in changes:
+                    h = c.new or c.base
+                    assert h is not None
+                    if k == 'scripts':
+                        name = coverage.files.relative_filename(h.name)
+                    elif k == 'functions':
+                        name = h.name if h.path is None else f'{h.name} ({coverage.files.relative_filename(h.path)}:{h.lineno})'
+                    else:
+                        name = f'{coverage.files.relative_filename(h.name) if h.path else h.name}:{h.lineno}: {h.line.strip() if h.line else ""}'
+                    ratio = c.ratio(options.sort)
+                    pct = f'{ratio:+.1%}' if math.isfinite(ratio) else 'new'
+                    bv, nv = c.values(options.sort)
+                    print(f'{fmt(bv)} {fmt(nv)} {fmt(nv - bv, "+")} {pct:>8}  {name}')
+        return coverage.cmdline.OK
+
+    def _merge(self, paths: list[str], mapping: bool = True, stat: str = 'median', raw: bool = False) -> core.Profile:
+        try:
+            return core.merge_profiles(self._profiles(paths, mapping, stat, raw))
+        except ValueError as e:
+            raise coverage.CoverageException(f"Couldn't merge profiles: {e}")
+
+    def _profiles(self, paths: list[str], mapping: bool = True, stat: str = 'median', raw: bool = False) -> Iterator[core.Profile]:
+        assert isinstance(self.coverage, _Coverage)
+        jobs = self.coverage._jobs()
+        overhead = self.coverage._overhead() if not raw else None
+        load = self.coverage._profile if mapping and overhead is None else functools.partial(core.Profile, mapping=False)
+        for path in paths:
+            try:
+                # statistics of times in bench files
+                if bench.is_bench(path):
+                    try:
+                        p = bench.load(path).profile(stat, mapping and overhead is None, path)
+                    except (ValueError, KeyError, TypeError) as e:
+                        raise coverage.CoverageException(f"Couldn't read bench '{path}': {e}")
+                else:
+                    p = load(path, jobs)
+            except OSError as e:
+                raise coverage.CoverageException(f"Couldn't read profile: {e}")
+            except ProfileError as e:
+                raise coverage.CoverageException(f"Couldn't parse profile '{e.path}' at line {e.lineno}: {e}")
+            if overhead is not None:
+                # correct times before mapping function bodies to scripts
+                p = core.correct_profile(p, overhead)
+                if mapping:
+                    p._map_all()
+            yield p
+
+    def _profile_paths(self, n: int) -> list[str]:
+        plugin_options = cast(dict[str, str], self.coverage.config.get_plugin_options(__package__))
+        profile = plugin_options.get('profile') or _PROFILE
+        if (n > 1
+            and '{shard}' not in profile):
+            root, ext = os.path.splitext(profile)
+            profile = f'{root}-{{shard}}{ext}'
+        return [profile.replace('{shard}', str(i)) for i in range(n)]
+
+    def _contexts(self) -> set[str]:
+        self.coverage.load()
+        contexts = self.coverage.get_data().measured_contexts() - {''}
+        if not contexts:
+            raise coverage.CoverageException('No contexts were measured')
+        return contexts
+
+    def _check_budgets(self) -> int:
+        assert isinstance(self.coverage, _Coverage)
+        if not (violations := self.coverage._budgets()):
+            return coverage.cmdline.OK
+        print(f'Budget failure: {len(violations)} violation{"s" if len(violations) != 1 else ""}')
+        for v in violations:
+            name = coverage.files.relative_filename(v.name) if os.path.isabs(v.name) else v.name
+            print(f'  {name}: {v.budget.key} {v.value:.6f} s > {v.budget.limit:.6f} s ({v.budget.pattern})')
+        return coverage.cmdline.FAIL_UNDER
+
+    def _manifest(self, path: str) -> list[str]:
+        try:
+            with open(path, encoding='utf-8') as fp:
+                lines = fp.read().splitlines()
+        except OSError as e:
+            raise coverage.CoverageException(f"Couldn't read manifest: {e}")
+        entries = []
+        for l in lines:
+            l = l.strip()
+            if l and not l.startswith('#'):
+                entries.append(l)
+        if not entries:
+            raise coverage.CoverageException(f'No commands in manifest: {path}')
+        return entries
+
+    def _summary(self, jobs: int, results: list[runner.Result]) -> None:
+        for w in range(jobs):
+            v = [r for r in results if r.worker == w]
+            print(f'Worker {w + 1}: {len(v)} command{"s" if len(v) != 1 else ""} in {sum(r.wall for r in v):.3f} s')
+        times = [sum(r.wall for r in results if r.worker == w) for w in range(jobs)]
+        print(f'Slowest worker: {max(times):.3f} s, mean: {sum(times) / len(times):.3f} s')
 
     def _which(self, name: str) -> str:
         parent, name = os.path.split(name)
@@ -97,22 +633,39 @@ class _CoverageScript(coverage.cmdline.CoverageScript):
 class _Coverage(coverage.control.Coverage):
 
     def combine(self, data_paths: Iterable[str] | None = None, *args: Any, **kwargs: Any) -> None:
-        paths = []
-        profs = []
+        files: list[str] = []
+        results: list[_ProfileData | None] = []
         if data_paths:
             self._init()
-            for path in data_paths:
-                if os.path.isfile(path):
-                    try:
-                        p = core.Profile(path)
-                    except ProfileError:
-                        paths.append(path)
-                    else:
-                        for f in p.functions:
-                            if not (f.mapped
-                                    or f.name.startswith(core._LAMBDA)):
-                                self._warn(f'Could not find line for function: {f.name}')
-                        profs.append(p)
+            files = [path for path in data_paths if os.path.isfile(path)]
+            jobs = self._jobs()
+            load = functools.partial(_load, pcache=self._profile_cache(), overhead=self._overhead())
+            if (jobs > 1
+                and len(files) > 1):
+                with concurrent.futures.ProcessPoolExecutor(min(jobs, len(files))) as executor:
+                    results = list(executor.map(load, files))
+            else:
+                results = [load(path, jobs) for path in files]
+        self._combine(list(zip(files, results)), *args, **kwargs)
+
+    def _combine(self, results: list[tuple[str, _ProfileData | None]], *args: Any, **kwargs: Any) -> None:
+        paths = []
+        profs = []
+        self._profile_times: dict[str, float] = {}
+        self._script_times: dict[str, budget.Times] = {}
+        self._function_times: dict[str, budget.Times] = {}
+        for path, data in results:
+            if data is None:
+                paths.append(path)
+            else:
+                for msg in data.warnings:
+                    self._warn(msg)
+                profs.append(data)
+                self._profile_times[path] = data.time
+                for k, times in data.script_times.items():
+                    _add_times(self._script_times, k, times)
+                for k, times in data.function_times.items():
+                    _add_times(self._function_times, k, times)
         try:
             super().combine(paths, *args, **kwargs)
         except coverage.CoverageException as e:
@@ -122,52 +675,218 @@ class _Coverage(coverage.control.Coverage):
 
         assert self._data is not None
         file_tracers = {}
-        if self.config.branch:
-            arcs: dict[str, list[tuple[int, int]]] = {}
-            for p in profs:
-                for s in p.scripts.values():
-                    file_tracers[s.path] = _FILE_TRACER
-                    arcs[s.path] = []
-                    i = -1
-                    for j, l in enumerate(s.lines, 1):
-                        if not l.line.lstrip().startswith('\\'):
-                            if l.count:
-                                arcs[s.path].append((i, j))
+        groups: dict[str | None, list[_ProfileData]] = {}
+        for data in profs:
+            groups.setdefault(data.context, []).append(data)
+        for context, group in groups.items():
+            self._data.set_context(context)
+            if self.config.branch:
+                arcs: dict[str, list[tuple[int, int]]] = {}
+                for data in group:
+                    for path, (linenos, counts, *_) in data.scripts.items():
+                        file_tracers[path] = _FILE_TRACER
+                        v = arcs.setdefault(path, [])
+                        i = -1
+                        for j, count in zip(linenos, counts):
+                            if count > 0:
+                                v.append((i, j))
                             i = j
-                    arcs[s.path].append((i, -1))
-            self._data.add_arcs(arcs)
-        else:
-            lines: dict[str, list[int]] = {}
-            for p in profs:
-                for s in p.scripts.values():
-                    file_tracers[s.path] = _FILE_TRACER
-                    lines[s.path] = []
-                    for i, l in enumerate(s.lines, 1):
-                        if (not l.line.lstrip().startswith('\\')
-                            and l.count):
-                            lines[s.path].append(i)
-            self._data.add_lines(lines)
+                        v.append((i, -1))
+                self._data.add_arcs(arcs)
+            else:
+                lines: dict[str, list[int]] = {}
+                for data in group:
+                    for path, (linenos, counts, *_) in data.scripts.items():
+                        file_tracers[path] = _FILE_TRACER
+                        lines.setdefault(path, []).extend(i for i, count in zip(linenos, counts) if count > 0)
+                self._data.add_lines(lines)
+        self._data.set_context(None)
         self._data.add_file_tracers(file_tracers)
+        # counts and times of lines
+        if (profs
+            and not self._no_disk):
+            ld = sqldata.LineData(self._data.data_filename())
+            for data in profs:
+                ld.update({path: zip(*v) for path, v in data.scripts.items()})
+
+    def _jobs(self) -> int:
+        plugin_options = cast(dict[str, str], self.config.get_plugin_options(__package__))
+        v = plugin_options.get('jobs') or '1'
+        try:
+            jobs = int(v)
+        except ValueError:
+            jobs = -1
+        if jobs < 0:
+            raise coverage.CoverageException(f'Invalid jobs: {v}')
+        return jobs or os.cpu_count() or 1
+
+    def _timeout(self, name: str) -> float | None:
+        plugin_options = cast(dict[str, str], self.config.get_plugin_options(__package__))
+        if not (v := plugin_options.get(name)):
+            return None
+        try:
+            timeout = float(v)
+        except ValueError:
+            timeout = -1.0
+        if timeout < 0:
+            raise coverage.CoverageException(f'Invalid {name}: {v}')
+        return timeout or None
+
+    def _budgets(self) -> list[budget.Violation]:
+        plugin_options = cast(dict[str, str], self.config.get_plugin_options(__package__))
+        try:
+            budgets = budget.parse(plugin_options.get('budgets') or '')
+        except ValueError as e:
+            raise coverage.CoverageException(f'Invalid budget: {e}')
+        if not budgets:
+            return []
+        return budget.check(budgets, getattr(self, '_script_times', {}), getattr(self, '_function_times', {}))
+
+    def _overhead(self) -> float | None:
+        plugin_options = cast(dict[str, str], self.config.get_plugin_options(__package__))
+        if not (v := plugin_options.get('overhead')):
+            return None
+        elif v == 'auto':
+            path = os.path.expanduser(plugin_options.get('calibration') or _CALIBRATION)
+            if (overhead := calibration.load(path)) is None:
+                raise coverage.CoverageException(f'No calibration: {path}')
+        else:
+            try:
+                overhead = float(v)
+            except ValueError:
+                overhead = -1.0
+            if overhead < 0:
+                raise coverage.CoverageException(f'Invalid overhead: {v}')
+        return overhead or None
+
+    def _profile_cache(self) -> cache.ProfileCache | None:
+        plugin_options = cast(dict[str, str], self.config.get_plugin_options(__package__))
+        if not (root := plugin_options.get('cache_dir')):
+            return None
+        v = plugin_options.get('cache_size') or _CACHE_SIZE
+        try:
+            size = cache._parse_size(v)
+        except ValueError:
+            size = -1
+        if size < 0:
+            raise coverage.CoverageException(f'Invalid cache_size: {v}')
+        return cache.ProfileCache(os.path.expanduser(root), size)
+
+    def _run_cache(self) -> cache.RunCache | None:
+        plugin_options = cast(dict[str, str], self.config.get_plugin_options(__package__))
+        if not plugin._to_bool(plugin_options.get('run_cache')):
+            return None
+        elif (pcache := self._profile_cache()) is None:
+            raise coverage.CoverageException('No cache directory is configured for run_cache')
+        return cache.RunCache(pcache.root, pcache.max_size)
+
+    def _profile(self, path: str, jobs: int = 1) -> core.Profile:
+        pcache = self._profile_cache()
+        return pcache.profile(path, jobs=jobs) if pcache else core.Profile(path, jobs=jobs)
 
     def lcov_report(self, morfs: Iterable[MorF] | None = None,
                     outfile: str | None = None, ignore_errors: bool | None = None,
                     omit: str | list[str] | None = None, include: str | list[str] | None = None,
                     contexts: list[str] | None = None, skip_empty: bool | None = None) -> float:
         outfile = outfile or _LCOV_OUTPUT
-        plugin_options = cast(dict[str, str], self.config.get_plugin_options(__package__))
-        try:
-            p = core.Profile(plugin_options.get('profile') or _PROFILE)
-        except (OSError, ProfileError):
-            p = None
         with coverage.control.override_config(self,
                                               ignore_errors=ignore_errors,
                                               report_omit=omit,
                                               report_include=include,
                                               report_contexts=contexts):
-            return coverage_report.render_report(outfile, lcov.LCOVReporter(self, p), morfs,
+            return coverage_report.render_report(outfile, lcov.LCOVReporter(self), morfs,
                                                  *(self._message,) if coverage.version_info >= (6, 1) else ())
 
 
+def _profile_cmd(environ: str, source: list[str], include: list[str]) -> str:
+    # profile measured files only
+    pats = [os.path.join(path, '*') for path in source] + include
+    if not pats:
+        pats.append(os.path.join(os.path.abspath(os.curdir), '*'))
+    cmds = [f'execute "profile start" ${environ}']
+    for p in pats:
+        p = p.replace(os.sep, '/').replace("'", "''")
+        cmds.append(f"execute 'profile! file' '{p}'")
+    return ' | '.join(cmds)
+
+
+def _inject(args: list[str], excmd: str) -> list[str]:
+    # insert --cmd into Vim commands
+    if _vim_re.match(os.path.basename(args[0])):
+        return [args[0], '--cmd', excmd, *args[1:]]
+    return args
+
+
+def _normpath(path: str) -> str:
+    return os.path.normcase(os.path.realpath(path))
+
+
+def _substitute(args: list[str], entry: list[str]) -> list[str]:
+    # replace {} with the entry, or append it
+    if '{}' in args:
+        i = args.index('{}')
+        return args[:i] + entry + args[i+1:]
+    return args + entry
+
+
+@dataclasses.dataclass
+class _ProfileData:
+
+    scripts: dict[str, tuple[array.array[int], array.array[int], array.array[int], array.array[int]]]
+    warnings: list[str]
+    # time spent in Vim script
+    time: float = 0.0
+    # dynamic context
+    context: str | None = None
+    # counts, total times, and self times for budgets
+    script_times: dict[str, budget.Times] = dataclasses.field(default_factory=dict)
+    function_times: dict[str, budget.Times] = dataclasses.field(default_factory=dict)
+
+
+def _load(path: str, jobs: int = 1, pcache: cache.ProfileCache | None = None, overhead: float | None = None) -> _ProfileData | None:
+    try:
+        if overhead is not None:
+            # lines keep raw times
+            p = core.Profile(path, jobs=jobs, mapping=False)
+            c = core.correct_profile(p, overhead)
+            p._map_all()
+        else:
+            p = c = pcache.profile(path, jobs=jobs) if pcache else core.Profile(path, jobs=jobs)
+    except ProfileError:
+        return None
+
+    data = _ProfileData({}, [])
+    data.time = sum(s.self_time for s in c.scripts.values()) + sum(f.self_time or 0.0 for f in c.functions)
+    for f, cf in zip(p.functions, c.functions):
+        if not (f.mapped
+                or f.name.startswith(core._LAMBDA)):
+            data.warnings.append(f'Could not find line for function: {f.name}')
+        _add_times(data.function_times, f.name, (cf.called, cf.total_time or 0.0, cf.self_time or 0.0))
+    for s in p.scripts.values():
+        # line numbers, counts, and times without line continuations
+        linenos = array.array('L')
+        counts = array.array('q')
+        total_times = array.array('q')
+        self_times = array.array('q')
+        sl = s.lines
+        for i, line in enumerate(sl.text):
+            if not line.lstrip().startswith('\\'):
+                linenos.append(i + 1)
+                counts.append(sl.counts[i])
+                total_times.append(sl.total_times[i])
+                self_times.append(sl.self_times[i])
+        data.scripts[s.path] = (linenos, counts, total_times, self_times)
+        cs = c.scripts[s.path]
+        data.script_times[s.path] = (cs.sourced, cs.total_time, cs.self_time)
+    return data
+
+
+def _add_times(times: dict[str, budget.Times], name: str, v: budget.Times) -> None:
+    if (o := times.get(name)) is not None:
+        v = (o[0] + v[0], o[1] + v[1], o[2] + v[2])
+    times[name] = v
+
+
 class _CoverageConfig(coverage.config.CoverageConfig):
 
     def __init__(self) -> None:
@@ -198,6 +917,22 @@ if coverage.version_info < (6, 3):
 
 _COMMANDS = coverage.cmdline.COMMANDS if coverage.version_info >= (6, 3) else coverage.cmdline.CMDS
 _HELP_TOPICS = coverage.cmdline.HELP_TOPICS
+_PRIMULA_COMMANDS: set[str] = set()
+
+
+def _add_command(parser: coverage.cmdline.CmdOptionParser) -> None:
+    _COMMANDS[parser.cmd] = parser
+    _PRIMULA_COMMANDS.add(parser.cmd)
+    # insert into the list of commands
+    lines = coverage.cmdline.HELP_TOPICS['help'].split('\n')
+    cmds = [(i, m) for i, l in enumerate(lines) if (m := re.match(r'(\s+)([a-z]+)(\s{2,})\S', l))]
+    if not cmds:
+        return
+    i, m = next(((i, m) for i, m in cmds if m.group(2) > parser.cmd), (cmds[-1][0] + 1, cmds[-1][1]))
+    lines.insert(i, f'{m.group(1)}{parser.cmd:{len(m.group(2) + m.group(3))}}{parser.description}')
+    coverage.cmdline.HELP_TOPICS['help'] = '\n'.join(lines)
+
+
 # lcov
 _COMMANDS['lcov'] = _parser = coverage.cmdline.CmdOptionParser(
     'lcov',
@@ -221,8 +956,203 @@ _COMMANDS['lcov'] = _parser = coverage.cmdline.CmdOptionParser(
 if coverage.version_info < (6, 3):
     _parser.set_defaults(action='xml')
     _HELP_TOPICS['help'] = _HELP_TOPICS['help'].replace('  report', f'  lcov        {_parser.description}\n            report')
+# combine
+_jobs = optparse.make_option(
+    '-j', '--jobs', type='int', metavar='N',
+    help='Parse profiles with N processes. 0 means the number of CPUs.',
+)
+_COMMANDS['combine'].add_option(_jobs)
+_datafile_input = [
+    opt for a in [
+        'datafile_input', # 7.13.5+
+        'datafle_input',  # 7.3.3+
+        'input_datafile', # 6.3     ... 7.3.2
+    ]
+    if (opt := getattr(coverage.cmdline.Opts, a, None))
+]
+_raw = optparse.make_option(
+    '', '--raw', action='store_true',
+    help='Do not correct times for the overhead of profiling.',
+)
+_stat = optparse.make_option(
+    '', '--stat', type='choice', choices=bench.STATS, default='median', metavar='STAT',
+    help=f"Use STAT of times in bench files: {', '.join(bench.STATS)}. Defaults to 'median'.",
+)
+# affected
+_add_command(coverage.cmdline.CmdOptionParser(
+    'affected',
+    _datafile_input + coverage.cmdline.GLOBAL_ARGS,
+    usage='<file>[:<lines>] ...',
+    description='List tests which executed changed files or lines.',
+))
+# bench
+_add_command(coverage.cmdline.CmdOptionParser(
+    'bench',
+    [
+        _jobs,
+        optparse.make_option(
+            '-n', '--runs', type='int', default=10, metavar='N',
+            help='Run the command N times. Defaults to 10.',
+        ),
+        optparse.make_option(
+            '-o', '', action='store', dest='outfile', metavar='OUTFILE',
+            help=f"Write statistics of times to this file. Defaults to '{_BENCH_OUTPUT}'.",
+        ),
+        optparse.make_option(
+            '', '--timeout', type='float', metavar='SECONDS',
+            help='Kill a run which runs longer than SECONDS.',
+        ),
+    ] + coverage.cmdline.GLOBAL_ARGS,
+    usage='[options] <command> [command options]',
+    description='Run a command repeatedly, and record statistics of times.',
+))
+# calibrate
+_add_command(coverage.cmdline.CmdOptionParser(
+    'calibrate',
+    [
+        optparse.make_option(
+            '', '--timeout', type='float', metavar='SECONDS',
+            help='Kill Vim which runs longer than SECONDS.',
+        ),
+    ] + coverage.cmdline.GLOBAL_ARGS,
+    usage='[options] <vim> [vim options]',
+    description='Measure the overhead of profiling per line.',
+))
+# cache
+_add_command(coverage.cmdline.CmdOptionParser(
+    'cache',
+    coverage.cmdline.GLOBAL_ARGS,
+    usage='clear',
+    description='Manage the cache of parsed profiles.',
+))
+# export
+_add_command(coverage.cmdline.CmdOptionParser(
+    'export',
+    [
+        _jobs,
+        optparse.make_option(
+            '', '--format', type='choice', choices=tuple(_EXPORT_OUTPUT), default='callgrind', metavar='FORMAT',
+            help=f"Export in FORMAT: {', '.join(_EXPORT_OUTPUT)}. Defaults to 'callgrind'.",
+        ),
+        optparse.make_option(
+            '-o', '', action='store', dest='outfile', metavar='OUTFILE',
+            help=("Write the exported profile to this file, or stdout if '-'. "
+                  f"Defaults to {', '.join(repr(v) for v in _EXPORT_OUTPUT.values())} respectively."),
+        ),
+        _raw,
+        _stat,
+    ] + coverage.cmdline.GLOBAL_ARGS,
+    usage='[options] <profile> ...',
+    description='Export profiles to other formats.',
+))
+# hotspots
+_add_command(coverage.cmdline.CmdOptionParser(
+    'hotspots',
+    [
+        _jobs,
+        coverage.cmdline.Opts.include,
+        optparse.make_option(
+            '', '--json', action='store_true',
+            help='Write the hot spots as JSON.',
+        ),
+        optparse.make_option(
+            '-n', '--top', type='int', default=10, metavar='N',
+            help='Show the top N scripts, functions, and lines. Defaults to 10.',
+        ),
+        coverage.cmdline.Opts.omit,
+        optparse.make_option(
+            '', '--sort', type='choice', choices=hotspot.KEYS, default='self', metavar='KEY',
+            help=f"Rank by KEY: {', '.join(hotspot.KEYS)}. Defaults to 'self'.",
+        ),
+        _raw,
+        _stat,
+    ] + coverage.cmdline.GLOBAL_ARGS,
+    usage='[options] <profile> ...',
+    description='Rank scripts, functions, and lines of profiles by time.',
+))
+# merge
+_add_command(coverage.cmdline.CmdOptionParser(
+    'merge',
+    [
+        _jobs,
+        optparse.make_option(
+            '-o', '', action='store', dest='outfile', metavar='OUTFILE',
+            help='Write the merged profile to this file. Defaults to stdout.',
+        ),
+        _stat,
+    ] + coverage.cmdline.GLOBAL_ARGS,
+    usage='[options] <profile> ...',
+    description='Merge profiles into one profile.',
+))
+# minimize
+_add_command(coverage.cmdline.CmdOptionParser(
+    'minimize',
+    _datafile_input + [
+        optparse.make_option(
+            '-o', '', action='store', dest='outfile', metavar='OUTFILE',
+            help='Write the selected tests to this file as a manifest.',
+        ),
+    ] + coverage.cmdline.GLOBAL_ARGS,
+    usage='[options]',
+    description='Select the fastest tests which keep the coverage.',
+))
+# perfdiff
+_add_command(coverage.cmdline.CmdOptionParser(
+    'perfdiff',
+    [
+        _jobs,
+        optparse.make_option(
+            '', '--json', action='store_true',
+            help='Write the changes as JSON.',
+        ),
+        optparse.make_option(
+            '', '--relative', action='store_true',
+            help='Rank changes by their ratios to the base instead of their deltas.',
+        ),
+        optparse.make_option(
+            '-n', '--top', type='int', default=10, metavar='N',
+            help='Show the top N regressions and improvements. Defaults to 10.',
+        ),
+        optparse.make_option(
+            '', '--sort', type='choice', choices=perfdiff.KEYS, default='self', metavar='KEY',
+            help=f"Compare KEY: {', '.join(perfdiff.KEYS)}. Defaults to 'self'.",
+        ),
+        _raw,
+        _stat,
+        optparse.make_option(
+            '', '--threshold', type='float', default=0.0, metavar='SECONDS',
+            help='Ignore changes of time within SECONDS as noise. Defaults to 0.',
+        ),
+    ] + coverage.cmdline.GLOBAL_ARGS,
+    usage='[options] <base> <new>',
+    description='Compare times of scripts, functions, and lines between two profiles.',
+))
 # run
 _parser = _COMMANDS['run']
+_parser.add_option(optparse.make_option(
+    '-j', '--jobs', type='int', metavar='N',
+    help='Run commands with N processes. 0 means the number of CPUs.',
+))
+_parser.add_option(optparse.make_option(
+    '', '--manifest', action='store', metavar='FILE',
+    help=('Run commands listed in FILE, one per line. '
+          "Each line is substituted for '{}' in the command, or appended to it."),
+))
+_parser.add_option(optparse.make_option(
+    '', '--pool', action='store_true',
+    help=('Run scripts listed in the manifest in long-lived Vim processes. '
+          "The command sources primula's driver script in place of '{}'."),
+))
+_parser.add_option(optparse.make_option(
+    '', '--timeout', type='float', metavar='SECONDS',
+    help='Kill a command which runs longer than SECONDS.',
+))
+_parser.add_option(optparse.make_option(
+    '', '--total-timeout', type='float', metavar='SECONDS',
+    help='Kill all commands when they run longer than SECONDS in total.',
+))
+# move global options to the end
+_parser.option_list.sort(key=lambda o: o in coverage.cmdline.GLOBAL_ARGS)
 _parser.remove_option(coverage.cmdline.Opts.concurrency.get_opt_string())
 _parser.remove_option(coverage.cmdline.Opts.module.get_opt_string())
 _parser.remove_option(coverage.cmdline.Opts.pylib.get_opt_string())
@@ -245,7 +1175,7 @@ _HELP_TOPICS['minimum_help'] = (f'Code coverage for Vim script, version {__versi
 # version
 _HELP_TOPICS['version'] = f'{__package__}, version {__version__}'
 
-del _parser, _HELP_TOPICS, _COMMANDS
+del _datafile_input, _jobs, _parser, _raw, _stat, _HELP_TOPICS
 
 coverage.cmdline.CoverageScript = _CoverageScript
 coverage.cmdline.Coverage = _Coverage
@@ -1,24 +1,31 @@
 #
 # primula.core
 #
-#   Copyright (c) 2024-2025 Akinori Hattori <hattya@gmail.com>
+#   Copyright (c) 2024-2026 Akinori Hattori <hattya@gmail.com>
 #
 #   SPDX-License-Identifier: Apache-2.0
 #
 
 from __future__ import annotations
+import array
 import collections
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+import concurrent.futures
 import dataclasses
 import hashlib
+import io
+import itertools
+import mmap
 import os
 import re
+from typing import overload, IO
 
+from . import source
 from ._typing import Path
 from .exception import ProfileError
 
 
-__all__ = ['Profile', 'Script', 'Function', 'Line']
+__all__ = ['iter_profile', 'merge_profiles', 'subtract_profile', 'correct_profile', 'write_profile', 'Profile', 'Script', 'Function', 'Lines', 'Line']
 
 _SCRIPT = 'SCRIPT  '
 _SOURCED = 'Sourced '
@@ -33,45 +40,474 @@ _SELF_TIME = ' Self time: '
 _TOTALS = 'count  total (s)   self (s)'
 _TOTALS_NS = 'count     total (s)      self (s)'
 _SORT_LIST = 'FUNCTIONS SORTED ON '
+_SECTIONS = tuple(f'\n{s}'.encode() for s in (_SCRIPT, _FUNCTION))
 
 _LAMBDA = '<lambda>'
+# no data
+_NONE = -1
 
+_section_re = re.compile(b'^(?:%s)' % b'|'.join(re.escape(s.encode()) for s in (_SCRIPT, _FUNCTION, _SORT_LIST)), re.MULTILINE)
 _function_re = re.compile(r'\bfu(?:n(?:c(?:t(?:i(?:o(?:n)?)?)?)?)?)?!?\b')
 _noexec_line_re = re.compile(r'^\s*(?:$|")')
 
 
+def iter_profile(path: Path) -> Iterator[Script | Function]:
+    with open(path, encoding='utf-8') as fp:
+        yield from _Parser(fp, str(path))
+
+
+def merge_profiles(profiles: Iterable[Profile]) -> Profile:
+    scripts: dict[str, Script] = {}
+    functions: dict[tuple[str | int | None, ...], Function] = {}
+    for p in profiles:
+        for s in p.scripts.values():
+            if (ms := scripts.get(s.path)) is None:
+                scripts[s.path] = Script(s.path, s.sourced, s.total_time, s.self_time, lines=s.lines[:])
+            else:
+                ms.sourced += s.sourced
+                ms.total_time += s.total_time
+                ms.self_time += s.self_time
+                _merge_lines(ms.lines, s.lines, f'SCRIPT  {s.path}')
+        for f in p.functions:
+            k = _function_key(f)
+            if (mf := functions.get(k)) is None:
+                functions[k] = mf = Function(f.name, f.called, f.total_time, f.self_time, lines=f.lines[:])
+                mf.defined = f.defined
+                mf.mapped = f.mapped
+            else:
+                mf.called += f.called
+                mf.total_time = _add_time(mf.total_time, f.total_time)
+                mf.self_time = _add_time(mf.self_time, f.self_time)
+                _merge_lines(mf.lines, f.lines, f'FUNCTION  {f.name}')
+    return Profile._new('', scripts.values(), functions.values())
+
+
+def subtract_profile(profile: Profile, base: Profile) -> Profile:
+    # profiles must be unmapped, and dumped by the same Vim process
+    bfuncs = {f.name: f for f in base.functions}
+    functions = []
+    for f in profile.functions:
+        if ((bf := bfuncs.get(f.name)) is None
+            or f.called < bf.called
+            or f.lines.text != bf.lines.text):
+            # redefined
+            sf = Function(f.name, f.called, f.total_time, f.self_time, lines=f.lines[:])
+        elif f.called > bf.called:
+            sf = Function(f.name, f.called - bf.called, _sub_time(f.total_time, bf.total_time), _sub_time(f.self_time, bf.self_time),
+                          lines=_subtract_lines(f.lines, bf.lines))
+        else:
+            continue
+        sf.defined = f.defined
+        functions.append(sf)
+    # scripts where functions are defined
+    defined = {f.defined[0] for f in functions if f.defined}
+    scripts = []
+    for s in profile.scripts.values():
+        if ((bs := base.scripts.get(s.path)) is None
+            or s.sourced < bs.sourced
+            or s.lines.text != bs.lines.text):
+            scripts.append(Script(s.path, s.sourced, s.total_time, s.self_time, lines=s.lines[:]))
+        elif (s.sourced > bs.sourced
+              or s.path in defined):
+            scripts.append(Script(s.path, s.sourced - bs.sourced, s.total_time - bs.total_time, s.self_time - bs.self_time,
+                                  lines=_subtract_lines(s.lines, bs.lines)))
+    return Profile._new(profile.path, scripts, functions)
+
+
+def correct_profile(profile: Profile, overhead: float) -> Profile:
+    # profiles must be unmapped, and the overhead is per executed line
+    scripts = []
+    for s in profile.scripts.values():
+        t = _executed(s.lines) * overhead
+        scripts.append(Script(s.path, s.sourced, max(s.total_time - t, 0.0), max(s.self_time - t, 0.0),
+                              lines=_correct_lines(s.lines, overhead)))
+    functions = []
+    for f in profile.functions:
+        t = _executed(f.lines) * overhead
+        cf = Function(f.name, f.called, _correct_time(f.total_time, t), _correct_time(f.self_time, t),
+                      lines=_correct_lines(f.lines, overhead))
+        cf.defined = f.defined
+        functions.append(cf)
+    return Profile._new(profile.path, scripts, functions)
+
+
+def write_profile(profile: Profile, fp: IO[str]) -> None:
+    # use the ns format only when it is required
+    lines = [s.lines for s in profile.scripts.values()] + [f.lines for f in profile.functions]
+    ns = any(t % 1000
+             for l in lines
+             for a in (l.total_times, l.self_times)
+             for t in a if t != _NONE)
+    totals = _TOTALS_NS if ns else _TOTALS
+    for s in profile.scripts.values():
+        fp.write(f'{_SCRIPT}{s.path}\n'
+                 f'{_SOURCED}{_times(s.sourced)}\n'
+                 f'{_TOTAL_TIME}{_format_sec(s.total_time, ns)}\n'
+                 f'{_SELF_TIME}{_format_sec(s.self_time, ns)}\n'
+                 '\n'
+                 f'{totals}\n')
+        _write_lines(fp, s.lines, ns, True)
+        fp.write('\n')
+    for f in profile.functions:
+        fp.write(f'{_FUNCTION}{f.name}\n')
+        if f.defined:
+            fp.write(f'{_DEFINED}{f.defined[0]}:{f.defined[1]}\n')
+        fp.write(f'{_CALLED}{_times(f.called)}\n')
+        if f.total_time is not None:
+            fp.write(f'{_TOTAL_TIME}{_format_sec(f.total_time, ns)}\n')
+        if f.self_time is not None:
+            fp.write(f'{_SELF_TIME}{_format_sec(f.self_time, ns)}\n')
+        fp.write('\n'
+                 f'{totals}\n')
+        _write_lines(fp, f.lines, ns, False)
+        fp.write('\n')
+    for name, attr in (('TOTAL', 'total_time'), ('SELF', 'self_time')):
+        fp.write(f'{_SORT_LIST}{name} TIME\n'
+                 f'{totals}  function\n')
+        for f in sorted(profile.functions, key=lambda f: getattr(f, attr) or 0.0, reverse=True):
+            fp.write(f'{f.called:5} {_format_sec(f.total_time, ns)} {_format_sec(f.self_time, ns)}  {f.name}\n')
+        fp.write('\n')
+
+
 class Profile:
 
-    scripts: dict[str, Script]
-    functions: list[Function]
+    scripts: Mapping[str, Script]
+    functions: Sequence[Function]
 
-    def __init__(self, path: Path) -> None:
+    def __init__(self, path: Path, jobs: int = 1, lazy: bool = False, mapping: bool = True) -> None:
         self.path = path
-        self.scripts = {}
-        self.functions = []
-
-        self._lineno = 0
-        self._parse()
-        self._map_all()
+        if lazy:
+            self._index()
+        else:
+            self._parse(jobs)
+            if mapping:
+                self._map_all()
 
-    def _parse(self) -> None:
-        with open(self.path, encoding='utf-8') as fp:
-            self._fp = fp
-            try:
-                while True:
-                    l = self._readline()
+    @classmethod
+    def _new(cls, path: Path, scripts: Iterable[Script], functions: Iterable[Function]) -> Profile:
+        self = cls.__new__(cls)
+        self.path = path
+        self.scripts = {s.path: s for s in scripts}
+        self.functions = list(functions)
+        return self
+
+    def _parse(self, jobs: int) -> None:
+        scripts = {}
+        functions = []
+        for o in self._parse_chunks(jobs) if jobs > 1 else iter_profile(self.path):
+            if isinstance(o, Script):
+                scripts[o.path] = o
+            else:
+                functions.append(o)
+        self.scripts = scripts
+        self.functions = functions
+
+    def _index(self) -> None:
+        self._sections: dict[str, _Section] = {}
+        self._fsections: list[_Section] = []
+        self._defined: dict[str, list[int]] = {}
+        self._loaded: dict[str, Script] = {}
+        self._floaded: dict[int, Function] = {}
+        self._eager = False
+        with open(self.path, 'rb') as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                raise ProfileError('unexpected line', str(self.path), 1)
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                sect = None
+                for m in _section_re.finditer(mm):
+                    if sect:
+                        sect.end = m.start()
+                    l, pos = _getline(mm, m.start())
                     if l.startswith(_SCRIPT):
-                        self._parse_script(l[len(_SCRIPT):])
+                        sect = _Section(l[len(_SCRIPT):], m.start())
+                        self._sections[sect.name] = sect
                     elif l.startswith(_FUNCTION):
-                        self._parse_function(l[len(_FUNCTION):])
-                    elif l.startswith(_SORT_LIST):
-                        break
+                        sect = _Section(l[len(_FUNCTION):], m.start())
+                        if (l := _getline(mm, pos)[0]).startswith(_DEFINED):
+                            sect.defined = _parse_defined(l)
+                        elif not sect.name.startswith(_LAMBDA):
+                            # Vim 8.1.2054-
+                            self._eager = True
+                        if sect.defined:
+                            self._defined.setdefault(sect.defined[0], []).append(len(self._fsections))
+                        self._fsections.append(sect)
                     else:
-                        raise self._error('unexpected line')
-            finally:
-                del self._fp
+                        break
+                else:
+                    if sect:
+                        sect.end = len(mm)
+        self.scripts = _LazyScripts(self)
+        self.functions = _LazyFunctions(self)
+
+    def function(self, name: str) -> Function:
+        if isinstance(self.functions, _LazyFunctions):
+            for i, sect in enumerate(self._fsections):
+                if sect.name == name:
+                    return self.functions[i]
+        else:
+            for f in self.functions:
+                if f.name == name:
+                    return f
+        raise KeyError(name)
+
+    def _load_script(self, path: str) -> Script:
+        if self._eager:
+            self._load_all()
+        if path not in self._loaded:
+            s = self._load_section(self._sections[path])
+            assert isinstance(s, Script)
+            # functions defined in the script
+            functions = [self._load_function(i, mapping=False) for i in self._defined.get(path, ())]
+            for f in functions:
+                if not f.name.startswith(_LAMBDA):
+                    assert f.defined is not None
+                    self._map(s, f.defined[1], f)
+            for f in functions:
+                self._propagate(s, f)
+            self._loaded[path] = s
+        return self._loaded[path]
+
+    def _load_function(self, i: int, mapping: bool = True) -> Function:
+        if self._eager:
+            self._load_all()
+        if i not in self._floaded:
+            sect = self._fsections[i]
+            f = self._load_section(sect)
+            assert isinstance(f, Function)
+            self._floaded[i] = f
+            if (mapping
+                and sect.defined
+                and sect.defined[0] in self._sections):
+                self._load_script(sect.defined[0])
+        return self._floaded[i]
+
+    def _load_section(self, sect: _Section) -> Script | Function:
+        try:
+            sections, _ = _parse_chunk(self.path, sect.start, sect.end)
+        except ProfileError as e:
+            with open(self.path, 'rb') as fp:
+                e.lineno += fp.read(sect.start).count(b'\n')
+            raise
+        return sections[0]
+
+    def _load_all(self) -> None:
+        self._eager = False
+        scripts, functions = self.scripts, self.functions
+        self._parse(1)
+        self._map_all()
+        self._loaded = dict(self.scripts)
+        self._floaded = dict(enumerate(self.functions))
+        self.scripts, self.functions = scripts, functions
+
+    def _parse_chunks(self, jobs: int) -> Iterator[Script | Function]:
+        offsets = _split(self.path, jobs)
+        if len(offsets) < 3:
+            yield from iter_profile(self.path)
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(len(offsets) - 1) as executor:
+            futures = [executor.submit(_parse_chunk, self.path, offsets[i], offsets[i+1]) for i in range(len(offsets) - 1)]
+            lineno = 0
+            for fut in futures:
+                try:
+                    sections, n = fut.result()
+                except ProfileError as e:
+                    e.lineno += lineno
+                    for fut in futures:
+                        fut.cancel()
+                    raise
+                yield from sections
+                lineno += n
+
+    def _map_all(self) -> None:
+        # by defined
+        unknown: dict[bytes, list[Function]] = {}
+        for f in self.functions:
+            if f.name.startswith(_LAMBDA):
+                continue
+            elif f.defined:
+                # scripts can be excluded from profiling
+                if (s := self.scripts.get(f.defined[0])) is not None:
+                    self._map(s, f.defined[1], f)
+            else:
+                m = hashlib.new('sha512')
+                for l in f.lines.text:
+                    m.update(l.encode('utf-8'))
+                k = m.digest()
+                if k not in unknown:
+                    unknown[k] = []
+                unknown[k].append(f)
+        if not unknown:
+            # propagate to nested functions
+            for f in self.functions:
+                assert f.defined is not None
+                if (s := self.scripts.get(f.defined[0])) is not None:
+                    self._propagate(s, f)
+            return
+
+        # by first lines
+        index: dict[str | None, list[tuple[int, Function]]] = {}
+        seq = itertools.count()
+        for v in unknown.values():
+            if len(v) == 1:
+                f = v[0]
+                index.setdefault(_first_line(f), []).append((next(seq), f))
+        queue: collections.deque[Script | Function] = collections.deque(self.functions)
+        queue.extend(self.scripts.values())
+        rels = {}
+        while queue:
+            b = queue.popleft()
+            i = 0
+            while True:
+                count = b.lines.counts[i]
+                line = b.lines.text[i]
+                i += 1
+                if i >= len(b.lines):
+                    break
+                elif (count == _NONE
+                      or not _function_re.search(line)):
+                    continue
+                # candidates which start with the next line, or are empty
+                keys = dict.fromkeys((b.lines.text[i], self._logical_line(b.lines, i), None))
+                for n, f in sorted(itertools.chain.from_iterable(index.get(k, ()) for k in keys), key=lambda v: v[0]):
+                    j = self._map(b, i, f)
+                    if f.mapped:
+                        index[_first_line(f)].remove((n, f))
+                        i = j
+                        # relations
+                        rels[f.name] = (b, f)
+                        if (isinstance(b, Function)
+                            and b.name in rels):
+                            # propagate to outer functions
+                            b, f = rels.pop(b.name)
+                            f.mapped = False
+                            queue.appendleft(b)
+                            index.setdefault(_first_line(f), []).append((next(seq), f))
+                        break
+
+    def _propagate(self, script: Script, function: Function) -> None:
+        assert function.defined is not None
+        sl = script.lines
+        fl = function.lines
+        i = 0
+        for j in range(function.defined[1], len(sl)):
+            if i >= len(fl):
+                break
+            elif sl.text[j].lstrip().startswith('\\'):
+                continue
+            if fl.counts[i] == _NONE:
+                fl.counts[i], fl.total_times[i], fl.self_times[i] = sl.counts[j], sl.total_times[j], sl.self_times[j]
+            i += 1
+
+    def _logical_line(self, lines: Lines, i: int) -> str:
+        line = lines.text[i]
+        for j in range(i + 1, len(lines)):
+            next_line = lines.text[j].lstrip()
+            if not next_line.startswith('\\'):
+                break
+            line += next_line[1:]
+        return line
+
+    def _map(self, block: Script | Function, defined: int, function: Function) -> int:
+        bl = block.lines
+        fl = function.lines
+        i = defined
+        for k, fline in enumerate(fl.text):
+            line = bl.text[i]
+            j = i + 1
+            if line != fline:
+                # check for line continuation
+                for n in range(j, len(bl)):
+                    next_line = bl.text[n].lstrip()
+                    if not next_line.startswith('\\'):
+                        break
+                    line += next_line[1:]
+                    j += 1
+                if line != fline:
+                    # revert
+                    bl.counts[defined:i] = bl.total_times[defined:i] = bl.self_times[defined:i] = array.array('q', (_NONE,)) * (i - defined)
+                    return -1
+            for n in range(i, j):
+                if bl.counts[n] == _NONE:
+                    bl.counts[n], bl.total_times[n], bl.self_times[n] = fl.counts[k], fl.total_times[k], fl.self_times[k]
+            i = j
+        else:
+            function.mapped = True
+        return i
+
+
+def _getline(mm: mmap.mmap, pos: int) -> tuple[str, int]:
+    end = mm.find(b'\n', pos) + 1 or len(mm)
+    return mm[pos:end].decode('utf-8').rstrip('\r\n'), end
+
+
+def _split(path: Path, n: int) -> list[int]:
+    # split at section boundaries
+    offsets = [0]
+    with open(path, 'rb') as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if size == 0:
+            return offsets
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(1, n):
+                pos = max(size * i // n, offsets[-1])
+                cands = [off for sect in _SECTIONS if (off := _find_section(mm, sect, pos)) >= 0]
+                if not cands:
+                    break
+                elif (off := min(cands)) > offsets[-1]:
+                    offsets.append(off)
+    offsets.append(size)
+    return offsets
+
 
-    def _parse_script(self, name: str) -> None:
+def _find_section(mm: mmap.mmap, sect: bytes, pos: int) -> int:
+    while (i := mm.find(sect, max(pos, 2))) >= 0:
+        # preceded by an empty line
+        if (mm[i-1:i+1] == b'\n\n'
+            or mm[i-2:i+1] == b'\n\r\n'):
+            return i + 1
+        pos = i + 1
+    return -1
+
+
+def _parse_chunk(path: Path, start: int, end: int) -> tuple[list[Script | Function], int]:
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        data = fp.read(end - start)
+    with io.TextIOWrapper(io.BytesIO(data), encoding='utf-8') as tp:
+        sections = list(_Parser(tp, str(path), partial=True))
+    return sections, data.count(b'\n')
+
+
+class _Parser:
+
+    def __init__(self, fp: IO[str], path: str, partial: bool = False) -> None:
+        self._fp = fp
+        self._path = path
+        self._partial = partial
+        self._lineno = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Script | Function]:
+        n = 0
+        while True:
+            l = self._readline()
+            if (self._eof
+                and (self._partial or n)):
+                # no functions are profiled
+                break
+            elif l.startswith(_SCRIPT):
+                yield self._parse_script(l[len(_SCRIPT):])
+                n += 1
+            elif l.startswith(_FUNCTION):
+                yield self._parse_function(l[len(_FUNCTION):])
+                n += 1
+            elif l.startswith(_SORT_LIST):
+                break
+            else:
+                raise self._error('unexpected line')
+
+    def _parse_script(self, name: str) -> Script:
         sourced = 0
         total_time = self_time = 0.0
         while True:
@@ -89,34 +525,40 @@ class Profile:
                 raise self._error('cannot parse SCRIPT')
 
         s = Script(name, sourced, total_time, self_time)
-        s.lines.extend(self._parse_lines(True, col))
+        self._parse_lines(s.lines, True, col)
         if s.lines:
             # Vim 8.0.1206-
             self._adjust_script(s)
-        self.scripts[s.path] = s
+        return s
 
     def _adjust_script(self, script: Script) -> None:
+        sl = script.lines
         # first line
-        if (script.lines[0].count is None
-            and not _noexec_line_re.match(script.lines[0].line)):
-            script.lines[0].count = script.sourced
+        if (sl.counts[0] == _NONE
+            and not _noexec_line_re.match(sl.text[0])):
+            sl.counts[0] = script.sourced
         # last lines with line continuation
         try:
-            with open(script.path, encoding='utf-8') as fp:
-                lines = fp.read().splitlines()
+            src = source.get(script.path)
         except OSError:
             return
-        if (len(lines) > len(script.lines)
-            and lines[-1].lstrip().startswith('\\')):
-            for i, sl in enumerate(script.lines):
-                if sl.line != lines[i]:
+        lines = src.lines
+        if (len(lines) > len(sl)
+            and len(lines) in src.continuations):
+            for i, l in enumerate(sl.text):
+                if l != lines[i]:
                     return
-            script.lines += (dataclasses.replace(script.lines[-1], line=l) for l in lines[i+1:] if l.lstrip().startswith('\\'))
-            if len(script.lines) != len(lines):
+            for n in range(i + 2, len(lines) + 1):
+                if n in src.continuations:
+                    sl.counts.append(sl.counts[-1])
+                    sl.total_times.append(sl.total_times[-1])
+                    sl.self_times.append(sl.self_times[-1])
+                    sl.text.append(lines[n-1])
+            if len(sl) != len(lines):
                 # revert
-                script.lines = script.lines[:i+1]
+                del sl[i+1:]
 
-    def _parse_function(self, name: str) -> None:
+    def _parse_function(self, name: str) -> Function:
         called = 0
         total_time = self_time = 0.0
         defined = None
@@ -129,16 +571,7 @@ class Profile:
             elif l.startswith(_SELF_TIME):
                 self_time = float(l.split(':')[1])
             elif l.startswith(_DEFINED):
-                i = l.rfind(':')
-                if (i > 0
-                    and l[i+1:].isdigit()):
-                    # Vim 8.1.2055+
-                    off = 1
-                else:
-                    # Vim 8.1.2054-
-                    i = l.rindex(' line ')
-                    off = 6
-                defined = (l[len(_DEFINED):i], l[i+off:])
+                defined = _parse_defined(l)
             elif l in (_TOTALS, _TOTALS_NS):
                 col = len(l)
                 break
@@ -146,12 +579,11 @@ class Profile:
                 raise self._error('cannot parse FUNCTION')
 
         f = Function(name, called, total_time, self_time)
-        if defined:
-            f.defined = (os.path.expanduser(defined[0].lstrip()), max(int(defined[1]), 1))
-        f.lines.extend(self._parse_lines(False, col))
-        self.functions.append(f)
+        f.defined = defined
+        self._parse_lines(f.lines, False, col)
+        return f
 
-    def _parse_lines(self, script: bool, col: int) -> Iterator[Line]:
+    def _parse_lines(self, lines: Lines, script: bool, col: int) -> None:
         ns = col == len(_TOTALS_NS)
         i = len('count')
         while True:
@@ -170,114 +602,27 @@ class Profile:
             if not l[col+1:].lstrip().startswith('\\'):
                 # count
                 s = l[:i].lstrip()
-                count = int(s) if s else None
+                count = int(s) if s else _NONE
                 # total time
                 j = i + (col - i) // 2
                 s = l[i+1:j].lstrip()
-                total_time = float(s) if s else None
+                total_time = _to_ns(s) if s else _NONE
                 # self time
                 s = l[j+1:col].lstrip()
-                self_time = float(s) if s else None
-            yield Line(count, total_time, self_time, l[col+1:])
+                self_time = _to_ns(s) if s else _NONE
+            lines.counts.append(count)
+            lines.total_times.append(total_time)
+            lines.self_times.append(self_time)
+            lines.text.append(l[col+1:])
 
     def _readline(self) -> str:
-        l = self._fp.readline().rstrip(os.linesep)
+        l = self._fp.readline()
         self._lineno += 1
-        return l
+        self._eof = not l
+        return l.rstrip(os.linesep)
 
     def _error(self, msg: str) -> Exception:
-        return ProfileError(msg, str(self.path), self._lineno)
-
-    def _map_all(self) -> None:
-        # by defined
-        unknown: dict[bytes, list[Function]] = {}
-        for f in self.functions:
-            if f.name.startswith(_LAMBDA):
-                continue
-            elif f.defined:
-                self._map(self.scripts[f.defined[0]], f.defined[1], f)
-            else:
-                m = hashlib.new('sha512')
-                for l in f.lines:
-                    m.update(l.line.encode('utf-8'))
-                k = m.digest()
-                if k not in unknown:
-                    unknown[k] = []
-                unknown[k].append(f)
-        if not unknown:
-            # propagate to nested functions
-            for f in self.functions:
-                assert f.defined is not None
-                s = self.scripts[f.defined[0]]
-                i = 0
-                for sl in s.lines[f.defined[1]:]:
-                    if i >= len(f.lines):
-                        break
-                    elif sl.line.lstrip().startswith('\\'):
-                        continue
-                    if (fl := f.lines[i]).count is None:
-                        fl.count, fl.total_time, fl.self_time = sl.count, sl.total_time, sl.self_time
-                    i += 1
-            return
-
-        # by brute force
-        functions = [v[0] for v in unknown.values() if len(v) == 1]
-        queue: collections.deque[Script | Function] = collections.deque(self.functions)
-        queue.extend(self.scripts.values())
-        rels = {}
-        while queue:
-            b = queue.popleft()
-            i = 0
-            while True:
-                bl = b.lines[i]
-                i += 1
-                if i >= len(b.lines):
-                    break
-                elif (bl.count is None
-                      or not _function_re.search(bl.line)):
-                    continue
-                for f in functions:
-                    j = self._map(b, i, f)
-                    if f.mapped:
-                        functions.remove(f)
-                        i = j
-                        # relations
-                        rels[f.name] = (b, f)
-                        if (isinstance(b, Function)
-                            and b.name in rels):
-                            # propagate to outer functions
-                            b, f = rels.pop(b.name)
-                            f.mapped = False
-                            queue.appendleft(b)
-                            functions.append(f)
-                        break
-
-    def _map(self, block: Script | Function, defined: int, function: Function) -> int:
-        i = defined
-        for fl in function.lines:
-            bl = block.lines[i]
-            j = i + 1
-            if bl.line != fl.line:
-                # check for line continuation
-                line = bl.line
-                for bl in block.lines[j:]:
-                    next_line = bl.line.lstrip()
-                    if not next_line.startswith('\\'):
-                        break
-                    line += next_line[1:]
-                    j += 1
-                if line != fl.line:
-                    # revert
-                    for bl in block.lines[defined:i]:
-                        bl.count = bl.total_time = bl.self_time = None
-                    return -1
-            for bl in block.lines[i:j]:
-                if bl.count is None:
-                    bl.count, bl.total_time, bl.self_time = fl.count, fl.total_time, fl.self_time
-            i = j
-        else:
-            function.mapped = True
-        return i
+        return ProfileError(msg, self._path, self._lineno)
 
 
 @dataclasses.dataclass
@@ -287,7 +632,7 @@ class Script:
     sourced: int
     total_time: float
     self_time: float
-    lines: list[Line] = dataclasses.field(default_factory=list)
+    lines: Lines = dataclasses.field(default_factory=lambda: Lines())
 
 
 @dataclasses.dataclass
@@ -298,15 +643,322 @@ class Function:
     called: int
     total_time: float | None
     self_time: float | None
-    lines: list[Line] = dataclasses.field(default_factory=list)
+    lines: Lines = dataclasses.field(default_factory=lambda: Lines())
 
     mapped: bool = dataclasses.field(default=False, init=False)
 
 
-@dataclasses.dataclass
+class Lines:
+
+    __slots__ = ('counts', 'total_times', 'self_times', 'text')
+
+    counts: array.array[int]
+    total_times: array.array[int]
+    self_times: array.array[int]
+    text: list[str]
+
+    def __init__(self, lines: Iterable[Line] = ()) -> None:
+        self.counts = array.array('q')
+        self.total_times = array.array('q')
+        self.self_times = array.array('q')
+        self.text = []
+        self.extend(lines)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @overload
+    def __getitem__(self, key: int) -> Line: ...
+
+    @overload
+    def __getitem__(self, key: slice) -> Lines: ...
+
+    def __getitem__(self, key: int | slice) -> Line | Lines:
+        if isinstance(key, slice):
+            lines = Lines()
+            lines.counts = self.counts[key]
+            lines.total_times = self.total_times[key]
+            lines.self_times = self.self_times[key]
+            lines.text = self.text[key]
+            return lines
+        return Line._view(self, range(len(self.text))[key])
+
+    def __delitem__(self, key: int | slice) -> None:
+        del self.counts[key]
+        del self.total_times[key]
+        del self.self_times[key]
+        del self.text[key]
+
+    def __iter__(self) -> Iterator[Line]:
+        for i in range(len(self.text)):
+            yield Line._view(self, i)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Lines):
+            return NotImplemented
+        return (self.counts == other.counts
+                and self.total_times == other.total_times
+                and self.self_times == other.self_times
+                and self.text == other.text)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({list(self)!r})'
+
+    def append(self, line: Line) -> None:
+        l = line._lines
+        i = line._i
+        self.counts.append(l.counts[i])
+        self.total_times.append(l.total_times[i])
+        self.self_times.append(l.self_times[i])
+        self.text.append(l.text[i])
+
+    def extend(self, lines: Iterable[Line]) -> None:
+        for l in lines:
+            self.append(l)
+
+
 class Line:
 
-    count: int | None
-    total_time: float | None
-    self_time: float | None
-    line: str
+    __slots__ = ('_lines', '_i')
+
+    _lines: Lines
+    _i: int
+
+    def __init__(self, count: int | None, total_time: float | None, self_time: float | None, line: str) -> None:
+        self._lines = Lines()
+        self._lines.counts.append(_NONE)
+        self._lines.total_times.append(_NONE)
+        self._lines.self_times.append(_NONE)
+        self._lines.text.append(line)
+        self._i = 0
+        self.count = count
+        self.total_time = total_time
+        self.self_time = self_time
+
+    @classmethod
+    def _view(cls, lines: Lines, i: int) -> Line:
+        self = cls.__new__(cls)
+        self._lines = lines
+        self._i = i
+        return self
+
+    @property
+    def count(self) -> int | None:
+        v = self._lines.counts[self._i]
+        return v if v != _NONE else None
+
+    @count.setter
+    def count(self, count: int | None) -> None:
+        self._lines.counts[self._i] = count if count is not None else _NONE
+
+    @property
+    def total_time(self) -> float | None:
+        v = self._lines.total_times[self._i]
+        return v / 1e9 if v != _NONE else None
+
+    @total_time.setter
+    def total_time(self, total_time: float | None) -> None:
+        self._lines.total_times[self._i] = round(total_time * 1e9) if total_time is not None else _NONE
+
+    @property
+    def self_time(self) -> float | None:
+        v = self._lines.self_times[self._i]
+        return v / 1e9 if v != _NONE else None
+
+    @self_time.setter
+    def self_time(self, self_time: float | None) -> None:
+        self._lines.self_times[self._i] = round(self_time * 1e9) if self_time is not None else _NONE
+
+    @property
+    def line(self) -> str:
+        return self._lines.text[self._i]
+
+    @line.setter
+    def line(self, line: str) -> None:
+        self._lines.text[self._i] = line
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Line):
+            return NotImplemented
+        return (self.count, self.total_time, self.self_time, self.line) == (other.count, other.total_time, other.self_time, other.line)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(count={self.count!r}, total_time={self.total_time!r}, self_time={self.self_time!r}, line={self.line!r})'
+
+
+class _LazyScripts(Mapping[str, Script]):
+
+    def __init__(self, profile: Profile) -> None:
+        self._profile = profile
+
+    def __getitem__(self, path: str) -> Script:
+        return self._profile._load_script(path)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._profile._sections)
+
+    def __len__(self) -> int:
+        return len(self._profile._sections)
+
+
+class _LazyFunctions(Sequence[Function]):
+
+    def __init__(self, profile: Profile) -> None:
+        self._profile = profile
+
+    @overload
+    def __getitem__(self, key: int) -> Function: ...
+
+    @overload
+    def __getitem__(self, key: slice) -> list[Function]: ...
+
+    def __getitem__(self, key: int | slice) -> Function | list[Function]:
+        r = range(len(self))
+        if isinstance(key, slice):
+            return [self._profile._load_function(i) for i in r[key]]
+        return self._profile._load_function(r[key])
+
+    def __len__(self) -> int:
+        return len(self._profile._fsections)
+
+
+@dataclasses.dataclass
+class _Section:
+
+    name: str
+    start: int
+    end: int = -1
+    defined: tuple[str, int] | None = None
+
+
+def _parse_defined(l: str) -> tuple[str, int]:
+    i = l.rfind(':')
+    if (i > 0
+        and l[i+1:].isdigit()):
+        # Vim 8.1.2055+
+        off = 1
+    else:
+        # Vim 8.1.2054-
+        i = l.rindex(' line ')
+        off = 6
+    return (os.path.expanduser(l[len(_DEFINED):i].lstrip()), max(int(l[i+off:]), 1))
+
+
+def _first_line(function: Function) -> str | None:
+    return function.lines.text[0] if function.lines else None
+
+
+def _function_key(function: Function) -> tuple[str | int | None, ...]:
+    if function.name.startswith('<SNR>'):
+        # script IDs differ between runs
+        name = function.name.partition('_')[2]
+        if function.defined:
+            return (*function.defined, name)
+        return (None, name, *function.lines.text)
+    elif (function.name[0].isdigit()
+          or function.name.startswith(_LAMBDA)):
+        # numbered on each run, and defined more than once in a line
+        return (*(function.defined or (None,)), None, *function.lines.text)
+    # functions defined by :execute share the line
+    return (function.name,)
+
+
+def _merge_lines(lines: Lines, other: Lines, name: str) -> None:
+    if lines.text != other.text:
+        raise ValueError(f'lines are mismatched: {name}')
+    lines.counts = array.array('q', map(_add_ns, lines.counts, other.counts))
+    lines.total_times = array.array('q', map(_add_ns, lines.total_times, other.total_times))
+    lines.self_times = array.array('q', map(_add_ns, lines.self_times, other.self_times))
+
+
+def _subtract_lines(lines: Lines, other: Lines) -> Lines:
+    l = Lines()
+    l.text = lines.text[:]
+    for i, count in enumerate(lines.counts):
+        if (count == _NONE
+            or (count := count - max(other.counts[i], 0)) == 0):
+            # not executed
+            l.counts.append(_NONE)
+            l.total_times.append(_NONE)
+            l.self_times.append(_NONE)
+        else:
+            l.counts.append(count)
+            l.total_times.append(_sub_ns(lines.total_times[i], other.total_times[i]))
+            l.self_times.append(_sub_ns(lines.self_times[i], other.self_times[i]))
+    return l
+
+
+def _correct_lines(lines: Lines, overhead: float) -> Lines:
+    l = lines[:]
+    for i, count in enumerate(l.counts):
+        if count == _NONE:
+            continue
+        t = round(count * overhead * 1e9)
+        if l.total_times[i] != _NONE:
+            l.total_times[i] = max(l.total_times[i] - t, 0)
+        if l.self_times[i] != _NONE:
+            l.self_times[i] = max(l.self_times[i] - t, 0)
+    return l
+
+
+def _executed(lines: Lines) -> int:
+    # lines with line continuation are counted once
+    return sum(count for i, count in enumerate(lines.counts)
+               if (count != _NONE
+                   and not lines.text[i].lstrip().startswith('\\')))
+
+
+def _add_ns(a: int, b: int) -> int:
+    return a + b if a != _NONE and b != _NONE else max(a, b)
+
+
+def _add_time(a: float | None, b: float | None) -> float | None:
+    return a + b if a is not None and b is not None else a if a is not None else b
+
+
+def _sub_ns(a: int, b: int) -> int:
+    return a - b if a != _NONE and b != _NONE else a
+
+
+def _sub_time(a: float | None, b: float | None) -> float | None:
+    return a - b if a is not None and b is not None else a
+
+
+def _correct_time(t: float | None, overhead: float) -> float | None:
+    return max(t - overhead, 0.0) if t is not None else None
+
+
+def _write_lines(fp: IO[str], lines: Lines, ns: bool, script: bool) -> None:
+    for i, text in enumerate(lines.text):
+        count = lines.counts[i]
+        if (count == _NONE
+            or text.lstrip().startswith('\\')):
+            # Vim does not output columns of the ns format for lines without count in scripts
+            fp.write(f'{"":{len(_TOTALS_NS if ns and not script else _TOTALS)}} {text}\n')
+        else:
+            fp.write(f'{count:5} {_format_ns(lines.total_times[i], ns)} {_format_ns(lines.self_times[i], ns)} {text}\n')
+
+
+def _format_ns(t: int, ns: bool) -> str:
+    if ns:
+        return f'{f"{t // 1_000_000_000}.{t % 1_000_000_000:09d}" if t != _NONE else "":>13}'
+    return f'{f"{t // 1_000_000_000}.{t % 1_000_000_000 // 1000:06d}" if t != _NONE else "":>10}'
+
+
+def _format_sec(t: float | None, ns: bool) -> str:
+    if t is None:
+        return ' ' * (13 if ns else 10)
+    return f'{t:13.9f}' if ns else f'{t:10.6f}'
+
+
+def _times(n: int) -> str:
+    return f'{n} time' if n == 1 else f'{n} times'
+
+
+def _to_ns(s: str) -> int:
+    sec, _, frac = s.partition('.')
+    return int(sec) * 1_000_000_000 + int(frac[:9].ljust(9, '0'))
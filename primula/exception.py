@@ -1,21 +1,31 @@
 #
 # primula.exception
 #
-#   Copyright (c) 2024 Akinori Hattori <hattya@gmail.com>
+#   Copyright (c) 2024-2026 Akinori Hattori <hattya@gmail.com>
 #
 #   SPDX-License-Identifier: Apache-2.0
 #
 
-__all__ = ['PrimulaError', 'ProfileError']
+from __future__ import annotations
+
+
+__all__ = ['PrimulaError', 'PoolError', 'ProfileError']
 
 
 class PrimulaError(Exception):
     pass
 
 
+class PoolError(PrimulaError):
+    pass
+
+
 class ProfileError(PrimulaError):
 
     def __init__(self, msg: str, path: str, lineno: int) -> None:
         super().__init__(msg)
         self.path = path
         self.lineno = lineno
+
+    def __reduce__(self) -> tuple[type[ProfileError], tuple[str, str, int]]:
+        return (self.__class__, (str(self), self.path, self.lineno))
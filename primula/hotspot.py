@@ -0,0 +1,110 @@
+#
+# primula.hotspot
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+from collections.abc import Callable, Iterator
+import dataclasses
+import heapq
+import operator
+
+from . import core
+
+
+__all__ = ['KEYS', 'Hotspot', 'scripts', 'functions', 'lines']
+
+KEYS = ('self', 'total', 'count', 'per-call')
+
+
+@dataclasses.dataclass
+class Hotspot:
+
+    # path of the script, or name of the function
+    name: str
+    count: int
+    total_time: float | None
+    self_time: float | None
+    path: str | None = None
+    lineno: int | None = None
+    line: str | None = None
+    per_call: float | None = dataclasses.field(init=False)
+
+    def __post_init__(self) -> None:
+        self.per_call = self.total_time / self.count if self.total_time is not None and self.count > 0 else None
+
+    def value(self, key: str) -> float:
+        if key == 'count':
+            return self.count
+        v = self.self_time if key == 'self' else self.total_time if key == 'total' else self.per_call
+        return v if v is not None else -1.0
+
+
+def scripts(profile: core.Profile, n: int, key: str, match: Callable[[str], bool] | None = None) -> list[Hotspot]:
+    def it() -> Iterator[Hotspot]:
+        for s in profile.scripts.values():
+            if match is None or match(s.path):
+                yield Hotspot(s.path, s.sourced, s.total_time, s.self_time, path=s.path)
+
+    return _top(it(), n, key)
+
+
+def functions(profile: core.Profile, n: int, key: str, match: Callable[[str], bool] | None = None) -> list[Hotspot]:
+    def it() -> Iterator[Hotspot]:
+        for f in profile.functions:
+            path, lineno = f.defined or (None, None)
+            if (match is None
+                or (path is not None
+                    and match(path))):
+                yield Hotspot(f.name, f.called, f.total_time, f.self_time, path=path, lineno=lineno)
+
+    return _top(it(), n, key)
+
+
+def lines(profile: core.Profile, n: int, key: str, match: Callable[[str], bool] | None = None) -> list[Hotspot]:
+    blocks: list[core.Script | core.Function] = [s for s in profile.scripts.values() if match is None or match(s.path)]
+    if match is None:
+        # functions which are not mapped to scripts
+        blocks += (f for f in profile.functions if not f.mapped)
+
+    def it() -> Iterator[tuple[float, int, int]]:
+        for b, block in enumerate(blocks):
+            counts = block.lines.counts
+            total_times = block.lines.total_times
+            self_times = block.lines.self_times
+            for i, count in enumerate(counts):
+                if count == core._NONE:
+                    continue
+                elif key == 'count':
+                    v = float(count)
+                elif (t := self_times[i] if key == 'self' else _total(total_times[i], self_times[i])) == core._NONE:
+                    v = -1.0
+                else:
+                    v = t / count if key == 'per-call' and count > 0 else float(t)
+                yield (v, b, i)
+
+    # build hotspots of selected lines only
+    hotspots = []
+    for _, b, i in heapq.nlargest(n, it(), key=operator.itemgetter(0)):
+        block = blocks[b]
+        l = block.lines[i]
+        total_time = l.total_time if l.total_time is not None else l.self_time
+        if isinstance(block, core.Script):
+            h = Hotspot(block.path, l.count or 0, total_time, l.self_time, path=block.path, lineno=i + 1, line=l.line)
+        else:
+            h = Hotspot(block.name, l.count or 0, total_time, l.self_time, lineno=i + 1, line=l.line)
+        hotspots.append(h)
+    return hotspots
+
+
+def _total(total_time: int, self_time: int) -> int:
+    # total time is omitted when it equals to self time
+    return total_time if total_time != core._NONE else self_time
+
+
+def _top(it: Iterator[Hotspot], n: int, key: str) -> list[Hotspot]:
+    # select without sorting all of them
+    return heapq.nlargest(n, it, key=lambda h: h.value(key))
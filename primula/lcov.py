@@ -1,7 +1,7 @@
 #
 # primula.lcov
 #
-#   Copyright (c) 2025 Akinori Hattori <hattya@gmail.com>
+#   Copyright (c) 2025-2026 Akinori Hattori <hattya@gmail.com>
 #
 #   SPDX-License-Identifier: Apache-2.0
 #
@@ -15,7 +15,7 @@ import coverage.control
 import coverage.report
 import coverage.results as coverage_results
 
-from . import core
+from . import sqldata
 from ._typing import MorF
 
 
@@ -26,22 +26,20 @@ class LCOVReporter:
 
     report_type = "LCOV report"
 
-    def __init__(self, coverage: coverage.control.Coverage, profile: core.Profile | None) -> None:
+    def __init__(self, coverage: coverage.control.Coverage) -> None:
         self.coverage = coverage
         self.config = coverage.config
         self.total = coverage_results.Numbers(self.config.precision)
-        self.profile = profile
 
     def report(self, morfs: Iterable[MorF] | None, outfile: IO[str]) -> float:
-        self.coverage.get_data()
+        data = sqldata.LineData(self.coverage.get_data().data_filename())
         outfile = outfile or sys.stdout
         for fr, analysis in sorted(coverage.report.get_analysis_to_report(self.coverage, morfs),
                                    key=lambda v: v[0].relative_filename()):
             outfile.write('TN:\n')
             outfile.write(f'SF:{fr.relative_filename()}\n')
-            if self.profile:
-                s = self.profile.scripts[fr.filename]
-                outfile.writelines(f'DA:{i},{s.lines[i-1].count}\n' for i in analysis.statements)
+            if counts := data.counts(fr.filename):
+                outfile.writelines(f'DA:{i},{counts.get(i, 0)}\n' for i in analysis.statements)
             else:
                 outfile.writelines(f'DA:{i},{int(i not in analysis.missing)}\n' for i in analysis.statements)
             outfile.write(f'LF:{analysis.numbers.n_statements}\n')
@@ -0,0 +1,154 @@
+#
+# primula.perfdiff
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+from collections.abc import Iterable, Iterator
+import dataclasses
+import difflib
+import heapq
+import itertools
+
+from . import core
+from .hotspot import Hotspot
+
+
+__all__ = ['KEYS', 'Change', 'scripts', 'functions', 'lines', 'top']
+
+KEYS = ('self', 'total', 'count')
+
+
+@dataclasses.dataclass
+class Change:
+
+    base: Hotspot | None
+    new: Hotspot | None
+
+    @property
+    def name(self) -> str:
+        h = self.new or self.base
+        assert h is not None
+        return h.name
+
+    def values(self, key: str) -> tuple[float, float]:
+        return (_value(self.base, key), _value(self.new, key))
+
+    def delta(self, key: str) -> float:
+        return _value(self.new, key) - _value(self.base, key)
+
+    def ratio(self, key: str) -> float:
+        if (v := _value(self.base, key)) > 0.0:
+            return self.delta(key) / v
+        return float('inf') if self.delta(key) > 0.0 else float('-inf') if self.delta(key) < 0.0 else 0.0
+
+
+def scripts(base: core.Profile, new: core.Profile) -> Iterator[Change]:
+    for path in dict.fromkeys((*base.scripts, *new.scripts)):
+        yield Change(_script(base.scripts.get(path)), _script(new.scripts.get(path)))
+
+
+def functions(base: core.Profile, new: core.Profile) -> Iterator[Change]:
+    bfuncs = _functions(base)
+    nfuncs = _functions(new)
+    for k in dict.fromkeys((*bfuncs, *nfuncs)):
+        for bf, nf in itertools.zip_longest(bfuncs.get(k, ()), nfuncs.get(k, ())):
+            yield Change(_function(bf), _function(nf))
+
+
+def lines(base: core.Profile, new: core.Profile) -> Iterator[Change]:
+    for path in dict.fromkeys((*base.scripts, *new.scripts)):
+        bs = base.scripts.get(path)
+        ns = new.scripts.get(path)
+        yield from _lines(path, path, bs.lines if bs else None, ns.lines if ns else None)
+    # functions which are not mapped to scripts
+    bfuncs = _functions(base, unmapped=True)
+    nfuncs = _functions(new, unmapped=True)
+    for k in dict.fromkeys((*bfuncs, *nfuncs)):
+        for bf, nf in itertools.zip_longest(bfuncs.get(k, ()), nfuncs.get(k, ())):
+            name = nf.name if nf else bf.name
+            yield from _lines(name, None, bf.lines if bf else None, nf.lines if nf else None)
+
+
+def top(changes: Iterable[Change], n: int, key: str, relative: bool = False,
+        threshold: float = 0.0) -> tuple[list[Change], list[Change]]:
+    # regressions and improvements which exceed the noise threshold
+    regressions: list[tuple[float, int, Change]] = []
+    improvements: list[tuple[float, int, Change]] = []
+    for i, c in enumerate(changes):
+        if abs(d := c.delta(key)) <= threshold:
+            continue
+        v = abs(c.ratio(key)) if relative else abs(d)
+        heap = regressions if d > 0.0 else improvements
+        if len(heap) < n:
+            heapq.heappush(heap, (v, -i, c))
+        elif v > heap[0][0]:
+            heapq.heapreplace(heap, (v, -i, c))
+    return ([c for *_, c in sorted(regressions, key=lambda v: v[:2], reverse=True)],
+            [c for *_, c in sorted(improvements, key=lambda v: v[:2], reverse=True)])
+
+
+def _value(h: Hotspot | None, key: str) -> float:
+    if h is None:
+        return 0.0
+    elif key == 'count':
+        return h.count
+    return (h.self_time if key == 'self' else h.total_time) or 0.0
+
+
+def _script(s: core.Script | None) -> Hotspot | None:
+    return Hotspot(s.path, s.sourced, s.total_time, s.self_time, path=s.path) if s else None
+
+
+def _function(f: core.Function | None) -> Hotspot | None:
+    if f is None:
+        return None
+    path, lineno = f.defined or (None, None)
+    return Hotspot(f.name, f.called, f.total_time, f.self_time, path=path, lineno=lineno)
+
+
+def _functions(profile: core.Profile, unmapped: bool = False) -> dict[tuple[str | int | None, ...], list[core.Function]]:
+    # align functions as merged
+    functions: dict[tuple[str | int | None, ...], list[core.Function]] = {}
+    for f in profile.functions:
+        if not (unmapped
+                and f.mapped):
+            functions.setdefault(core._function_key(f), []).append(f)
+    return functions
+
+
+def _lines(name: str, path: str | None, base: core.Lines | None, new: core.Lines | None) -> Iterator[Change]:
+    btext = base.text if base is not None else []
+    ntext = new.text if new is not None else []
+    # align lines by their text
+    sm = difflib.SequenceMatcher(None, btext, ntext, autojunk=False)
+    for tag, i1, i2, j1, j2 in sm.get_opcodes():
+        if tag == 'equal':
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                if (c := _change(name, path, base, i, new, j)) is not None:
+                    yield c
+        else:
+            for i in range(i1, i2):
+                if (c := _change(name, path, base, i, None, -1)) is not None:
+                    yield c
+            for j in range(j1, j2):
+                if (c := _change(name, path, None, -1, new, j)) is not None:
+                    yield c
+
+
+def _change(name: str, path: str | None, base: core.Lines | None, i: int, new: core.Lines | None, j: int) -> Change | None:
+    bh = _line(name, path, base, i)
+    nh = _line(name, path, new, j)
+    return Change(bh, nh) if bh or nh else None
+
+
+def _line(name: str, path: str | None, lines: core.Lines | None, i: int) -> Hotspot | None:
+    if (lines is None
+        or lines.counts[i] == core._NONE):
+        return None
+    l = lines[i]
+    total_time = l.total_time if l.total_time is not None else l.self_time
+    return Hotspot(name, l.count or 0, total_time, l.self_time, path=path, lineno=i + 1, line=l.line)
@@ -1,7 +1,7 @@
 #
 # primula.plugin
 #
-#   Copyright (c) 2024-2025 Akinori Hattori <hattya@gmail.com>
+#   Copyright (c) 2024-2026 Akinori Hattori <hattya@gmail.com>
 #
 #   SPDX-License-Identifier: Apache-2.0
 #
@@ -15,6 +15,8 @@ from typing import Any
 import coverage
 import coverage.plugin_support
 
+from . import source
+
 
 __all__ = ['coverage_init']
 
@@ -69,10 +71,14 @@ class _FileReporter(coverage.FileReporter):
         super().__init__(path)
         self._noexec_line_re = noexec_line_re
 
+    def source(self) -> str:
+        return source.get(self.filename).text
+
     def lines(self) -> set[int]:
+        src = source.get(self.filename)
         lines = set()
-        for i, l in enumerate(self.source().splitlines(), 1):
-            if not (l.lstrip().startswith('\\')
+        for i, l in enumerate(src.lines, 1):
+            if not (i in src.continuations
                     or self._noexec_line_re.match(l)):
                 lines.add(i)
         return lines
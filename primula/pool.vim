@@ -0,0 +1,45 @@
+" primula/pool.vim
+"
+"   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+"
+"   SPDX-License-Identifier: Apache-2.0
+"
+" Runs scripts sent from primula in this Vim, and dumps the profile after each
+" script. The profile is cumulative, and primula subtracts the previous one.
+
+if !has('channel')
+  cquit!
+endif
+
+let s:null = has('win32') ? 'NUL' : '/dev/null'
+let s:ch = ch_open($PRIMULA_CHANNEL, {'mode': 'json', 'waittime': 10000})
+if ch_status(s:ch) !=# 'open'
+  cquit!
+endif
+
+try
+  profile dump
+  let s:dump = 1
+catch
+  let s:dump = 0
+endtry
+
+let s:msg = {'worker': str2nr($PRIMULA_WORKER), 'dump': s:dump}
+while 1
+  " [script, profile], or '' to quit
+  let s:req = ch_evalexpr(s:ch, s:msg, {'timeout': 0x7fffffff})
+  if type(s:req) != v:t_list
+    break
+  endif
+  execute 'profile start' s:req[1]
+  let v:errors = []
+  try
+    execute 'source' fnameescape(s:req[0])
+  catch
+    call add(v:errors, v:throwpoint . ': ' . v:exception)
+  endtry
+  profile dump
+  execute 'profile start' s:null
+  let s:msg = {'errors': v:errors}
+endwhile
+qall!
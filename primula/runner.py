@@ -0,0 +1,309 @@
+#
+# primula.runner
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+import asyncio
+from collections.abc import Callable, Iterable, Sequence
+import collections
+import concurrent.futures
+import contextlib
+import dataclasses
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from typing import Any, IO
+
+from . import core
+from .exception import PoolError, ProfileError
+
+
+__all__ = ['Result', 'Runner', 'Pool']
+
+# limit of line length for output multiplexing
+_LIMIT = 1 << 20
+# Vim script which runs scripts sent from the pool
+DRIVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pool.vim')
+
+
+@dataclasses.dataclass
+class Result:
+
+    returncode: int | None = None
+    wall: float = 0.0
+    worker: int = -1
+    timed_out: bool = False
+    # restored from the run cache
+    cached: bool = False
+    # return value of load
+    data: Any = None
+
+
+class Runner:
+
+    def __init__(self, environ: str, jobs: int = 1, timeout: float | None = None, total_timeout: float | None = None,
+                 multiplex: bool = False) -> None:
+        self.environ = environ
+        self.jobs = jobs
+        self.timeout = timeout
+        self.total_timeout = total_timeout
+        self.multiplex = multiplex
+
+    def run(self, cmds: Sequence[list[str]], profiles: Sequence[str], order: Iterable[int] | None = None,
+            load: Callable[[str], Any] | None = None, executor: concurrent.futures.Executor | None = None) -> list[Result]:
+        results = [Result() for _ in cmds]
+        asyncio.run(self._run(cmds, profiles, order, load, executor, results))
+        return results
+
+    async def _run(self, cmds: Sequence[list[str]], profiles: Sequence[str], order: Iterable[int] | None,
+                   load: Callable[[str], Any] | None, executor: concurrent.futures.Executor | None,
+                   results: list[Result]) -> None:
+        loop = asyncio.get_running_loop()
+        queue = collections.deque(order if order is not None else range(len(cmds)))
+        loads: list[asyncio.Future[None]] = []
+
+        async def parse(i: int) -> None:
+            assert load is not None
+            results[i].data = await loop.run_in_executor(executor, load, profiles[i])
+
+        async def work(w: int) -> None:
+            try:
+                while queue:
+                    i = queue.popleft()
+                    r = results[i]
+                    r.worker = w
+                    start = time.perf_counter()
+                    try:
+                        r.returncode, r.timed_out = await self._exec(w, i, cmds[i], profiles[i])
+                    finally:
+                        r.wall = time.perf_counter() - start
+                    # parse while other commands are running
+                    if (load is not None
+                        and os.path.isfile(profiles[i])):
+                        loads.append(asyncio.ensure_future(parse(i)))
+            finally:
+                await self._close(w)
+
+        workers = [asyncio.ensure_future(work(w)) for w in range(min(self.jobs, len(cmds)))]
+        _, pending = await asyncio.wait(workers, timeout=self.total_timeout)
+        if pending:
+            self._error(f'Timed out after {self.total_timeout} s')
+            # wait for all workers to kill their processes
+            for t in pending:
+                t.cancel()
+            await asyncio.wait(pending)
+            for r in results:
+                if r.returncode is None:
+                    r.timed_out = True
+        await asyncio.gather(*loads)
+        for t in workers:
+            if not t.cancelled():
+                t.result()
+
+    async def _exec(self, w: int, i: int, args: list[str], profile: str) -> tuple[int, bool]:
+        env = dict(os.environ, **{self.environ: profile})
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(profile)
+        if self.multiplex:
+            proc = await asyncio.create_subprocess_exec(*args, env=env, stdin=subprocess.DEVNULL,
+                                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, limit=_LIMIT)
+            assert proc.stdout is not None and proc.stderr is not None
+            pumps: asyncio.Future[Any] = asyncio.gather(self._pump(proc.stdout, sys.stdout, f'[{i}] '),
+                                                        self._pump(proc.stderr, sys.stderr, f'[{i}] '))
+        else:
+            proc = await asyncio.create_subprocess_exec(*args, env=env)
+            pumps = asyncio.gather()
+        try:
+            rc = await asyncio.wait_for(proc.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            self._error(f'Timed out after {self.timeout} s: {shlex.join(args)}')
+            await self._kill(proc)
+            return (proc.returncode or 1, True)
+        except asyncio.CancelledError:
+            await self._kill(proc)
+            raise
+        finally:
+            await pumps
+        return (rc, False)
+
+    async def _close(self, w: int) -> None:
+        pass
+
+    async def _kill(self, proc: asyncio.subprocess.Process) -> None:
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+    async def _pump(self, stream: asyncio.StreamReader, out: IO[str], prefix: str) -> None:
+        while True:
+            try:
+                l = await stream.readline()
+            except ValueError:
+                l = await stream.read(_LIMIT)
+            if not l:
+                break
+            s = l.decode(errors='replace')
+            out.write(f'{prefix}{s}' if s.endswith('\n') else f'{prefix}{s}\n')
+            out.flush()
+
+    def _error(self, msg: str) -> None:
+        print(msg, file=sys.stderr)
+
+
+class Pool(Runner):
+
+    def __init__(self, args: list[str], environ: str, jobs: int = 1, timeout: float | None = None,
+                 total_timeout: float | None = None) -> None:
+        super().__init__(environ, jobs, timeout, total_timeout)
+        # command which sources DRIVER
+        self.args = args
+        self._vims: dict[int, _Vim] = {}
+        self._bases: dict[int, core.Profile | None] = {}
+        self._connected: dict[int, asyncio.Future[_Vim]] = {}
+
+    async def _run(self, *args: Any) -> None:
+        server = await asyncio.start_server(self._accept, '127.0.0.1', 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        self._address = f'{host}:{port}'
+        try:
+            await super()._run(*args)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        vim = _Vim(reader, writer)
+        try:
+            msg = await vim.recv()
+            fut = self._connected[msg['worker']]
+        except (KeyError, TypeError, ValueError):
+            writer.close()
+            return
+        if fut.done():
+            writer.close()
+            return
+        vim.dump = bool(msg.get('dump'))
+        fut.set_result(vim)
+
+    async def _exec(self, w: int, i: int, args: list[str], profile: str) -> tuple[int, bool]:
+        if (vim := self._vims.get(w)) is None:
+            vim = self._vims[w] = await self._spawn(w)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(profile)
+        try:
+            vim.send([os.path.abspath(args[0]), os.path.abspath(profile)])
+            msg = await asyncio.wait_for(vim.recv(), self.timeout)
+        except asyncio.TimeoutError:
+            self._error(f'Timed out after {self.timeout} s: {args[0]}')
+            await self._discard(w)
+            return (1, True)
+        except asyncio.CancelledError:
+            await self._discard(w)
+            raise
+        if msg is None:
+            # exited by the script
+            self._vims.pop(w).writer.close()
+            rc = await vim.proc.wait()
+        else:
+            for e in msg['errors']:
+                self._error(f'[{i}] {e}')
+            rc = 1 if msg['errors'] else 0
+        # profile of the script
+        loop = asyncio.get_running_loop()
+        self._bases[w] = await loop.run_in_executor(None, _subtract, profile, self._bases.get(w))
+        return (rc, False)
+
+    async def _spawn(self, w: int) -> _Vim:
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future[_Vim] = loop.create_future()
+        self._connected[w] = fut
+        env = dict(os.environ, **{
+            self.environ: os.devnull,
+            'PRIMULA_CHANNEL': self._address,
+            'PRIMULA_WORKER': str(w),
+        })
+        proc = await asyncio.create_subprocess_exec(*self.args, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                                    stderr=subprocess.DEVNULL)
+        exited: asyncio.Future[Any] = asyncio.ensure_future(proc.wait())
+        try:
+            await asyncio.wait([fut, exited], timeout=self.timeout, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            await self._kill(proc)
+            raise
+        finally:
+            exited.cancel()
+        if not fut.done():
+            fut.cancel()
+            await self._kill(proc)
+            raise PoolError('Could not connect to Vim')
+        vim = fut.result()
+        vim.proc = proc
+        self._bases[w] = None
+        if not vim.dump:
+            await self._stop(vim)
+            raise PoolError('Vim does not support :profile dump')
+        return vim
+
+    async def _close(self, w: int) -> None:
+        if (vim := self._vims.pop(w, None)) is not None:
+            await self._stop(vim)
+
+    async def _discard(self, w: int) -> None:
+        vim = self._vims.pop(w)
+        vim.writer.close()
+        await self._kill(vim.proc)
+
+    async def _stop(self, vim: _Vim) -> None:
+        vim.send('')
+        vim.writer.close()
+        try:
+            await asyncio.wait_for(vim.proc.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            await self._kill(vim.proc)
+        except asyncio.CancelledError:
+            await self._kill(vim.proc)
+            raise
+
+
+class _Vim:
+
+    proc: asyncio.subprocess.Process
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.dump = False
+        # id of the request from Vim
+        self._id = 0
+
+    async def recv(self) -> Any:
+        l = await self.reader.readline()
+        if not l:
+            return None
+        self._id, msg = json.loads(l)
+        return msg
+
+    def send(self, msg: Any) -> None:
+        self.writer.write(json.dumps([self._id, msg]).encode() + b'\n')
+
+
+def _subtract(path: str, base: core.Profile | None) -> core.Profile | None:
+    # profiles dumped by Vim are cumulative
+    try:
+        p = core.Profile(path, mapping=False)
+    except (OSError, ProfileError):
+        return base
+    if base is not None:
+        with open(path, 'w', encoding='utf-8') as fp:
+            core.write_profile(core.subtract_profile(p, base), fp)
+    return p
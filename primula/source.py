@@ -0,0 +1,51 @@
+#
+# primula.source
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+import dataclasses
+import os
+
+from ._typing import Path
+
+
+__all__ = ['Source', 'get', 'clear']
+
+_sources: dict[str, Source] = {}
+
+
+@dataclasses.dataclass
+class Source:
+
+    path: str
+    mtime_ns: int
+    size: int
+    text: str
+    lines: list[str] = dataclasses.field(init=False)
+    # line numbers of line continuations
+    continuations: frozenset[int] = dataclasses.field(init=False)
+
+    def __post_init__(self) -> None:
+        self.lines = self.text.splitlines()
+        self.continuations = frozenset(i for i, l in enumerate(self.lines, 1) if l.lstrip().startswith('\\'))
+
+
+def get(path: Path) -> Source:
+    path = os.fspath(path)
+    st = os.stat(path)
+    src = _sources.get(path)
+    if (src is None
+        or src.mtime_ns != st.st_mtime_ns
+        or src.size != st.st_size):
+        with open(path, encoding='utf-8') as fp:
+            text = fp.read()
+        _sources[path] = src = Source(path, st.st_mtime_ns, st.st_size, text)
+    return src
+
+
+def clear() -> None:
+    _sources.clear()
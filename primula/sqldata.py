@@ -0,0 +1,105 @@
+#
+# primula.sqldata
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+from collections.abc import Iterable, Iterator, Mapping
+import contextlib
+import os
+import sqlite3
+
+
+__all__ = ['LineData']
+
+_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS primula_line (
+    path TEXT NOT NULL,
+    lineno INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    total_time INTEGER,
+    self_time INTEGER,
+    PRIMARY KEY (path, lineno)
+);
+"""
+
+# count, total time (ns), self time (ns)
+_Row = tuple[int, int, int]
+
+
+class LineData:
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def update(self, scripts: Mapping[str, Iterable[tuple[int, int, int, int]]]) -> None:
+        # sum up with the existing lines
+        with self._connect() as con:
+            con.executescript(_SCHEMA)
+            rows: list[tuple[str, int, int, int | None, int | None]] = []
+            for path, lines in scripts.items():
+                old = self._read(con, path)
+                for lineno, count, total_time, self_time in lines:
+                    if count < 0:
+                        continue
+                    elif lineno in old:
+                        o = old[lineno]
+                        count += o[0]
+                        total_time = _add(total_time, o[1])
+                        self_time = _add(self_time, o[2])
+                    old[lineno] = (count, total_time, self_time)
+                rows += ((path, i, c, _to_null(t), _to_null(st)) for i, (c, t, st) in old.items())
+            con.executemany('INSERT OR REPLACE INTO primula_line VALUES (?, ?, ?, ?, ?)', rows)
+
+    def measured_files(self) -> set[str]:
+        if not os.path.exists(self.path):
+            return set()
+        with self._connect() as con:
+            if not self._has_table(con):
+                return set()
+            return {r[0] for r in con.execute('SELECT DISTINCT path FROM primula_line')}
+
+    def counts(self, path: str) -> dict[int, int]:
+        return {i: v[0] for i, v in self._lines(path).items()}
+
+    def times(self, path: str) -> dict[int, tuple[float | None, float | None]]:
+        return {i: (_to_sec(v[1]), _to_sec(v[2])) for i, v in self._lines(path).items()}
+
+    def _lines(self, path: str) -> dict[int, _Row]:
+        if not os.path.exists(self.path):
+            return {}
+        with self._connect() as con:
+            return self._read(con, path)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.path)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _has_table(self, con: sqlite3.Connection) -> bool:
+        return con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'primula_line'").fetchone() is not None
+
+    def _read(self, con: sqlite3.Connection, path: str) -> dict[int, _Row]:
+        if not self._has_table(con):
+            return {}
+        cur = con.execute('SELECT lineno, count, total_time, self_time FROM primula_line WHERE path = ?', (path,))
+        return {r[0]: (r[1], -1 if r[2] is None else r[2], -1 if r[3] is None else r[3]) for r in cur}
+
+
+def _add(a: int, b: int) -> int:
+    return a + b if a >= 0 and b >= 0 else max(a, b)
+
+
+def _to_null(ns: int) -> int | None:
+    return ns if ns >= 0 else None
+
+
+def _to_sec(ns: int) -> float | None:
+    return ns / 1e9 if ns >= 0 else None
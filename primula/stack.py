@@ -0,0 +1,100 @@
+#
+# primula.stack
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+from collections.abc import Iterator
+import json
+from typing import IO
+
+from . import core
+
+
+__all__ = ['iter_stacks', 'write_folded', 'write_speedscope']
+
+# name, path, and line number
+Frame = tuple[str, str | None, int | None]
+
+
+def iter_stacks(profile: core.Profile) -> Iterator[tuple[list[Frame], int]]:
+    # functions nest under the block which defines them
+    ranges: dict[str, list[tuple[int, int, core.Function]]] = {}
+    for f in profile.functions:
+        if (f.defined
+            and (s := profile.scripts.get(f.defined[0])) is not None):
+            ranges.setdefault(s.path, []).append((f.defined[1], _end(s, f), f))
+    parents: dict[int, core.Function] = {}
+    for v in ranges.values():
+        v.sort(key=lambda r: (r[0], -r[1]))
+        outer: list[tuple[int, int, core.Function]] = []
+        for r in v:
+            while (outer
+                   and outer[-1][1] < r[0]):
+                outer.pop()
+            if outer:
+                parents[id(r[2])] = outer[-1][2]
+            outer.append(r)
+
+    for s in profile.scripts.values():
+        if (w := round(s.self_time * 1e9)) > 0:
+            yield [(s.path, s.path, None)], w
+    for f in profile.functions:
+        if (w := round((f.self_time or 0.0) * 1e9)) <= 0:
+            continue
+        stack: list[Frame] = []
+        p: core.Function | None = f
+        while p is not None:
+            stack.append((p.name, *p.defined) if p.defined else (p.name, None, None))
+            p = parents.get(id(p))
+        if ((path := stack[-1][1]) is not None
+            and path in profile.scripts):
+            stack.append((path, path, None))
+        stack.reverse()
+        yield stack, w
+
+
+def write_folded(profile: core.Profile, fp: IO[str]) -> None:
+    for stack, w in iter_stacks(profile):
+        fp.write(';'.join(f[0].replace(';', ':') for f in stack) + f' {w}\n')
+
+
+def write_speedscope(profile: core.Profile, fp: IO[str], name: str = '') -> None:
+    frames: dict[Frame, int] = {}
+    fp.write('{"$schema": "https://www.speedscope.app/file-format-schema.json", '
+             '"profiles": [{"type": "sampled", "name": ' + json.dumps(name) + ', "unit": "nanoseconds", "startValue": 0, '
+             '"samples": [')
+    # samples and weights are written by separate passes
+    for i, (stack, _) in enumerate(iter_stacks(profile)):
+        v = [frames.setdefault(f, len(frames)) for f in stack]
+        fp.write(f'{", " if i else ""}{json.dumps(v)}')
+    fp.write('], "weights": [')
+    total = 0
+    for i, (_, w) in enumerate(iter_stacks(profile)):
+        fp.write(f'{", " if i else ""}{w}')
+        total += w
+    fp.write(f'], "endValue": {total}}}], "shared": {{"frames": [')
+    for i, (n, path, lineno) in enumerate(frames):
+        frame: dict[str, str | int] = {'name': n}
+        if path is not None:
+            frame['file'] = path
+        if lineno is not None:
+            frame['line'] = lineno
+        fp.write(f'{", " if i else ""}{json.dumps(frame)}')
+    fp.write(']}}\n')
+
+
+def _end(script: core.Script, function: core.Function) -> int:
+    # line number of the end of the function body
+    text = script.lines.text
+    j = function.defined[1] if function.defined else 0
+    for _ in range(len(function.lines)):
+        j += 1
+        # line continuations
+        while (j < len(text)
+               and text[j].lstrip().startswith('\\')):
+            j += 1
+    return j + 1
@@ -0,0 +1,48 @@
+#
+# primula.suite
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+from collections.abc import Hashable, Mapping, Set
+import heapq
+
+
+__all__ = ['minimize', 'unique']
+
+
+def minimize(tests: Mapping[str, Set[Hashable]], costs: Mapping[str, float]) -> list[str]:
+    # greedy weighted set cover: the most lines per second first
+    covered: set[Hashable] = set()
+    heap = [(-_ratio(len(v), costs[t]), t) for t, v in tests.items() if v]
+    heapq.heapify(heap)
+    selected = []
+    while heap:
+        _, t = heapq.heappop(heap)
+        # ratios only decrease as lines are covered
+        r = _ratio(len(tests[t] - covered), costs[t])
+        if r <= 0.0:
+            continue
+        elif (heap
+              and r < -heap[0][0]):
+            heapq.heappush(heap, (-r, t))
+            continue
+        selected.append(t)
+        covered |= tests[t]
+    return selected
+
+
+def unique(tests: Mapping[str, Set[Hashable]]) -> dict[str, int]:
+    # number of lines which only a test covers
+    seen: dict[Hashable, int] = {}
+    for v in tests.values():
+        for k in v:
+            seen[k] = seen.get(k, 0) + 1
+    return {t: sum(1 for k in v if seen[k] == 1) for t, v in tests.items()}
+
+
+def _ratio(n: int, cost: float) -> float:
+    return n / cost if cost > 0.0 else float('inf') if n else 0.0
@@ -0,0 +1,65 @@
+#
+# primula.timing
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import annotations
+from collections.abc import Sequence
+import json
+import os
+import tempfile
+from typing import Any
+
+
+__all__ = ['Timings']
+
+
+class Timings:
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        try:
+            with open(path, encoding='utf-8') as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            data = {}
+        self._data: dict[str, dict[str, Any]] = data if isinstance(data, dict) else {}
+
+    def wall(self, key: str) -> float | None:
+        return self._data.get(key, {}).get('wall')
+
+    def profile(self, key: str) -> float | None:
+        return self._data.get(key, {}).get('profile')
+
+    def cost(self, key: str) -> float | None:
+        v = self._data.get(key, {})
+        return v.get('wall', v.get('profile'))
+
+    def update(self, key: str, wall: float, profile: float | None = None) -> None:
+        v = self._data[key] = {'wall': wall}
+        if profile is not None:
+            v['profile'] = profile
+
+    def order(self, keys: Sequence[str]) -> list[int]:
+        # longest processing time first
+        costs = [self.cost(k) for k in keys]
+        known = [c for c in costs if c is not None]
+        mean = sum(known) / len(known) if known else 0.0
+        return sorted(range(len(keys)), key=lambda i: -(c if (c := costs[i]) is not None else mean))
+
+    def save(self) -> None:
+        try:
+            root = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', prefix='primula-', dir=root)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+                    json.dump(self._data, fp, indent=2, sort_keys=True)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            pass
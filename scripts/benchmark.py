@@ -0,0 +1,85 @@
+#! /usr/bin/env python
+#
+# benchmark
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+import click
+
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from primula import core  # noqa: E402
+
+
+@click.command
+@click.option('-n', '--functions', 'sizes', type=int, multiple=True, default=(250, 500, 1000, 2000, 4000),
+              help='Number of dict functions.')
+@click.option('-r', '--repeat', type=int, default=3,
+              help='Number of repeats.')
+def benchmark(sizes: tuple[int, ...], repeat: int) -> None:
+    """Measure the time to parse and map Vim profile outputs."""
+
+    with tempfile.TemporaryDirectory(prefix='primula-') as root:
+        prev = None
+        for n in sizes:
+            path = Path(root) / f'dict.{n}.txt'
+            write_profile(path, n)
+            elapsed = min(measure(path) for _ in range(repeat))
+            ratio = f'{elapsed / prev[1] / (n / prev[0]):6.2f}' if prev else f'{"-":>6}'
+            click.echo(f'{n:8} functions {path.stat().st_size:12,} bytes {elapsed:10.3f} s  x{ratio} / linear')
+            prev = (n, elapsed)
+
+
+def measure(path: Path) -> float:
+    start = time.perf_counter()
+    p = core.Profile(path)
+    elapsed = time.perf_counter() - start
+    assert all(f.mapped for f in p.functions)
+    return elapsed
+
+
+def write_profile(path: Path, n: int) -> None:
+    # Vim 8.1.2054- does not output the defined lines of functions
+    script = path.with_suffix('.vim')
+    with path.open('w', encoding='utf-8') as fp:
+        fp.write(f'SCRIPT  {script}\n'
+                 'Sourced 1 time\n'
+                 'Total time:   0.100000\n'
+                 ' Self time:   0.010000\n'
+                 '\n'
+                 'count  total (s)   self (s)\n'
+                 '    1              0.000001 let s:dict = {}\n')
+        for i in range(1, n + 1):
+            fp.write(f'    1              0.000001 function! s:dict.f{i}() abort dict\n'
+                     f'                              let n = {i}\n'
+                     f'                              return n * {i}\n'
+                     '                            endfunction\n')
+        for i in range(1, n + 1):
+            fp.write(f'    1   0.000010   0.000001 call s:dict.f{i}()\n')
+        fp.write('\n')
+        # functions are not sorted in definition order
+        for i in range(n, 0, -1):
+            fp.write(f'FUNCTION  {i}()\n'
+                     'Called 1 time\n'
+                     'Total time:   0.000002\n'
+                     ' Self time:   0.000002\n'
+                     '\n'
+                     'count  total (s)   self (s)\n'
+                     f'    1              0.000001   let n = {i}\n'
+                     f'    1              0.000001   return n * {i}\n'
+                     '\n')
+        fp.write('FUNCTIONS SORTED ON TOTAL TIME\n')
+
+
+if __name__ == '__main__':
+    benchmark()
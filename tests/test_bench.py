@@ -0,0 +1,132 @@
+#
+# test_bench
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import io
+import os
+import textwrap
+
+from primula import bench, core
+from base import PrimulaTestCase
+
+
+class BenchTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._dir = self.tempdir()
+        self.script = os.path.join(self._dir.name, 'spam.vim')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def profile(self, i, echo, called=1, line='echo 1'):
+        path = os.path.join(self._dir.name, f'profile-{i}.txt')
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {self.script}
+                Sourced 1 time
+                Total time:   0.000100
+                 Self time:   {echo:.6f}
+
+                count  total (s)   self (s)
+                    1              {echo:.6f} {line}
+                    1              0.000001 function! Main() abort
+                                              return 1
+                                            endfunction
+                {called:5}   0.000010   0.000001 call Main()
+
+                FUNCTION  Main()
+                    Defined: {self.script}:2
+                Called {called} time{"s" if called != 1 else ""}
+                Total time:   0.000003
+                 Self time:   0.000003
+
+                count  total (s)   self (s)
+                {called:5}              0.000003   return 1
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+        return core.Profile(path, mapping=False)
+
+    def test_aggregate(self):
+        b = bench.aggregate([self.profile(i, t) for i, t in enumerate((0.00004, 0.00001, 0.00002, 0.00003))])
+        self.assertEqual(b.runs, 4)
+        self.assertEqual(len(b.scripts), 1)
+        s = b.scripts[0]
+        self.assertEqual(s['path'], self.script)
+        self.assertEqual(s['counts'], [1, 1, -1, -1, 1])
+        self.assertEqual({k: v[0] for k, v in s['self_times'].items()}, {
+            'min': 10000,
+            'median': 25000,
+            'p95': 40000,
+            'mean': 25000,
+            'stddev': 12910,
+        })
+        # total time is omitted
+        self.assertEqual(s['total_times']['median'], [25000, 1000, -1, -1, 10000])
+        self.assertEqual([round(t, 6) for t in s['self_time']], [0.00001, 0.000025, 0.00004, 0.000025, 0.000013])
+        self.assertEqual(len(b.functions), 1)
+        f = b.functions[0]
+        self.assertEqual((f['name'], f['defined'], f['called']), ('Main()', (self.script, 2), 1))
+
+    def test_aggregate_missing(self):
+        p = self.profile(0, 0.00001)
+        empty = core.Profile._new('', [], [])
+        b = bench.aggregate([p, p, empty])
+        self.assertEqual(b.scripts[0]['counts'], [1, 1, -1, -1, 1])
+        self.assertEqual(b.scripts[0]['self_times']['min'], [0, 0, -1, -1, 0])
+        self.assertEqual(b.scripts[0]['self_times']['median'], [10000, 1000, -1, -1, 1000])
+        self.assertEqual(b.functions[0]['called'], 1)
+
+    def test_aggregate_mismatched(self):
+        with self.assertRaisesRegex(ValueError, 'lines are mismatched: SCRIPT'):
+            bench.aggregate([self.profile(0, 0.00001), self.profile(1, 0.00001, line='echo 2')])
+
+    def test_profile(self):
+        b = bench.aggregate([self.profile(i, t, called=c) for i, (t, c) in enumerate(((0.00001, 1), (0.00003, 3), (0.00002, 2)))])
+        for stat, self_time, called in (
+            ('min', 0.00001, 2),
+            ('median', 0.00002, 2),
+            ('p95', 0.00003, 2),
+        ):
+            with self.subTest(stat=stat):
+                p = b.profile(stat)
+                s = p.scripts[self.script]
+                self.assertEqual(s.self_time, self_time)
+                self.assertEqual(s.lines[0].self_time, self_time)
+                self.assertEqual(p.functions[0].called, called)
+                # function bodies are mapped
+                self.assertTrue(p.functions[0].mapped)
+                self.assertEqual(s.lines[2].count, 2)
+        p = b.profile(mapping=False)
+        self.assertFalse(p.functions[0].mapped)
+        self.assertIsNone(p.scripts[self.script].lines[2].count)
+
+    def test_dump(self):
+        b = bench.aggregate([self.profile(0, 0.00001), self.profile(1, 0.00002)])
+        path = os.path.join(self._dir.name, 'bench.json')
+        with open(path, 'w') as fp:
+            bench.dump(b, fp)
+        self.assertTrue(bench.is_bench(path))
+        self.assertFalse(bench.is_bench(os.path.join(self._dir.name, 'profile-0.txt')))
+
+        lb = bench.load(path)
+        self.assertEqual(lb.runs, 2)
+        self.assertEqual(lb.profile('p95').scripts[self.script], b.profile('p95').scripts[self.script])
+        self.assertEqual(lb.profile().functions[0].defined, (self.script, 2))
+
+        for data in ('[]', '{}', '{"format": "primula-bench", "version": 0}'):
+            with self.subTest(data=data):
+                with open(path, 'w') as fp:
+                    fp.write(data)
+                with self.assertRaisesRegex(ValueError, 'not a bench file'):
+                    bench.load(path)
+
+        out = io.StringIO()
+        bench.dump(bench.Bench(0), out)
+        self.assertEqual(out.getvalue(), '{"format":"primula-bench","version":1,"stats":["min","median","p95","mean","stddev"],'
+                                         '"runs":0,"scripts":[],"functions":[]}\n')
@@ -0,0 +1,45 @@
+#
+# test_budget
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+
+from primula import budget
+from base import PrimulaTestCase
+
+
+class BudgetTestCase(PrimulaTestCase):
+
+    def test_parse(self):
+        self.assertEqual(budget.parse(''), [])
+        self.assertEqual(budget.parse('\n  autoload/*  self 0.5\n spam#*() per-call 1e-3 \n'), [
+            budget.Budget('autoload/*', 'self', 0.5),
+            budget.Budget('spam#*()', 'per-call', 0.001),
+        ])
+        for s in ('spam.vim', 'spam.vim 0.5', 'spam.vim count 1', 'spam.vim self x', 'spam.vim self -1'):
+            with self.subTest(s=s):
+                with self.assertRaises(ValueError):
+                    budget.parse(s)
+
+    def test_check(self):
+        path = os.path.abspath(os.path.join('autoload', 'spam.vim'))
+        scripts = {path: (1, 0.3, 0.1)}
+        functions = {
+            'spam#main()': (4, 0.2, 0.1),
+            'spam#eggs()': (0, 0.0, 0.0),
+        }
+        budgets = budget.parse('autoload/* total 0.1\n'
+                               'spam#*() per-call 0.01\n'
+                               'spam#*() self 1\n'
+                               '*/spam.vim self 0.05\n')
+        v = budget.check(budgets, scripts, functions)
+        self.assertEqual([(x.name, x.budget.key, x.value) for x in v], [
+            ('spam#main()', 'per-call', 0.05),
+            (path, 'total', 0.3),
+            (path, 'self', 0.1),
+        ])
+        self.assertEqual([round(x.ratio, 6) for x in v], [5.0, 3.0, 2.0])
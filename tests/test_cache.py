@@ -0,0 +1,128 @@
+#
+# test_cache
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+import textwrap
+import time
+import unittest.mock
+
+from primula import cache, core
+from base import PrimulaTestCase
+
+
+class CacheTestCase(PrimulaTestCase):
+
+    maxDiff = None
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._dir = self.tempdir()
+        self.root = self._dir.name
+        os.chdir(self.root)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._dir.cleanup()
+
+    def write_profile(self, path, script, n):
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   0.000000
+                 Self time:   0.000000
+
+                count  total (s)   self (s)
+                    1              0.000000 function! Main() abort
+                                              echo {n}
+                                            endfunction
+                    1   0.000000   0.000000 call Main()
+
+                FUNCTION  Main()
+                    Defined: {script}:1
+                Called 1 time
+                Total time:   0.000000
+                 Self time:   0.000000
+
+                count  total (s)   self (s)
+                    1              0.000000   echo {n}
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+        with open(script, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                function! Main() abort
+                  echo {n}
+                endfunction
+                call Main()
+            """))
+
+    def entries(self, root):
+        return sorted(n for n in os.listdir(root) if n.endswith('.prof'))
+
+    def test_profile(self):
+        path = 'profile.txt'
+        script = 'spam.vim'
+        self.write_profile(path, script, 1)
+
+        root = os.path.join(self.root, 'cache')
+        c = cache.ProfileCache(root, 1 << 20)
+        p = c.profile(path)
+        self.assertEqual(self.entries(root), [c.key(path) + '.prof'])
+        with unittest.mock.patch.object(core.Profile, '_parse', side_effect=AssertionError):
+            pp = c.profile(path)
+        self.assertEqual(pp.path, path)
+        self.assertEqual(pp.scripts, p.scripts)
+        self.assertEqual(pp.functions, p.functions)
+        self.assertTrue(pp.functions[0].mapped)
+
+        # source is modified
+        st = os.stat(script)
+        os.utime(script, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        with unittest.mock.patch.object(core.Profile, '_parse', autospec=True, side_effect=core.Profile._parse) as parse:
+            self.assertEqual(c.profile(path).scripts, p.scripts)
+            self.assertEqual(c.profile(path).scripts, p.scripts)
+        self.assertEqual(parse.call_count, 1)
+
+        # broken entry
+        with open(os.path.join(root, c.key(path) + '.prof'), 'wb') as fp:
+            fp.write(b'primula\0...')
+        self.assertEqual(c.profile(path).functions, p.functions)
+
+    def test_evict(self):
+        root = os.path.join(self.root, 'cache')
+        c = cache.ProfileCache(root, 1 << 20)
+        keys = []
+        for i in range(3):
+            path = f'profile-{i}.txt'
+            self.write_profile(path, f'spam-{i}.vim', i)
+            c.profile(path)
+            keys.append(c.key(path))
+            time.sleep(0.01)
+        size = os.path.getsize(os.path.join(root, keys[0] + '.prof'))
+
+        # hit
+        c.profile('profile-0.txt')
+
+        c.max_size = size * 3
+        self.write_profile('profile-3.txt', 'spam-3.vim', 3)
+        c.profile('profile-3.txt')
+        keys.append(c.key('profile-3.txt'))
+        self.assertEqual(self.entries(root), sorted(f'{k}.prof' for k in (keys[0], keys[2], keys[3])))
+
+        self.assertEqual(c.clear(), 3)
+        self.assertEqual(self.entries(root), [])
+        self.assertEqual(cache.ProfileCache(os.path.join(self.root, 'none'), 0).clear(), 0)
+
+    def test_parse_size(self):
+        self.assertEqual(cache._parse_size('1024'), 1024)
+        self.assertEqual(cache._parse_size('1K'), 1024)
+        self.assertEqual(cache._parse_size('1.5 MB'), 1536 * 1024)
+        self.assertEqual(cache._parse_size('2g'), 2 * 1024 ** 3)
+        with self.assertRaises(ValueError):
+            cache._parse_size('1T')
@@ -0,0 +1,77 @@
+#
+# test_calibration
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+import textwrap
+
+from primula import calibration
+from base import PrimulaTestCase
+
+
+class CalibrationTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._dir = self.tempdir()
+        self.profile = os.path.join(self._dir.name, 'profile.txt')
+        self.path = os.path.join(self._dir.name, 'calibration.json')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def write(self, name, base, let='0.002000'):
+        with open(self.profile, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                FUNCTION  {name}
+                    Defined: {calibration.SCRIPT}:14
+                Called 1 time
+                Total time:   0.005000
+                 Self time:   0.005000
+
+                count  total (s)   self (s)
+                 1001              0.001000   for l:i in range(a:n)
+                 1000              {let}     let l:x = 0
+                 1001              0.001000   endfor
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+        with open(self.profile + '.base', 'w') as fp:
+            fp.write(f'{base:.9f}\n')
+
+    def test_script(self):
+        self.assertTrue(os.path.isfile(calibration.SCRIPT))
+
+    def test_measure(self):
+        self.write('PrimulaCalibrate()', 0.0037)
+        overhead, lines = calibration.measure(self.profile)
+        self.assertEqual(lines, 3002)
+        self.assertAlmostEqual(overhead, 0.0003 / 3002)
+
+        # faster than without profiling
+        self.write('PrimulaCalibrate()', 0.005)
+        self.assertEqual(calibration.measure(self.profile), (0.0, 3002))
+
+    def test_measure_error(self):
+        self.write('Spam()', 0.0037)
+        with self.assertRaisesRegex(ValueError, r'PrimulaCalibrate\(\) is not profiled'):
+            calibration.measure(self.profile)
+
+        os.unlink(self.profile + '.base')
+        with self.assertRaises(OSError):
+            calibration.measure(self.profile)
+
+    def test_load(self):
+        self.assertIsNone(calibration.load(self.path))
+
+        calibration.save(self.path, 0.0000001, 'vim', 3002)
+        self.assertEqual(calibration.load(self.path), 0.0000001)
+
+        for data in ('', '[]', '{}', '{"overhead": "0.1"}', '{"overhead": -1}'):
+            with self.subTest(data=data):
+                with open(self.path, 'w') as fp:
+                    fp.write(data)
+                self.assertIsNone(calibration.load(self.path))
@@ -0,0 +1,160 @@
+#
+# test_callgrind
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import io
+import os
+import textwrap
+
+from primula import __version__, callgrind, core
+from base import PrimulaTestCase
+
+
+class CallgrindTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._dir = self.tempdir()
+        self.path = os.path.join(self._dir.name, 'profile.txt')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_write_callgrind(self):
+        script = os.path.join(self._dir.name, 'spam.vim')
+        with open(self.path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   0.000100
+                 Self time:   0.000010
+
+                count  total (s)   self (s)
+                    1              0.000001 function! s:Eggs(n) abort
+                                              return a:n
+                                            endfunction
+                    1              0.000001 function! Spam() abort
+                                              let n = 1
+                                                    \\ + 1
+                                              return <SID>Eggs(n) + s:Eggs(n)
+                                            endfunction
+                    1   0.000090   0.000008 echo Spam() + Ham()
+
+                FUNCTION  <SNR>1_Eggs()
+                    Defined: {script}:1
+                Called 2 times
+                Total time:   0.000020
+                 Self time:   0.000020
+
+                count  total (s)   self (s)
+                    2              0.000020   return a:n
+
+                FUNCTION  Spam()
+                    Defined: {script}:4
+                Called 1 time
+                Total time:   0.000080
+                 Self time:   0.000050
+
+                count  total (s)   self (s)
+                    1              0.000010   let n = 1 + 1
+                    1   0.000070   0.000040   return <SID>Eggs(n) + s:Eggs(n)
+
+                FUNCTION  Ham()
+                Called 1 time
+                Total time:   0.000002
+                 Self time:   0.000002
+
+                count  total (s)   self (s)
+                    1              0.000002   return 0
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+        buf = io.StringIO()
+        callgrind.write_callgrind(core.Profile(self.path, mapping=False), buf)
+        self.assertEqual(buf.getvalue(), textwrap.dedent(f"""\
+            # callgrind format
+            version: 1
+            creator: primula {__version__}
+            positions: line
+            event: ns : Time (ns)
+            event: count : Count
+            events: ns count
+
+            fl=(1) {script}
+            fn=(1) {script}
+            1 1000 1
+            4 1000 1
+            9 8000 1
+            cfl=(1)
+            cfn=(2) Spam()
+            calls=1 5
+            9 80000
+            cfl=(2) ???
+            cfn=(3) Ham()
+            calls=1 1
+            9 2000
+
+            fl=(1)
+            fn=(4) <SNR>1_Eggs()
+            2 20000 2
+
+            fl=(1)
+            fn=(2)
+            5 10000 1
+            7 40000 1
+            cfl=(1)
+            cfn=(4)
+            calls=1 2
+            7 15000
+            cfl=(1)
+            cfn=(4)
+            calls=1 2
+            7 15000
+
+            fl=(2)
+            fn=(3)
+            1 2000 1
+
+        """))
+
+    def test_same_name(self):
+        profiles = []
+        for name, body in (
+            ('spam.vim', ['let n = 1', 'let n += 1', 'return n']),
+            ('eggs.vim', ['return 0']),
+        ):
+            script = os.path.join(self._dir.name, name)
+            with open(self.path, 'w') as fp:
+                fp.write(textwrap.dedent(f"""\
+                    FUNCTION  1()
+                        Defined: {script}:1
+                    Called 1 time
+                    Total time:   0.000003
+                     Self time:   0.000003
+
+                    count  total (s)   self (s)
+                """))
+                for l in body:
+                    fp.write(f'    1              0.000001   {l}\n')
+                fp.write('\nFUNCTIONS SORTED ON TOTAL TIME\n')
+            profiles.append(core.Profile(self.path, mapping=False))
+        # numbered functions of different scripts
+        p = core.merge_profiles(profiles)
+        self.assertEqual([f.name for f in p.functions], ['1()', '1()'])
+        buf = io.StringIO()
+        callgrind.write_callgrind(p, buf)
+        self.assertTrue(buf.getvalue().endswith(textwrap.dedent(f"""\
+            fl=(1) {os.path.join(self._dir.name, 'spam.vim')}
+            fn=(1) 1()
+            1 1000 1
+            2 1000 1
+            3 1000 1
+
+            fl=(2) {os.path.join(self._dir.name, 'eggs.vim')}
+            fn=(1)
+            1 1000 1
+
+        """)))
@@ -8,16 +8,21 @@
 
 import contextlib
 import io
+import json
 import os
 import re
+import shutil
 import sys
+import tempfile
 import textwrap
+import unittest
+import unittest.mock
 import warnings
 
 import coverage
 import coverage.data
 
-from primula import cli
+from primula import cli, runner
 from base import PrimulaTestCase
 
 
@@ -42,8 +47,8 @@ class CLITestCase(PrimulaTestCase):
               contextlib.redirect_stderr(err)):
             try:
                 cli.run(list(args))
-            except SystemExit:
-                pass
+            except SystemExit as e:
+                self.status = e.code
         return out.getvalue(), err.getvalue()
 
     def test_help(self):
@@ -53,6 +58,291 @@ class CLITestCase(PrimulaTestCase):
         self.assertRegex(v[1], r'code coverage in Vim scripts\.$')
         self.assertEqual(err, '')
 
+    def test_affected(self):
+        with open('child.py', 'w') as fp:
+            fp.write(textwrap.dedent("""\
+                import os
+                import sys
+
+                script = os.path.realpath('lib.vim')
+                with open(os.environ['PROFILE'], 'w') as fp:
+                    fp.write(f\"\"\"\\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   0.000000
+                 Self time:   0.000000
+
+                count  total (s)   self (s)
+                    1              0.000000 echo 1
+                    {int(sys.argv[1] == 'spam.vim')}              0.000000 echo 2
+                    {int(sys.argv[1] == 'eggs.vim')}              0.000000 echo 3
+
+                FUNCTIONS SORTED ON TOTAL TIME
+                \"\"\")
+            """))
+        with open('manifest.txt', 'w') as fp:
+            fp.write('spam.vim\n')
+            fp.write('eggs.vim\n')
+
+        out, err = self.cli('run', '--manifest', 'manifest.txt', sys.executable, 'child.py')
+        self.assertEqual(err, '')
+        out, err = self.cli('affected', 'lib.vim')
+        self.assertRegex(out, r'(?i)no contexts were measured')
+
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\ncontexts = True\n')
+        out, err = self.cli('run', '--manifest', 'manifest.txt', sys.executable, 'child.py')
+        self.assertEqual(err, '')
+
+        data = coverage.data.CoverageData()
+        data.read()
+        self.assertEqual(data.measured_contexts(), {'spam.vim', 'eggs.vim'})
+
+        for args, tests in (
+            (['lib.vim'], ['eggs.vim', 'spam.vim']),
+            (['lib.vim:1'], ['eggs.vim', 'spam.vim']),
+            (['lib.vim:2'], ['spam.vim']),
+            (['lib.vim:3-5'], ['eggs.vim']),
+            (['lib.vim:4,5'], []),
+            (['lib.vim:4', 'lib.vim:2'], ['spam.vim']),
+            (['spam.vim'], ['spam.vim']),
+            (['ham.vim'], []),
+        ):
+            with self.subTest(args=args):
+                out, err = self.cli('affected', *args)
+                self.assertEqual(out, ''.join(f'{t}\n' for t in tests))
+                self.assertEqual(err, '')
+
+        # minimize
+        with open(cli._TIMINGS, 'w') as fp:
+            json.dump({'spam.vim': {'wall': 2.0}, 'eggs.vim': {'wall': 1.0}}, fp)
+        out, err = self.cli('minimize', '-o', 'minimized.txt')
+        self.assertEqual(out, textwrap.dedent("""\
+            Selected 2 of 2 tests in 3.000 s of 3.000 s
+              eggs.vim: 1.000 s, 2 lines, 1 unique
+              spam.vim: 2.000 s, 2 lines, 1 unique
+        """))
+        self.assertEqual(err, '')
+        with open('minimized.txt') as fp:
+            self.assertEqual(fp.read(), 'eggs.vim\nspam.vim\n')
+
+        with open('manifest.txt', 'a') as fp:
+            fp.write('ham.vim\n')
+        out, err = self.cli('run', '--manifest', 'manifest.txt', sys.executable, 'child.py')
+        self.assertEqual(err, '')
+        with open(cli._TIMINGS, 'w') as fp:
+            json.dump({'spam.vim': {'wall': 2.0}, 'eggs.vim': {'wall': 1.0}}, fp)
+        out, err = self.cli('minimize')
+        self.assertEqual(out, textwrap.dedent("""\
+            Selected 2 of 3 tests in 3.000 s of 4.500 s
+              eggs.vim: 1.000 s, 2 lines, 1 unique
+              spam.vim: 2.000 s, 2 lines, 1 unique
+            Redundant 1 test in 1.500 s
+              ham.vim: 1.500 s, 1 line
+        """))
+
+        out, err = self.cli('minimize', 'spam.vim')
+        self.assertRegex(err, r'(?i)unexpected arguments')
+
+        out, err = self.cli('affected')
+        self.assertRegex(err, r'(?i)nothing to do')
+
+    def test_bench(self):
+        with open('child.py', 'w') as fp:
+            fp.write(textwrap.dedent("""\
+                import os
+
+                script = os.path.realpath('spam.vim')
+                n = len(os.listdir('runs'))
+                with open(os.path.join('runs', str(n)), 'w'):
+                    pass
+                t = 0.00001 * (n + 1)
+                with open(os.environ['PROFILE'], 'w') as fp:
+                    fp.write(f\"\"\"\\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   {t:.6f}
+                 Self time:   {t:.6f}
+
+                count  total (s)   self (s)
+                    1              {t:.6f} echo 1
+
+                FUNCTIONS SORTED ON TOTAL TIME
+                \"\"\")
+            """))
+        os.mkdir('runs')
+        script = os.path.realpath('spam.vim')
+
+        out, err = self.cli('bench')
+        self.assertRegex(err, r'(?i)nothing to do')
+        out, err = self.cli('bench', '-n', '0', sys.executable, 'child.py')
+        self.assertRegex(err, r'(?i)invalid runs: 0')
+        out, err = self.cli('bench', sys.executable, '-c', 'import sys; sys.exit(1)')
+        self.assertEqual(self.status, 1)
+        self.assertFalse(os.path.exists(cli._BENCH_OUTPUT))
+
+        out, err = self.cli('bench', '-n', '5', sys.executable, 'child.py')
+        self.assertRegex(out, r'^Ran 5 times in \S+ s: min \S+ s, median \S+ s, p95 \S+ s, stddev \S+ s\n\Z')
+        self.assertEqual(err, '')
+        self.assertEqual(len(os.listdir('runs')), 5)
+        # profiles of runs are removed
+        self.assertEqual(sorted(os.listdir()), [cli._BENCH_OUTPUT, 'child.py', 'runs'])
+        with open(cli._BENCH_OUTPUT) as fp:
+            data = json.load(fp)
+        self.assertEqual(data['runs'], 5)
+        self.assertEqual(data['scripts'][0]['self_times']['median'], [30000])
+
+        for stat, self_time in (
+            ('median', 0.00003),
+            ('min', 0.00001),
+            ('p95', 0.00005),
+        ):
+            with self.subTest(stat=stat):
+                out, err = self.cli('hotspots', '--json', '--stat', stat, cli._BENCH_OUTPUT)
+                self.assertEqual(err, '')
+                self.assertEqual(json.loads(out)['lines'][0]['self_time'], self_time)
+
+        out, err = self.cli('bench', '-n', '1', '-o', 'new.json', sys.executable, 'child.py')
+        self.assertRegex(out, r'^Ran 1 time in ')
+        out, err = self.cli('perfdiff', '--json', cli._BENCH_OUTPUT, 'new.json')
+        self.assertEqual(err, '')
+        data = json.loads(out)
+        self.assertEqual([(v['name'], round(v['delta'], 6)) for v in data['scripts']['regressions']], [(script, 0.00003)])
+
+        with open('broken.json', 'w') as fp:
+            fp.write('{}')
+        out, err = self.cli('hotspots', 'broken.json')
+        self.assertRegex(out, r"(?i)couldn't read bench 'broken\.json': not a bench file")
+
+    def test_calibrate(self):
+        with open('vim.py', 'w') as fp:
+            fp.write(textwrap.dedent("""\
+                import os
+                import sys
+
+                assert sys.argv[-2:] == ['-S', os.environ['CALIBRATE']]
+                path = os.environ['PRIMULA_PROFILE']
+                with open(path, 'w') as fp:
+                    fp.write(\"\"\"\\
+                FUNCTION  PrimulaCalibrate()
+                Called 1 time
+                Total time:   0.005000
+                 Self time:   0.005000
+
+                count  total (s)   self (s)
+                 1001              0.001000   for l:i in range(a:n)
+                 1000              0.002000     let l:x = 0
+                 1001              0.001000   endfor
+
+                FUNCTIONS SORTED ON TOTAL TIME
+                \"\"\")
+                with open(path + '.base', 'w') as fp:
+                    fp.write(sys.argv[1])
+            """))
+        os.environ['CALIBRATE'] = cli.calibration.SCRIPT
+        self.addCleanup(os.environ.pop, 'CALIBRATE')
+
+        out, err = self.cli('calibrate')
+        self.assertRegex(err, r'(?i)nothing to do')
+        out, err = self.cli('calibrate', sys.executable, 'vim.py', 'spam')
+        self.assertRegex(out, r"(?i)calibration failed: could not convert string to float: 'spam'")
+        self.assertFalse(os.path.exists(cli._CALIBRATION))
+
+        out, err = self.cli('calibrate', sys.executable, 'vim.py', '0.000998')
+        self.assertEqual(out, 'Overhead of profiling: 1000.0 ns per line in 3002 lines\n')
+        self.assertEqual(err, '')
+        with open(cli._CALIBRATION) as fp:
+            data = json.load(fp)
+        self.assertEqual(data['lines'], 3002)
+        self.assertEqual(data['vim'], sys.executable)
+        self.assertAlmostEqual(data['overhead'], 0.000001)
+
+        # correct times
+        script = os.path.realpath('spam.vim')
+        path = 'profile.txt'
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   0.000300
+                 Self time:   0.000100
+
+                count  total (s)   self (s)
+                    1              0.000010 function! Main() abort
+                                              echo 1
+                                            endfunction
+                    2   0.000200   0.000020 call Main()
+
+                FUNCTION  Main()
+                    Defined: {script}:1
+                Called 2 times
+                Total time:   0.000180
+                 Self time:   0.000180
+
+                count  total (s)   self (s)
+                    2              0.000180   echo 1
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+        for overhead in ('auto', '0.000001'):
+            with self.subTest(overhead=overhead):
+                with open('.coveragerc', 'w') as fp:
+                    fp.write(f'[primula]\noverhead = {overhead}\n')
+                out, err = self.cli('hotspots', '--json', '-n', '1', path)
+                self.assertEqual(err, '')
+                data = json.loads(out)
+                self.assertEqual([(round(h['total_time'], 6), round(h['self_time'], 6)) for h in data['scripts']], [(0.000297, 0.000097)])
+                self.assertEqual([(h['lineno'], h['self_time']) for h in data['lines']], [(2, 0.000178)])
+
+                out, err = self.cli('hotspots', '--json', '--raw', '-n', '1', path)
+                self.assertEqual(err, '')
+                data = json.loads(out)
+                self.assertEqual([(h['total_time'], h['self_time']) for h in data['scripts']], [(0.0003, 0.0001)])
+                self.assertEqual([(h['lineno'], h['self_time']) for h in data['lines']], [(2, 0.00018)])
+
+                # merged profiles keep raw times
+                out, err = self.cli('merge', '-o', 'merged.txt', path)
+                self.assertEqual(err, '')
+                out, err = self.cli('hotspots', '--json', '--raw', '-n', '1', 'merged.txt')
+                self.assertEqual([(h['total_time'], h['self_time']) for h in json.loads(out)['scripts']], [(0.0003, 0.0001)])
+                out, err = self.cli('hotspots', '--json', '-n', '1', 'merged.txt')
+                self.assertEqual([(round(h['total_time'], 6), round(h['self_time'], 6)) for h in json.loads(out)['scripts']], [(0.000297, 0.000097)])
+
+        # budgets
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\noverhead = auto\nbudgets = Main() self 0.000179\n')
+        out, err = self.cli('combine', '--keep', path)
+        self.assertEqual(out, '')
+        self.assertEqual(err, '')
+        # raw times in the data file
+        self.assertEqual(cli.sqldata.LineData('.coverage').times(script)[2], (None, 0.00018))
+
+        for overhead, msg in (
+            ('spam', 'invalid overhead: spam'),
+            ('-1', 'invalid overhead: -1'),
+        ):
+            with self.subTest(overhead=overhead):
+                with open('.coveragerc', 'w') as fp:
+                    fp.write(f'[primula]\noverhead = {overhead}\n')
+                out, err = self.cli('hotspots', path)
+                self.assertRegex(out, f'(?i){msg}')
+        os.unlink(cli._CALIBRATION)
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\noverhead = auto\n')
+        out, err = self.cli('hotspots', path)
+        self.assertRegex(out, rf'(?i)no calibration: {re.escape(cli._CALIBRATION)}')
+
+    @unittest.skipUnless(shutil.which('vim'), 'requires Vim')
+    def test_calibrate_vim(self):
+        # :profile start does not unescape its argument
+        tmp = os.path.join(self.root, 'has space')
+        os.mkdir(tmp)
+        with unittest.mock.patch.object(tempfile, 'tempdir', tmp):
+            out, err = self.cli('calibrate', 'vim', '--clean', '-Nn', '-es')
+        self.assertRegex(out, r'^Overhead of profiling: \d+\.\d ns per line in \d+ lines\n\Z')
+        self.assertEqual(err, '')
+        self.assertEqual(os.listdir(tmp), [])
+
     def test_combine_no_data(self):
         out, err = self.cli('combine')
         self.assertRegex(out, r'(?i)no data to combine')
@@ -151,6 +441,327 @@ class CLITestCase(PrimulaTestCase):
         self.assertTrue(data.has_arcs())
         self.assertEqual(data.arcs(script), [(-1, 1), (1, 2), (3, 4), (6, 7), (8, 10), (10, 11), (11, 13), (13, -1)])
 
+    def test_combine_jobs(self):
+        scripts = [
+            os.path.realpath('spam.vim'),
+            os.path.realpath('eggs.vim'),
+            os.path.realpath('ham.vim'),
+        ]
+        paths = []
+        for i, script in enumerate(scripts):
+            paths.append(f'profile-{i}.txt')
+            with open(paths[-1], 'w') as fp:
+                fp.write(textwrap.dedent(f"""\
+                    SCRIPT  {script}
+                    Sourced 1 time
+                    Total time:   0.000000
+                     Self time:   0.000000
+
+                    count  total (s)   self (s)
+                        1              0.000000 function! F{i}() abort
+                                                  echo {i}
+                                                endfunction
+                                                echo 'not executed'
+
+                    FUNCTION  F{i}()
+                        Defined: {script}:1
+                    Called 1 time
+                    Total time:   0.000000
+                     Self time:   0.000000
+
+                    count  total (s)   self (s)
+                        1              0.000000   echo {i}?
+
+                    FUNCTIONS SORTED ON TOTAL TIME
+                """))
+                fp.flush()
+
+        for opts, rc in (
+            (('-j', '2'), ''),
+            (('--jobs=0',), ''),
+            ((), '[primula]\njobs = 3\n'),
+        ):
+            with self.subTest(opts=opts, rc=rc):
+                warnings.resetwarnings()
+                with open('.coveragerc', 'w') as fp:
+                    fp.write(rc)
+
+                out, err = self.cli('combine', *opts, *paths)
+                self.assertEqual(out, '')
+                self.assertEqual(re.findall(r'function: (F\d)', err), ['F0', 'F1', 'F2'])
+
+                data = coverage.data.CoverageData()
+                data.read()
+                self.assertEqual(data.measured_files(), set(scripts))
+                for script in scripts:
+                    self.assertEqual(data.lines(script), [1])
+
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\njobs = -1\n')
+        out, err = self.cli('combine', *paths)
+        self.assertRegex(out, r'(?i)invalid jobs: -1')
+
+    def test_combine_budgets(self):
+        script = os.path.realpath('spam.vim')
+        path = 'profile.txt'
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   0.000300
+                 Self time:   0.000100
+
+                count  total (s)   self (s)
+                    1              0.000010 function! Main() abort
+                                              echo 1
+                                            endfunction
+                    2   0.000200   0.000020 call Main()
+
+                FUNCTION  Main()
+                    Defined: {script}:1
+                Called 2 times
+                Total time:   0.000180
+                 Self time:   0.000180
+
+                count  total (s)   self (s)
+                    2              0.000180   echo 1
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+
+        for budgets, violations in (
+            (['spam.vim total 0.001', 'Main() per-call 0.0001'], []),
+            (['*.vim self 0.00005', 'M*() per-call 0.00001', 'Eggs() self 0'], [
+                '  Main(): per-call 0.000090 s > 0.000010 s (M*())',
+                '  spam.vim: self 0.000100 s > 0.000050 s (*.vim)',
+            ]),
+        ):
+            with self.subTest(budgets=budgets):
+                with open('.coveragerc', 'w') as fp:
+                    fp.write('[primula]\nbudgets =\n')
+                    for b in budgets:
+                        fp.write(f'    {b}\n')
+                self.status = None
+                out, err = self.cli('combine', '--keep', path)
+                self.assertEqual(err, '')
+                if violations:
+                    self.assertEqual(out.splitlines(), [f'Budget failure: {len(violations)} violations'] + violations)
+                    self.assertEqual(self.status, 2)
+                else:
+                    self.assertEqual(out, '')
+                    self.assertEqual(self.status, 0)
+
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\nbudgets = spam.vim fast 1\n')
+        out, err = self.cli('combine', '--keep', path)
+        self.assertRegex(out, r'(?i)invalid budget: spam\.vim fast 1')
+
+    def test_combine_cache(self):
+        script = os.path.realpath('spam.vim')
+        path = 'profile.txt'
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   0.000000
+                 Self time:   0.000000
+
+                count  total (s)   self (s)
+                    1              0.000000 echo 1
+                                            echo 2
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+
+        out, err = self.cli('cache', 'clear')
+        self.assertRegex(err, r'(?i)no cache directory')
+
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\ncache_dir = .primula\n')
+        for _ in range(2):
+            out, err = self.cli('combine', '--keep', path)
+            self.assertEqual(out, '')
+            self.assertEqual(err, '')
+
+            data = coverage.data.CoverageData()
+            data.read()
+            self.assertEqual(data.lines(script), [1])
+        self.assertEqual(len([n for n in os.listdir('.primula') if n.endswith('.prof')]), 1)
+
+        out, err = self.cli('cache', 'clear')
+        self.assertEqual(out, 'Cleared 1 cached profile in .primula\n')
+        self.assertEqual(os.listdir('.primula'), [])
+
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\ncache_dir = .primula\ncache_size = 1T\n')
+        out, err = self.cli('combine', path)
+        self.assertRegex(out, r'(?i)invalid cache_size: 1T')
+
+    def test_export(self):
+        script = os.path.realpath('spam.vim')
+        path = 'profile.txt'
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   0.000010
+                 Self time:   0.000010
+
+                count  total (s)   self (s)
+                    1              0.000001 function! Main() abort
+                                              echo 1
+                                            endfunction
+                    1   0.000005   0.000002 call Main()
+
+                FUNCTION  Main()
+                    Defined: {script}:1
+                Called 1 time
+                Total time:   0.000003
+                 Self time:   0.000003
+
+                count  total (s)   self (s)
+                    1              0.000003   echo 1
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+
+        out, err = self.cli('export')
+        self.assertRegex(err, r'(?i)nothing to do')
+
+        for opts, outfile in (
+            ((), 'callgrind.out'),
+            (('--format', 'callgrind', '-o', 'spam.out'), 'spam.out'),
+        ):
+            with self.subTest(opts=opts):
+                out, err = self.cli('export', *opts, path)
+                self.assertEqual(out, '')
+                self.assertEqual(err, '')
+                with open(outfile) as fp:
+                    self.assertEqual(fp.read().split('\n\n')[1:], [
+                        textwrap.dedent(f"""\
+                            fl=(1) {script}
+                            fn=(1) {script}
+                            1 1000 1
+                            4 2000 1
+                            cfl=(1)
+                            cfn=(2) Main()
+                            calls=1 2
+                            4 3000"""),
+                        textwrap.dedent("""\
+                            fl=(1)
+                            fn=(2)
+                            2 3000 1"""),
+                        '',
+                    ])
+
+        out, err = self.cli('export', '--format', 'folded', path)
+        self.assertEqual(out, '')
+        self.assertEqual(err, '')
+        with open('profile.folded') as fp:
+            self.assertEqual(fp.read(), f'{script} 10000\n{script};Main() 3000\n')
+
+        out, err = self.cli('export', '--format', 'folded', '-o', '-', path)
+        self.assertEqual(out, f'{script} 10000\n{script};Main() 3000\n')
+        self.assertEqual(err, '')
+
+        out, err = self.cli('export', '--format', 'speedscope', path)
+        self.assertEqual(out, '')
+        self.assertEqual(err, '')
+        with open('profile.speedscope.json') as fp:
+            data = json.load(fp)
+        self.assertEqual(data['profiles'][0]['name'], path)
+        self.assertEqual(data['profiles'][0]['samples'], [[0], [0, 1]])
+        self.assertEqual(data['profiles'][0]['weights'], [10000, 3000])
+
+    def test_hotspots(self):
+        script = os.path.realpath('spam.vim')
+        paths = []
+        for i in range(2):
+            paths.append(f'profile-{i}.txt')
+            with open(paths[-1], 'w') as fp:
+                fp.write(textwrap.dedent(f"""\
+                    SCRIPT  {script}
+                    Sourced 1 time
+                    Total time:   0.000010
+                     Self time:   0.000010
+
+                    count  total (s)   self (s)
+                        1              0.000001 function! Main() abort
+                                                  echo 1
+                                                endfunction
+                        1   0.000005   0.000002 call Main()
+
+                    FUNCTION  Main()
+                        Defined: {script}:1
+                    Called 1 time
+                    Total time:   0.000003
+                     Self time:   0.000003
+
+                    count  total (s)   self (s)
+                        1              0.000003   echo 1
+
+                    FUNCTIONS SORTED ON TOTAL TIME
+                """))
+
+        out, err = self.cli('hotspots')
+        self.assertRegex(err, r'(?i)nothing to do')
+        out, err = self.cli('hotspots', '-n', '0', *paths)
+        self.assertRegex(err, r'(?i)invalid top: 0')
+
+        out, err = self.cli('hotspots', '-n', '2', *paths)
+        self.assertEqual(out, textwrap.dedent("""\
+            Scripts by self time:
+              Count  Total (s)   Self (s)   Call (s)  Script
+                  2   0.000020   0.000020   0.000010  spam.vim
+
+            Functions by self time:
+              Count  Total (s)   Self (s)   Call (s)  Function
+                  2   0.000006   0.000006   0.000003  Main() (spam.vim:1)
+
+            Lines by self time:
+              Count  Total (s)   Self (s)   Call (s)  Line
+                  2   0.000006   0.000006   0.000003  spam.vim:2: echo 1
+                  2   0.000010   0.000004   0.000005  spam.vim:4: call Main()
+        """))
+        self.assertEqual(err, '')
+
+        out, err = self.cli('hotspots', '--json', '-n', '1', '--sort', 'total', *paths)
+        self.assertEqual(err, '')
+        data = json.loads(out)
+        self.assertEqual(sorted(data), ['functions', 'lines', 'scripts'])
+        self.assertEqual(data['lines'], [{
+            'name': script,
+            'count': 2,
+            'total_time': 0.00001,
+            'self_time': 0.000004,
+            'path': script,
+            'lineno': 4,
+            'line': 'call Main()',
+            'per_call': 0.000005,
+        }])
+
+        out, err = self.cli('hotspots', '--omit', '*/spam.vim', *paths)
+        self.assertEqual(out, '')
+        self.assertEqual(err, '')
+
+        # function of the script which is not profiled
+        with open(paths[0], 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                FUNCTION  Main()
+                    Defined: {script}:1
+                Called 1 time
+                Total time:   0.000003
+                 Self time:   0.000003
+
+                count  total (s)   self (s)
+                    1              0.000003   echo 1
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+        out, err = self.cli('hotspots', '--json', paths[0])
+        self.assertEqual(err, '')
+        self.assertEqual([(h['name'], h['self_time']) for h in json.loads(out)['functions']], [('Main()', 0.000003)])
+
     def test_lcov(self):
         path = 'profile.txt'
         script = os.path.realpath('spam.vim')
@@ -211,6 +822,7 @@ class CLITestCase(PrimulaTestCase):
                 end_of_record
             """))
 
+        # without profile
         os.unlink(path)
 
         out, err = self.cli('lcov')
@@ -225,16 +837,207 @@ class CLITestCase(PrimulaTestCase):
             self.assertEqual(fp.read(), textwrap.dedent("""\
                 TN:
                 SF:spam.vim
-                DA:1,1
-                DA:2,1
-                DA:3,1
-                DA:4,1
-                DA:5,1
+                DA:1,11
+                DA:2,10
+                DA:3,5
+                DA:4,5
+                DA:5,5
                 LF:5
                 LH:5
                 end_of_record
             """))
 
+    def test_load_subtracted(self):
+        script = os.path.realpath('spam.vim')
+
+        def write(path, sourced, called):
+            with open(path, 'w') as fp:
+                fp.write(textwrap.dedent(f"""\
+                    SCRIPT  {script}
+                    Sourced {sourced} time
+                    Total time:   0.000010
+                     Self time:   0.000010
+
+                    count  total (s)   self (s)
+                        1              0.000010 function! Spam() abort
+                                                  echo 'spam'
+                                                endfunction
+
+                    FUNCTION  Spam()
+                        Defined: {script}:1
+                    Called {called} time
+                    Total time:   0.000000
+                     Self time:   0.000000
+
+                    count  total (s)   self (s)
+                    {called:5}              0.000000   echo 'spam'
+
+                    FUNCTIONS SORTED ON TOTAL TIME
+                """))
+
+        # first script sources, and second script calls
+        write('profile-0.txt', 1, 1)
+        base = runner._subtract('profile-0.txt', None)
+        write('profile-1.txt', 1, 2)
+        runner._subtract('profile-1.txt', base)
+        data = cli._load('profile-1.txt')
+        self.assertEqual(data.warnings, [])
+        linenos, counts, _, _ = data.scripts[script]
+        self.assertEqual(list(zip(linenos, counts)), [(1, 0), (2, 1), (3, -1)])
+        self.assertEqual(data.script_times[script][0], 0)
+        self.assertEqual(data.function_times, {'Spam()': (1, 0.0, 0.0)})
+
+    def test_merge(self):
+        script = os.path.realpath('spam.vim')
+        paths = []
+        for i in range(3):
+            paths.append(f'profile-{i}.txt')
+            with open(paths[-1], 'w') as fp:
+                fp.write(textwrap.dedent(f"""\
+                    SCRIPT  {script}
+                    Sourced 1 time
+                    Total time:   0.000010
+                     Self time:   0.000010
+
+                    count  total (s)   self (s)
+                        1              0.000001 function! Main() abort
+                                                  echo 1
+                                                endfunction
+                        1   0.000005   0.000002 call Main()
+
+                    FUNCTION  Main()
+                        Defined: {script}:1
+                    Called 1 time
+                    Total time:   0.000003
+                     Self time:   0.000003
+
+                    count  total (s)   self (s)
+                        1              0.000003   echo 1
+
+                    FUNCTIONS SORTED ON TOTAL TIME
+                """))
+
+        out, err = self.cli('merge')
+        self.assertRegex(err, r'(?i)nothing to do')
+
+        out, err = self.cli('merge', '-o', 'merged.txt', *paths)
+        self.assertEqual(out, '')
+        self.assertEqual(err, '')
+        with open('merged.txt') as fp:
+            self.assertEqual(fp.read(), textwrap.dedent(f"""\
+                SCRIPT  {script}
+                Sourced 3 times
+                Total time:   0.000030
+                 Self time:   0.000030
+
+                count  total (s)   self (s)
+                    3              0.000003 function! Main() abort
+                                              echo 1
+                                            endfunction
+                    3   0.000015   0.000006 call Main()
+
+                FUNCTION  Main()
+                    Defined: {script}:1
+                Called 3 times
+                Total time:   0.000009
+                 Self time:   0.000009
+
+                count  total (s)   self (s)
+                    3              0.000009   echo 1
+
+                FUNCTIONS SORTED ON TOTAL TIME
+                count  total (s)   self (s)  function
+                    3   0.000009   0.000009  Main()
+
+                FUNCTIONS SORTED ON SELF TIME
+                count  total (s)   self (s)  function
+                    3   0.000009   0.000009  Main()
+
+            """))
+
+        out, err = self.cli('merge', paths[0])
+        self.assertRegex(out, r'^SCRIPT  ')
+        self.assertEqual(err, '')
+
+        with open(paths[-1]) as fp:
+            data = fp.read()
+        with open(paths[-1], 'w') as fp:
+            fp.write(data.replace('echo 1', 'echo 2'))
+        out, err = self.cli('merge', *paths)
+        self.assertRegex(out, r'(?i)lines are mismatched')
+
+        out, err = self.cli('merge', 'eggs.txt')
+        self.assertRegex(out, r"(?i)couldn't read profile")
+
+    def test_perfdiff(self):
+        script = os.path.realpath('spam.vim')
+        paths = []
+        for echo, main in ((0.00001, 0.000003), (0.00003, 0.000001)):
+            paths.append(f'profile-{len(paths)}.txt')
+            with open(paths[-1], 'w') as fp:
+                fp.write(textwrap.dedent(f"""\
+                    SCRIPT  {script}
+                    Sourced 1 time
+                    Total time:   0.000100
+                     Self time:   {echo:.6f}
+
+                    count  total (s)   self (s)
+                        1              {echo:.6f} echo 1
+                        1              0.000001 function! Main() abort
+                                                  echo 1
+                                                endfunction
+                        1   0.000010   0.000001 call Main()
+
+                    FUNCTION  Main()
+                        Defined: {script}:2
+                    Called 1 time
+                    Total time:   {main:.6f}
+                     Self time:   {main:.6f}
+
+                    count  total (s)   self (s)
+                        1              {main:.6f}   echo 1
+
+                    FUNCTIONS SORTED ON TOTAL TIME
+                """))
+
+        out, err = self.cli('perfdiff')
+        self.assertRegex(err, r'(?i)nothing to do')
+        out, err = self.cli('perfdiff', paths[0])
+        self.assertRegex(err, r'(?i)need a base profile and a new profile')
+        out, err = self.cli('perfdiff', '-n', '0', *paths)
+        self.assertRegex(err, r'(?i)invalid top: 0')
+
+        out, err = self.cli('perfdiff', *paths)
+        self.assertEqual(out, textwrap.dedent("""\
+            Script regressions by self time:
+                  Base        New      Delta   Change  Script
+              0.000010   0.000030  +0.000020  +200.0%  spam.vim
+
+            Function improvements by self time:
+                  Base        New      Delta   Change  Function
+              0.000003   0.000001  -0.000002   -66.7%  Main() (spam.vim:2)
+
+            Line regressions by self time:
+                  Base        New      Delta   Change  Line
+              0.000010   0.000030  +0.000020  +200.0%  spam.vim:1: echo 1
+
+            Line improvements by self time:
+                  Base        New      Delta   Change  Line
+              0.000003   0.000001  -0.000002   -66.7%  spam.vim:3: echo 1
+        """))
+        self.assertEqual(err, '')
+
+        out, err = self.cli('perfdiff', '--json', '--threshold', '0.000005', *paths)
+        self.assertEqual(err, '')
+        data = json.loads(out)
+        self.assertEqual(data['functions'], {'regressions': [], 'improvements': []})
+        self.assertEqual([(v['name'], v['new']['lineno'], round(v['ratio'], 6)) for v in data['lines']['regressions']], [(script, 1, 2.0)])
+        self.assertEqual(data['lines']['improvements'], [])
+
+        out, err = self.cli('perfdiff', '--sort', 'count', *paths)
+        self.assertEqual(out, '')
+        self.assertEqual(err, '')
+
     def test_run_without_args(self):
         out, err = self.cli('run')
         self.assertNotEqual(out, '')
@@ -263,7 +1066,7 @@ class CLITestCase(PrimulaTestCase):
 
                 profile = profile or cli._PROFILE
                 script = os.path.realpath('spam.vim')
-                with open(profile, 'w') as fp:
+                with open('input.txt', 'w') as fp:
                     fp.write(textwrap.dedent(f"""\
                         SCRIPT  {script}
                         Sourced 1 time
@@ -282,7 +1085,8 @@ class CLITestCase(PrimulaTestCase):
                     """))
                     fp.flush()
 
-                args = [sys.executable, '-c', '...']
+                # command writes the profile
+                args = [sys.executable, '-c', f"import os, shutil; shutil.copy('input.txt', os.environ[{environ or cli._ENVIRON!r}])"]
                 out, err = self.cli('run', *args)
                 self.assertEqual(out, '')
                 self.assertEqual(err, '')
@@ -295,6 +1099,227 @@ class CLITestCase(PrimulaTestCase):
 
                 os.unlink(profile)
 
+    def test_run_jobs(self):
+        with open('child.py', 'w') as fp:
+            fp.write(textwrap.dedent("""\
+                import os
+                import sys
+
+                script = os.path.realpath(sys.argv[1])
+                with open(script, 'w') as fp:
+                    fp.write("echo 'spam'\\n")
+                with open(os.environ['PROFILE'], 'w') as fp:
+                    fp.write(f\"\"\"\\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   0.000000
+                 Self time:   0.000000
+
+                count  total (s)   self (s)
+                    1              0.000000 echo 'spam'
+
+                FUNCTIONS SORTED ON TOTAL TIME
+                \"\"\")
+                sys.exit(sys.argv[2:] == ['fail'])
+            """))
+        names = ['spam.vim', 'eggs.vim', 'ham.vim']
+        with open('manifest.txt', 'w') as fp:
+            fp.write('# scripts\n')
+            for n in names:
+                fp.write(f'{n}\n\n')
+
+        for opts, profile in (
+            (('-j', '2'), ''),
+            (('--jobs=0',), 'profile.{shard}.txt'),
+            ((), ''),
+        ):
+            with self.subTest(opts=opts, profile=profile):
+                with open('.coveragerc', 'w') as fp:
+                    fp.write('[primula]\n')
+                    if profile:
+                        fp.write(f'profile = {profile}\n')
+
+                out, err = self.cli('run', *opts, '--manifest', 'manifest.txt', sys.executable, 'child.py')
+                self.assertEqual(re.sub(r'(?m)^(?:Worker \d+|Slowest worker): .+\n', '', out), '')
+                self.assertEqual(err, '')
+
+                for i in range(len(names)):
+                    path = (profile or 'profile-{shard}.txt').replace('{shard}', str(i))
+                    self.assertTrue(os.path.isfile(path))
+                    os.unlink(path)
+
+                data = coverage.data.CoverageData()
+                data.read()
+                self.assertEqual(data.measured_files(), set(map(os.path.realpath, names)))
+
+        # substitution
+        with open('manifest.txt', 'w') as fp:
+            fp.write('spam.vim\n')
+            fp.write("'eggs.vim' fail\n")
+        out, err = self.cli('run', '-j', '2', '--manifest', 'manifest.txt', sys.executable, 'child.py', '{}')
+        self.assertRegex(out, r'\AWorker 1: 1 command in \d+\.\d{3} s\n'
+                              r'Worker 2: 1 command in \d+\.\d{3} s\n'
+                              r'Slowest worker: \d+\.\d{3} s, mean: \d+\.\d{3} s\n\Z')
+        self.assertEqual(err, '')
+        with open(cli._TIMINGS) as fp:
+            self.assertEqual(sorted(json.load(fp)), ["'eggs.vim' fail", 'eggs.vim', 'ham.vim', 'spam.vim'])
+
+        data = coverage.data.CoverageData()
+        data.read()
+        self.assertEqual(data.measured_files(), set(map(os.path.realpath, names[:2])))
+
+        # pool
+        out, err = self.cli('run', '--pool', '--manifest', 'manifest.txt', sys.executable, 'child.py')
+        self.assertRegex(out, r"(?i)invalid script in manifest: 'eggs\.vim' fail")
+
+        with open('manifest.txt', 'w') as fp:
+            fp.write('spam.vim\n')
+            fp.write('eggs.vim\n')
+        out, err = self.cli('run', '--pool', '--manifest', 'manifest.txt', sys.executable, 'child.py')
+        self.assertRegex(err, r'Could not connect to Vim, falling back to a new process for each script')
+
+        data = coverage.data.CoverageData()
+        data.read()
+        self.assertEqual(data.measured_files(), set(map(os.path.realpath, names[:2])))
+
+        # omit
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[run]\nomit = */eggs.vim\n')
+        out, err = self.cli('run', '--manifest', 'manifest.txt', sys.executable, 'child.py')
+        self.assertEqual(err, '')
+
+        data = coverage.data.CoverageData()
+        data.read()
+        self.assertEqual(data.measured_files(), {os.path.realpath(names[0])})
+
+        # timeout
+        os.unlink('.coverage')
+        out, err = self.cli('run', '--timeout', '0.5', '--manifest', 'manifest.txt',
+                            sys.executable, '-c', 'import time; time.sleep(60)')
+        self.assertEqual(re.sub(r'(?m)^(?:Worker \d+|Slowest worker): .+\n', '', out), '')
+        self.assertEqual(len(re.findall(r'(?m)^Timed out after 0\.5 s: ', err)), 2)
+        # profiles of the previous run are not combined
+        data = coverage.data.CoverageData()
+        data.read()
+        self.assertEqual(data.measured_files(), set())
+
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\ntotal_timeout = -1\n')
+        out, err = self.cli('run', '--manifest', 'manifest.txt', sys.executable, 'child.py')
+        self.assertRegex(out, r'(?i)invalid total_timeout: -1')
+
+        # empty manifest
+        with open('manifest.txt', 'w') as fp:
+            fp.write('# scripts\n')
+        out, err = self.cli('run', '--manifest', 'manifest.txt', sys.executable)
+        self.assertRegex(out, r'(?i)no commands in manifest')
+
+    def test_run_profile_cmd(self):
+        cwd = os.getcwd().replace(os.sep, '/')
+        self.assertEqual(cli._profile_cmd('PROFILE', [], []),
+                         f"execute \"profile start\" $PROFILE | execute 'profile! file' '{cwd}/*'")
+        self.assertEqual(cli._profile_cmd('VIMPROF', [os.path.join(os.getcwd(), 'autoload')], ["*/it's/*"]),
+                         f"execute \"profile start\" $VIMPROF | execute 'profile! file' '{cwd}/autoload/*' | execute 'profile! file' '*/it''s/*'")
+
+        for args in (['vim', '-S', 'spam.vim'], ['/usr/bin/gvim', '-f'], ['VIM.EXE']):
+            with self.subTest(args=args):
+                self.assertEqual(cli._inject(args, 'ls'), [args[0], '--cmd', 'ls', *args[1:]])
+        args = [sys.executable, 'child.py']
+        self.assertIs(cli._inject(args, 'ls'), args)
+
+    def test_run_cache(self):
+        with open('child.py', 'w') as fp:
+            fp.write(textwrap.dedent("""\
+                import os
+                import sys
+
+                script = os.path.realpath(sys.argv[1])
+                with open('ran.txt', 'a') as fp:
+                    fp.write(sys.argv[1] + '\\n')
+                with open(os.environ['PROFILE'], 'w') as fp:
+                    fp.write(f\"\"\"\\
+                SCRIPT  {script}
+                Sourced 1 time
+                Total time:   0.000000
+                 Self time:   0.000000
+
+                count  total (s)   self (s)
+                    1              0.000000 echo 'spam'
+
+                FUNCTIONS SORTED ON TOTAL TIME
+                \"\"\")
+                sys.exit(sys.argv[1] == 'fail.vim')
+            """))
+        names = ['spam.vim', 'eggs.vim', 'fail.vim']
+        for n in names:
+            with open(n, 'w') as fp:
+                fp.write("echo 'spam'\n")
+        with open('manifest.txt', 'w') as fp:
+            fp.write(''.join(f'{n}\n' for n in names))
+
+        def run():
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink('ran.txt')
+            out, err = self.cli('run', '--manifest', 'manifest.txt', sys.executable, 'child.py')
+            self.assertEqual(err, '')
+
+            data = coverage.data.CoverageData()
+            data.read()
+            self.assertEqual(data.measured_files(), set(map(os.path.realpath, names)))
+            with open('ran.txt') as fp:
+                return out, sorted(fp.read().split())
+
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\nrun_cache = True\n')
+        out, err = self.cli('run', '--manifest', 'manifest.txt', sys.executable, 'child.py')
+        self.assertRegex(out, r'(?i)no cache directory is configured for run_cache')
+
+        with open('.coveragerc', 'w') as fp:
+            fp.write('[primula]\ncache_dir = .primula\nrun_cache = True\n')
+        self.assertEqual(run(), ('', sorted(names)))
+        self.assertEqual(run(), ('Reused 2 cached profiles\n', ['fail.vim']))
+        # touched
+        os.utime('spam.vim', (0, 0))
+        self.assertEqual(run(), ('Reused 2 cached profiles\n', ['fail.vim']))
+        # changed
+        with open('eggs.vim', 'a') as fp:
+            fp.write("echo 'eggs'\n")
+        self.assertEqual(run(), ('Reused 1 cached profile\n', ['eggs.vim', 'fail.vim']))
+        # command line
+        with open('child.py', 'a') as fp:
+            fp.write('\n')
+        self.assertEqual(run(), ('', sorted(names)))
+
+        out, err = self.cli('cache', 'clear')
+        self.assertRegex(out, r'\ACleared \d+ cached profiles in \.primula\n\Z')
+        self.assertEqual(os.listdir('.primula'), [])
+        self.assertEqual(run(), ('', sorted(names)))
+
+    @unittest.skipUnless(shutil.which('vim'), 'requires Vim')
+    def test_run_pool_vim(self):
+        os.mkdir('autoload')
+        with open(os.path.join('autoload', 'spam.vim'), 'w') as fp:
+            fp.write(textwrap.dedent("""\
+                function! spam#eggs() abort
+                  return 1
+                endfunction
+            """))
+        names = ['eggs.vim', 'ham.vim']
+        for n in names:
+            with open(n, 'w') as fp:
+                fp.write('call spam#eggs()\n')
+        with open('manifest.txt', 'w') as fp:
+            fp.write(''.join(f'{n}\n' for n in names))
+
+        # second script only calls the function which is defined by first one
+        out, err = self.cli('run', '--pool', '--manifest', 'manifest.txt',
+                            'vim', '--clean', '-Nnu', 'NONE', '--cmd', f'set rtp^={self.root}', '-S', '{}', '-c', 'q')
+        self.assertEqual(err, '')
+        data = coverage.data.CoverageData()
+        data.read()
+        self.assertEqual(data.measured_files(), {os.path.realpath(p) for p in (*names, os.path.join('autoload', 'spam.vim'))})
+        self.assertEqual(sorted(data.lines(os.path.realpath(os.path.join('autoload', 'spam.vim')))), [1, 2])
+
     def test_run_with_append(self):
         with open('.coveragerc', 'w') as fp:
             fp.write(textwrap.dedent("""\
@@ -303,12 +1328,11 @@ class CLITestCase(PrimulaTestCase):
             """))
             fp.flush()
 
-        profile = 'profile.txt'
         scripts = [
             os.path.realpath('spam.vim'),
             os.path.realpath('eggs.vim'),
         ]
-        with open(profile, 'w') as fp:
+        with open('input.txt', 'w') as fp:
             fp.write(textwrap.dedent(f"""\
                 SCRIPT  {scripts[0]}
                 Sourced 1 time
@@ -327,7 +1351,8 @@ class CLITestCase(PrimulaTestCase):
             """))
             fp.flush()
 
-        args = [sys.executable, '-c', '...']
+        # command writes the profile
+        args = [sys.executable, '-c', f"import os, shutil; shutil.copy('input.txt', os.environ[{cli._ENVIRON!r}])"]
         out, err = self.cli('run', *args)
         self.assertEqual(out, '')
         self.assertEqual(err, '')
@@ -338,7 +1363,7 @@ class CLITestCase(PrimulaTestCase):
         self.assertFalse(data.has_arcs())
         self.assertEqual(data.lines(scripts[0]), [1])
 
-        with open(profile, 'w') as fp:
+        with open('input.txt', 'w') as fp:
             fp.write(textwrap.dedent(f"""\
                 SCRIPT  {scripts[1]}
                 Sourced 1 time
@@ -357,7 +1382,8 @@ class CLITestCase(PrimulaTestCase):
             """))
             fp.flush()
 
-        args = [sys.executable, '-c', '...']
+        # command writes the profile
+        args = [sys.executable, '-c', f"import os, shutil; shutil.copy('input.txt', os.environ[{cli._ENVIRON!r}])"]
         out, err = self.cli('run', '-a', *args)
         self.assertEqual(out, '')
         self.assertEqual(err, '')
@@ -1,7 +1,7 @@
 #
 # test_core
 #
-#   Copyright (c) 2024 Akinori Hattori <hattya@gmail.com>
+#   Copyright (c) 2024-2026 Akinori Hattori <hattya@gmail.com>
 #
 #   SPDX-License-Identifier: Apache-2.0
 #
@@ -757,6 +757,393 @@ class CoreTestCase(PrimulaTestCase):
                 ])
                 self.assertFalse(f.mapped)
 
+    def test_iter_profile(self):
+        for tag in self.tags:
+            with self.subTest(tag=tag):
+                version_info = self.version_info(tag)
+
+                it = core.iter_profile(self.profile(f'global.{tag}.txt'))
+                path = 'tests/vimfiles/global.vim'
+                s = next(it)
+                self.assertIsInstance(s, core.Script)
+                self.assertEqual(s.path, path)
+                self.assertEqual(self.lines(s), [
+                    (1, 'function! Today() abort'),
+                    (0, "  echo strftime('%Y-%m-%d')"),
+                    (0, 'endfunction'),
+                    (0, ''),
+                    (1, 'function! Main() abort'),
+                    (0, "  echo 'Hello, world!'"),
+                    (0, 'endfunction'),
+                    (0, ''),
+                    (1, 'call Main()'),
+                ])
+
+                f = next(it)
+                self.assertIsInstance(f, core.Function)
+                self.assertEqual(f.name, 'Today()')
+                if version_info >= (8, 1, 365):
+                    self.assertEqual(f.defined, (path, 1))
+                else:
+                    self.assertIsNone(f.defined)
+                self.assertFalse(f.mapped)
+
+                f = next(it)
+                self.assertIsInstance(f, core.Function)
+                self.assertEqual(f.name, 'Main()')
+                self.assertEqual(self.lines(f), [
+                    (1, "  echo 'Hello, world!'"),
+                ])
+                self.assertFalse(f.mapped)
+
+                with self.assertRaises(StopIteration):
+                    next(it)
+
+    def test_lines(self):
+        with self.tempfile() as path:
+            with open(path, 'w') as fp:
+                fp.write(textwrap.dedent("""\
+                    SCRIPT  tests/vimfiles/lines.vim
+                    Sourced 1 time
+                    Total time:   0.000012345
+                     Self time:   0.000012345
+
+                    count     total (s)      self (s)
+                        1   0.000012345   0.000001234 echo 1
+                                                echo 2
+                        2              0.000000100 echo 3
+
+                    FUNCTIONS SORTED ON TOTAL TIME
+                """))
+                fp.flush()
+
+            p = core.Profile(path)
+            sl = p.scripts['tests/vimfiles/lines.vim'].lines
+            self.assertEqual(len(sl), 3)
+            self.assertEqual(sl.counts.tolist(), [1, core._NONE, 2])
+            self.assertEqual(sl.total_times.tolist(), [12345, core._NONE, core._NONE])
+            self.assertEqual(sl.self_times.tolist(), [1234, core._NONE, 100])
+            self.assertEqual(sl.text, ['echo 1', 'echo 2', 'echo 3'])
+
+            self.assertEqual(list(sl), [
+                core.Line(1, 0.000012345, 0.000001234, 'echo 1'),
+                core.Line(None, None, None, 'echo 2'),
+                core.Line(2, None, 0.0000001, 'echo 3'),
+            ])
+            self.assertEqual(sl[-1], core.Line(2, None, 0.0000001, 'echo 3'))
+            with self.assertRaises(IndexError):
+                sl[3]
+
+            l = sl[1]
+            l.count = 3
+            l.self_time = 0.000002
+            self.assertEqual(sl.counts[1], 3)
+            self.assertEqual(sl.self_times[1], 2000)
+            self.assertEqual(repr(l), "Line(count=3, total_time=None, self_time=2e-06, line='echo 2')")
+
+            self.assertEqual(sl[1:], core.Lines([sl[1], sl[2]]))
+            del sl[1:]
+            self.assertEqual(sl.text, ['echo 1'])
+
+    def test_jobs(self):
+        root = os.path.join(os.path.dirname(__file__), 'profiles')
+        for name in sorted(os.listdir(root)):
+            with self.subTest(name=name):
+                p = core.Profile(self.profile(name))
+                for jobs in (2, 8):
+                    pp = core.Profile(self.profile(name), jobs=jobs)
+                    self.assertEqual(pp.scripts, p.scripts)
+                    self.assertEqual(pp.functions, p.functions)
+
+        with self.tempfile() as path:
+            with open(self.profile('nested.v9.0.1411.txt'), encoding='utf-8') as fp:
+                data = fp.read()
+            with open(path, 'w', encoding='utf-8', newline='\r\n') as fp:
+                fp.write(data)
+            self.assertEqual(len(core._split(path, 4)), 5)
+            p = core.Profile(path, jobs=4)
+            self.assertEqual(p.functions, core.Profile(path).functions)
+
+            # parse error
+            i = data.index('FUNCTION  ', len(data) // 2)
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write(data[:i] + data[i:].replace('Called ', 'Calling ', 1))
+            lineno = data[:i].count('\n') + 3
+            for jobs in (1, 2):
+                with self.assertRaises(primula.ProfileError) as cm:
+                    core.Profile(path, jobs=jobs)
+                self.assertEqual(str(cm.exception), 'cannot parse FUNCTION')
+                self.assertEqual(cm.exception.lineno, lineno)
+
+    def test_lazy(self):
+        root = os.path.join(os.path.dirname(__file__), 'profiles')
+        for name in sorted(os.listdir(root)):
+            with self.subTest(name=name):
+                p = core.Profile(self.profile(name))
+                lp = core.Profile(self.profile(name), lazy=True)
+                self.assertEqual(list(lp.scripts), list(p.scripts))
+                self.assertEqual(len(lp.functions), len(p.functions))
+                for path, s in p.scripts.items():
+                    self.assertEqual(lp.scripts[path], s)
+                for f in p.functions:
+                    self.assertEqual(lp.function(f.name), f)
+                self.assertEqual(list(lp.functions), p.functions)
+                self.assertEqual(lp.functions[-1:], p.functions[-1:])
+                with self.assertRaises(KeyError):
+                    lp.function('_()')
+
+        # load on demand
+        with self.tempfile() as path:
+            with open(path, 'w') as fp:
+                for i in range(3):
+                    fp.write(textwrap.dedent(f"""\
+                        SCRIPT  tests/vimfiles/lazy{i}.vim
+                        Sourced 1 time
+                        Total time:   0.000000
+                         Self time:   0.000000
+
+                        count  total (s)   self (s)
+                            1              0.000000 function! F{i}() abort
+                                                      echo {i}
+                                                    endfunction
+
+                    """))
+                for i in range(3):
+                    fp.write(textwrap.dedent(f"""\
+                        FUNCTION  F{i}()
+                            Defined: tests/vimfiles/lazy{i}.vim:1
+                        Called 1 time
+                        Total time:   0.000000
+                         Self time:   0.000000
+
+                        count  total (s)   self (s)
+                            1              0.000000   echo {i}
+
+                    """))
+                fp.write('FUNCTIONS SORTED ON TOTAL TIME\n')
+                fp.flush()
+
+            p = core.Profile(path, lazy=True)
+            self.assertEqual(list(p.scripts), [f'tests/vimfiles/lazy{i}.vim' for i in range(3)])
+            self.assertEqual(p._loaded, {})
+            self.assertEqual(p._floaded, {})
+
+            s = p.scripts['tests/vimfiles/lazy1.vim']
+            self.assertEqual(self.lines(s), [
+                (1, 'function! F1() abort'),
+                (1, '  echo 1'),
+                (0, 'endfunction'),
+            ])
+            self.assertEqual(list(p._loaded), ['tests/vimfiles/lazy1.vim'])
+            self.assertEqual(list(p._floaded), [1])
+            self.assertTrue(p.functions[1].mapped)
+
+            f = p.function('F2()')
+            self.assertTrue(f.mapped)
+            self.assertEqual(list(p._loaded), ['tests/vimfiles/lazy1.vim', 'tests/vimfiles/lazy2.vim'])
+            self.assertEqual(list(p._floaded), [1, 2])
+
+            # parse error
+            with open(path) as fp:
+                data = fp.read()
+            with open(path, 'w') as fp:
+                fp.write(data.replace('Called ', 'Calling ', 1))
+            p = core.Profile(path, lazy=True)
+            self.assertEqual(self.lines(p.scripts['tests/vimfiles/lazy2.vim']), [
+                (1, 'function! F2() abort'),
+                (1, '  echo 2'),
+                (0, 'endfunction'),
+            ])
+            with self.assertRaises(primula.ProfileError) as cm:
+                p.scripts['tests/vimfiles/lazy0.vim']
+            self.assertEqual(str(cm.exception), 'cannot parse FUNCTION')
+            self.assertEqual(cm.exception.lineno, data[:data.index('Called ')].count('\n') + 1)
+
+    def test_merge_profiles(self):
+        for tag in self.tags:
+            with self.subTest(tag=tag):
+                p = core.Profile(self.profile(f'dict.{tag}.txt'))
+                m = core.merge_profiles([p, core.Profile(self.profile(f'dict.{tag}.txt'))])
+                self.assertEqual(list(m.scripts), list(p.scripts))
+                self.assertEqual(len(m.functions), len(p.functions))
+
+                path = 'tests/vimfiles/dict.vim'
+                s = m.scripts[path]
+                self.assertEqual(s.sourced, 2)
+                self.assertAlmostEqual(s.total_time, p.scripts[path].total_time * 2)
+                self.assertEqual(self.lines(s), [(n * 2, l) for n, l in self.lines(p.scripts[path])])
+                self.assertEqual([t * 2 if t >= 0 else t for t in p.scripts[path].lines.self_times],
+                                 s.lines.self_times.tolist())
+
+                f = m.functions[1]
+                self.assertEqual(f.name, '2()')
+                self.assertEqual(f.called, 2)
+                self.assertAlmostEqual(f.self_time, p.functions[1].self_time * 2)
+                self.assertEqual(self.lines(f), [
+                    (2, "  echo 'Hello, world!'"),
+                ])
+                self.assertTrue(f.mapped)
+                # not modified
+                self.assertEqual(p.scripts[path].sourced, 1)
+                self.assertEqual(p.functions[1].called, 1)
+
+        p = core.merge_profiles([core.Profile(self.profile('global.v9.0.1411.txt')),
+                                 core.Profile(self.profile('dict.v9.0.1411.txt'))])
+        self.assertEqual(list(p.scripts), ['tests/vimfiles/global.vim', 'tests/vimfiles/dict.vim'])
+        self.assertEqual([f.name for f in p.functions], ['Today()', 'Main()', '1()', '2()'])
+
+        root = os.path.join(os.path.dirname(__file__), 'profiles')
+        for name in sorted(os.listdir(root)):
+            with self.subTest(name=name):
+                p = core.Profile(self.profile(name))
+                m = core.merge_profiles([p])
+                self.assertEqual(m.scripts, p.scripts)
+                self.assertEqual(m.functions, p.functions)
+
+        # lambda expressions in a line
+        with self.tempfile() as path:
+            with open(path, 'w') as fp:
+                fp.write(textwrap.dedent("""\
+                    FUNCTION  <lambda>1()
+                        Defined: tests/vimfiles/lambda.vim:1
+                    Called 1 time
+                    Total time:   0.000002
+                     Self time:   0.000002
+
+                    count  total (s)   self (s)
+                                                return x + 1
+
+                    FUNCTION  <lambda>2()
+                        Defined: tests/vimfiles/lambda.vim:1
+                    Called 1 time
+                    Total time:   0.000001
+                     Self time:   0.000001
+
+                    count  total (s)   self (s)
+                                                return x * 2 + 3
+
+                    FUNCTIONS SORTED ON TOTAL TIME
+                """))
+            p = core.Profile(path, mapping=False)
+            m = core.merge_profiles([p, p])
+            self.assertEqual([(f.name, f.called) for f in m.functions], [('<lambda>1()', 2), ('<lambda>2()', 2)])
+
+        # mismatch
+        p = core.Profile(self.profile('dict.v9.0.1411.txt'))
+        pp = core.Profile(self.profile('dict.v9.0.1411.txt'))
+        pp.scripts['tests/vimfiles/dict.vim'].lines.text[0] = 'let s:dict = {1: 1}'
+        with self.assertRaisesRegex(ValueError, r'^lines are mismatched: SCRIPT  tests/vimfiles/dict\.vim$'):
+            core.merge_profiles([p, pp])
+
+    def test_subtract_profile(self):
+        for tag in self.tags:
+            with self.subTest(tag=tag):
+                base = core.Profile(self.profile(f'global.{tag}.txt'), mapping=False)
+                p = core.merge_profiles([base, core.Profile(self.profile(f'global.{tag}.txt'), mapping=False)])
+                d = core.subtract_profile(p, base)
+                self.assertEqual(d.scripts, base.scripts)
+                self.assertEqual(d.functions, [f for f in base.functions if f.called])
+                # not modified
+                self.assertEqual(p.scripts['tests/vimfiles/global.vim'].sourced, 2)
+
+                # not executed
+                d = core.subtract_profile(base, base)
+                self.assertEqual(d.scripts, {})
+                self.assertEqual(d.functions, [])
+
+        base = core.Profile(self.profile('global.v9.0.1411.txt'), mapping=False)
+        p = core.merge_profiles([base, base])
+        # sourced only
+        f = p.functions[0]
+        f.called = base.functions[0].called
+        f.lines = base.functions[0].lines[:]
+        # redefined
+        f = p.functions[1]
+        f.called = 1
+        f.lines.text[0] = "  echo 'Hello, Vim!'"
+        d = core.subtract_profile(p, base)
+        self.assertEqual(d.scripts, base.scripts)
+        self.assertEqual([f.name for f in d.functions], ['Main()'])
+        self.assertEqual(d.functions[0].called, 1)
+        self.assertEqual(d.functions[0].lines, f.lines)
+
+        # called only
+        path = 'tests/vimfiles/global.vim'
+        p = core.merge_profiles([base, base])
+        p.scripts[path] = base.scripts[path]
+        d = core.subtract_profile(p, base)
+        s = d.scripts[path]
+        self.assertEqual(s.sourced, 0)
+        self.assertEqual(s.lines.text, base.scripts[path].lines.text)
+        self.assertEqual(set(s.lines.counts), {core._NONE})
+        self.assertEqual([(f.name, f.called) for f in d.functions], [('Main()', 1)])
+        d._map_all()
+        self.assertEqual([(l.count, l.line) for l in s.lines if l.count is not None], [
+            (1, "  echo 'Hello, world!'"),
+        ])
+
+    def test_correct_profile(self):
+        base = core.Profile(self.profile('global.v9.0.1411.txt'), mapping=False)
+        p = core.correct_profile(base, 0.00001)
+        s = p.scripts['tests/vimfiles/global.vim']
+        self.assertEqual((s.sourced, round(s.total_time, 6), round(s.self_time, 6)), (1, 0.000631, 0.000091))
+        self.assertEqual([(l.count, l.total_time, l.self_time) for l in s.lines if l.count is not None], [
+            (1, None, 0.000011),
+            (1, None, 0.0),
+            (1, 0.000565, 0.000024),
+        ])
+        self.assertEqual([(f.name, f.defined, f.called, f.total_time, f.self_time) for f in p.functions], [
+            ('Today()', ('tests/vimfiles/global.vim', 1), 0, 0.0, 0.0),
+            ('Main()', ('tests/vimfiles/global.vim', 5), 1, 0.00053, 0.00053),
+        ])
+        self.assertEqual(p.functions[1].lines[0].self_time, 0.000528)
+        # not modified
+        self.assertEqual(base.scripts['tests/vimfiles/global.vim'].lines[0].self_time, 0.000021)
+        self.assertEqual(base.functions[1].self_time, 0.00054)
+
+    def test_write_profile(self):
+        root = os.path.join(os.path.dirname(__file__), 'profiles')
+        for name in sorted(os.listdir(root)):
+            with self.subTest(name=name):
+                p = core.Profile(self.profile(name))
+                with self.tempfile() as path:
+                    with open(path, 'w', encoding='utf-8') as fp:
+                        core.write_profile(p, fp)
+                    pp = core.Profile(path)
+                    self.assertEqual(pp.scripts, p.scripts)
+                    self.assertEqual(pp.functions, p.functions)
+
+        # ns
+        p = core.Profile(self.profile('global.v9.0.1411.txt'))
+        p.scripts['tests/vimfiles/global.vim'].lines.total_times[-1] += 1
+        p.functions[1].lines.self_times[0] += 1
+        with self.tempfile() as path:
+            with open(path, 'w', encoding='utf-8') as fp:
+                core.write_profile(p, fp)
+            with open(path, encoding='utf-8') as fp:
+                self.assertIn('count     total (s)      self (s)\n', fp.read())
+
+            pp = core.Profile(path)
+            self.assertEqual(pp.scripts, p.scripts)
+            self.assertEqual(pp.functions, p.functions)
+
+    def test_no_functions(self):
+        with self.tempfile() as path:
+            with open(path, 'w') as fp:
+                fp.write(textwrap.dedent("""\
+                    SCRIPT  spam.vim
+                    Sourced 1 time
+                    Total time:   0.000000
+                     Self time:   0.000000
+
+                    count  total (s)   self (s)
+                        1              0.000000 echo 1
+
+                """))
+            p = core.Profile(path)
+            self.assertEqual(list(p.scripts), ['spam.vim'])
+            self.assertEqual(p.functions, [])
+
     def test_script_line_mismatch(self):
         with self.tempdir() as root:
             path = os.path.join(root, 'profile.txt')
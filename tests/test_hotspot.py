@@ -0,0 +1,98 @@
+#
+# test_hotspot
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+import textwrap
+
+from primula import core, hotspot
+from base import PrimulaTestCase
+
+
+class HotspotTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._dir = self.tempdir()
+        self.script = os.path.join(self._dir.name, 'spam.vim')
+        with open(self.script, 'w') as fp:
+            fp.write(textwrap.dedent("""\
+                function! Main() abort
+                  echo 1
+                endfunction
+                call Main()
+                call Main()
+            """))
+        path = os.path.join(self._dir.name, 'profile.txt')
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {self.script}
+                Sourced 1 time
+                Total time:   0.000300
+                 Self time:   0.000100
+
+                count  total (s)   self (s)
+                    1              0.000010 function! Main() abort
+                                              echo 1
+                                            endfunction
+                    2   0.000200   0.000020 call Main()
+                                            call Main()
+
+                FUNCTION  Main()
+                    Defined: {self.script}:1
+                Called 2 times
+                Total time:   0.000180
+                 Self time:   0.000180
+
+                count  total (s)   self (s)
+                    2              0.000180   echo 1
+
+                FUNCTION  <SNR>1_Unknown()
+                Called 3 times
+                Total time:   0.000030
+                 Self time:   0.000030
+
+                count  total (s)   self (s)
+                    3              0.000030   return 1
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+        self.profile = core.Profile(path)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_scripts(self):
+        v = hotspot.scripts(self.profile, 10, 'self')
+        self.assertEqual([(h.name, h.count, h.total_time, h.self_time, h.per_call) for h in v],
+                         [(self.script, 1, 0.0003, 0.0001, 0.0003)])
+        self.assertEqual(hotspot.scripts(self.profile, 10, 'self', lambda path: False), [])
+
+    def test_functions(self):
+        for key, names in (
+            ('self', ['Main()', '<SNR>1_Unknown()']),
+            ('count', ['<SNR>1_Unknown()', 'Main()']),
+            ('per-call', ['Main()', '<SNR>1_Unknown()']),
+        ):
+            with self.subTest(key=key):
+                self.assertEqual([h.name for h in hotspot.functions(self.profile, 10, key)], names)
+        v = hotspot.functions(self.profile, 1, 'total')
+        self.assertEqual([(h.name, h.path, h.lineno, h.per_call) for h in v], [('Main()', self.script, 1, 0.00009)])
+        # functions not defined in scripts are not matched
+        self.assertEqual([h.name for h in hotspot.functions(self.profile, 10, 'self', lambda path: True)], ['Main()'])
+
+    def test_lines(self):
+        for key, lines in (
+            ('self', [(self.script, 2), ('<SNR>1_Unknown()', 1), (self.script, 4), (self.script, 1)]),
+            ('total', [(self.script, 4), (self.script, 2), ('<SNR>1_Unknown()', 1), (self.script, 1)]),
+            ('count', [('<SNR>1_Unknown()', 1), (self.script, 2), (self.script, 4), (self.script, 1)]),
+            ('per-call', [(self.script, 4), (self.script, 2), (self.script, 1), ('<SNR>1_Unknown()', 1)]),
+        ):
+            with self.subTest(key=key):
+                self.assertEqual([(h.name, h.lineno) for h in hotspot.lines(self.profile, 10, key)], lines)
+        v = hotspot.lines(self.profile, 1, 'self', lambda path: True)
+        self.assertEqual([(h.path, h.lineno, h.line, h.count, h.total_time, h.self_time) for h in v],
+                         [(self.script, 2, '  echo 1', 2, 0.00018, 0.00018)])
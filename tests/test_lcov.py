@@ -12,7 +12,7 @@ import textwrap
 
 import coverage.cmdline
 
-from primula import cli, core, lcov
+from primula import cli, lcov
 from base import PrimulaTestCase
 
 
@@ -84,24 +84,30 @@ class LCOVTestCase(PrimulaTestCase):
 
         c = cli._Coverage()
         c.combine([path])
+        # twice
+        c.combine([path])
 
-        r = lcov.LCOVReporter(c, core.Profile(path))
+        r = lcov.LCOVReporter(c)
         out = io.StringIO()
         self.assertEqual(r.report(None, out), 100.0)
         self.assertEqual(out.getvalue(), textwrap.dedent("""\
             TN:
             SF:spam.vim
-            DA:1,11
-            DA:2,10
-            DA:3,5
-            DA:4,5
-            DA:5,5
+            DA:1,22
+            DA:2,20
+            DA:3,10
+            DA:4,10
+            DA:5,10
             LF:5
             LH:5
             end_of_record
         """))
 
-        r = lcov.LCOVReporter(c, None)
+        os.unlink(c.get_data().data_filename())
+        c = cli._Coverage()
+        c.get_data().add_lines({script: [1, 2, 3, 4, 5, 6]})
+        c.get_data().add_file_tracers({script: cli._FILE_TRACER})
+        r = lcov.LCOVReporter(c)
         out = io.StringIO()
         self.assertEqual(r.report(None, out), 100.0)
         self.assertEqual(out.getvalue(), textwrap.dedent("""\
@@ -0,0 +1,135 @@
+#
+# test_perfdiff
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import math
+import os
+import textwrap
+
+from primula import core, perfdiff
+from base import PrimulaTestCase
+
+
+class PerfdiffTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._dir = self.tempdir()
+        self.script = os.path.join(self._dir.name, 'spam.vim')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def profile(self, name, snr, echo, extra=''):
+        path = os.path.join(self._dir.name, name)
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {self.script}
+                Sourced 1 time
+                Total time:   0.000100
+                 Self time:   {echo:.6f}
+
+                count  total (s)   self (s)
+                {{extra}}    1              {echo:.6f} echo 1
+                    1              0.000001 function! s:Main() abort
+                                              return 1
+                                            endfunction
+                    1   0.000010   0.000001 call s:Main()
+
+                FUNCTION  <SNR>{snr}_Main()
+                    Defined: {self.script}:{2 if not extra else 3}
+                Called 1 time
+                Total time:   0.000010
+                 Self time:   0.000010
+
+                count  total (s)   self (s)
+                    1              0.000010   return 1
+
+                FUNCTION  {snr}()
+                Called 1 time
+                Total time:   0.000001
+                 Self time:   0.000001
+
+                count  total (s)   self (s)
+                    1              0.000001   return 0
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """).format(extra=extra))
+        return core.Profile(path)
+
+    def test_scripts(self):
+        base = self.profile('base.txt', 1, 0.00001)
+        new = self.profile('new.txt', 2, 0.00005)
+        v = list(perfdiff.scripts(base, new))
+        self.assertEqual(len(v), 1)
+        self.assertEqual(v[0].name, self.script)
+        self.assertEqual(v[0].values('self'), (0.00001, 0.00005))
+        self.assertAlmostEqual(v[0].delta('self'), 0.00004)
+        self.assertAlmostEqual(v[0].ratio('self'), 4.0)
+        self.assertEqual(v[0].delta('count'), 0)
+
+    def test_functions(self):
+        base = self.profile('base.txt', 1, 0.00001)
+        new = self.profile('new.txt', 2, 0.00001)
+        # script IDs are ignored, and numbered functions without sites are aligned by their lines
+        self.assertEqual([(c.base.name, c.new.name) for c in perfdiff.functions(base, new)], [
+            ('<SNR>1_Main()', '<SNR>2_Main()'),
+            ('1()', '2()'),
+        ])
+
+        # lambda expressions in a line
+        path = os.path.join(self._dir.name, 'lambda.txt')
+        with open(path, 'w') as fp:
+            for i, body in enumerate(('return x + 1', 'return x * 2 + 3'), 1):
+                fp.write(textwrap.dedent(f"""\
+                    FUNCTION  <lambda>{i}()
+                        Defined: {self.script}:1
+                    Called 1 time
+                    Total time:   0.00000{i}
+                     Self time:   0.00000{i}
+
+                    count  total (s)   self (s)
+                                                {body}
+
+                """))
+            fp.write('FUNCTIONS SORTED ON TOTAL TIME\n')
+        p = core.Profile(path, mapping=False)
+        self.assertEqual([(c.name, c.delta('self')) for c in perfdiff.functions(core.Profile._new('', [], []), p)], [
+            ('<lambda>1()', 0.000001),
+            ('<lambda>2()', 0.000002),
+        ])
+
+    def test_lines(self):
+        base = self.profile('base.txt', 1, 0.00001)
+        new = self.profile('new.txt', 1, 0.00002, extra='    1              0.000003 echo 0\n')
+        changes = {(c.name, c.base.lineno if c.base else None, c.new.lineno if c.new else None): c.delta('self')
+                   for c in perfdiff.lines(base, new)}
+        self.assertEqual({k: round(v, 6) for k, v in changes.items()}, {
+            (self.script, None, 1): 0.000003,
+            (self.script, 1, 2): 0.00001,
+            (self.script, 2, 3): 0.0,
+            (self.script, 3, 4): 0.0,
+            (self.script, 5, 6): 0.0,
+            ('1()', 1, 1): 0.0,
+        })
+
+    def test_top(self):
+        base = self.profile('base.txt', 1, 0.00001)
+        new = self.profile('new.txt', 1, 0.00002, extra='    1              0.000030 echo 0\n')
+        regressions, improvements = perfdiff.top(perfdiff.lines(base, new), 1, 'self')
+        self.assertEqual([(c.base, c.new.lineno) for c in regressions], [(None, 1)])
+        self.assertEqual(improvements, [])
+        self.assertTrue(math.isinf(regressions[0].ratio('self')))
+
+        regressions, improvements = perfdiff.top(perfdiff.lines(base, new), 10, 'self', relative=True)
+        self.assertEqual([c.new.lineno for c in regressions], [1, 2])
+        regressions, improvements = perfdiff.top(perfdiff.lines(base, new), 10, 'self', threshold=0.00002)
+        self.assertEqual([c.new.lineno for c in regressions], [1])
+
+        regressions, improvements = perfdiff.top(perfdiff.lines(new, base), 10, 'self')
+        self.assertEqual(regressions, [])
+        self.assertEqual([c.base.lineno for c in improvements], [1, 2])
+        self.assertEqual(improvements[0].ratio('self'), -1.0)
@@ -0,0 +1,190 @@
+#
+# test_runner
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import contextlib
+import io
+import os
+import sys
+import textwrap
+import time
+
+from primula import core, runner
+from primula.exception import PoolError
+from base import PrimulaTestCase
+
+
+class BaseTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._dir = self.tempdir()
+        self.root = self._dir.name
+        os.chdir(self.root)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._dir.cleanup()
+
+    def python(self, code):
+        return [sys.executable, '-c', code]
+
+    def run_(self, r, *args, **kwargs):
+        out = io.StringIO()
+        err = io.StringIO()
+        with (contextlib.redirect_stdout(out),
+              contextlib.redirect_stderr(err)):
+            results = r.run(*args, **kwargs)
+        return results, out.getvalue(), err.getvalue()
+
+
+class RunnerTestCase(BaseTestCase):
+
+    def test_multiplex(self):
+        code = ('import os, sys\n'
+                "print(os.environ['PROFILE'])\n"
+                "print('error', file=sys.stderr)\n"
+                "sys.stdout.write('no newline')\n"
+                'sys.exit(len(sys.argv) - 1)')
+        cmds = [self.python(code), self.python(code) + ['fail']]
+        r = runner.Runner('PROFILE', 2, multiplex=True)
+        results, out, err = self.run_(r, cmds, ['profile-0.txt', 'profile-1.txt'])
+        self.assertEqual([v.returncode for v in results], [0, 1])
+        self.assertEqual(sorted(v.worker for v in results), [0, 1])
+        self.assertFalse(any(v.timed_out for v in results))
+        self.assertEqual(sorted(out.splitlines()), [
+            '[0] no newline',
+            '[0] profile-0.txt',
+            '[1] no newline',
+            '[1] profile-1.txt',
+        ])
+        self.assertEqual(err.splitlines(), ['[0] error', '[1] error'] if err.startswith('[0]') else ['[1] error', '[0] error'])
+
+    def test_order(self):
+        code = ("with open('order.txt', 'a') as fp:\n"
+                "    fp.write(__import__('sys').argv[1])")
+        cmds = [self.python(code) + [str(i)] for i in range(4)]
+        r = runner.Runner('PROFILE', 1)
+        results, out, err = self.run_(r, cmds, [f'profile-{i}.txt' for i in range(4)], [2, 0, 3, 1])
+        self.assertEqual([v.returncode for v in results], [0] * 4)
+        with open('order.txt') as fp:
+            self.assertEqual(fp.read(), '2031')
+
+    def test_load(self):
+        code = ("import os\n"
+                "open(os.environ['PROFILE'], 'w').close()")
+        cmds = [self.python(code), self.python('...')]
+        r = runner.Runner('PROFILE', 2, multiplex=True)
+        results, out, err = self.run_(r, cmds, ['profile-0.txt', 'profile-1.txt'], load=os.path.abspath)
+        self.assertEqual(results[0].data, os.path.abspath('profile-0.txt'))
+        self.assertIsNone(results[1].data)
+
+    def test_timeout(self):
+        cmds = [self.python('import time; time.sleep(60)'), self.python('...')]
+        r = runner.Runner('PROFILE', 2, timeout=0.5, multiplex=True)
+        # profile of the previous run
+        with open('profile-0.txt', 'w'):
+            pass
+        start = time.perf_counter()
+        results, out, err = self.run_(r, cmds, ['profile-0.txt', 'profile-1.txt'])
+        self.assertLess(time.perf_counter() - start, 30)
+        self.assertFalse(os.path.exists('profile-0.txt'))
+        self.assertTrue(results[0].timed_out)
+        self.assertNotEqual(results[0].returncode, 0)
+        self.assertFalse(results[1].timed_out)
+        self.assertEqual(results[1].returncode, 0)
+        self.assertRegex(err, r'^Timed out after 0\.5 s: ')
+
+    def test_total_timeout(self):
+        cmds = [self.python('import time; time.sleep(60)') for _ in range(3)]
+        r = runner.Runner('PROFILE', 2, total_timeout=0.5, multiplex=True)
+        start = time.perf_counter()
+        results, out, err = self.run_(r, cmds, [f'profile-{i}.txt' for i in range(3)])
+        self.assertLess(time.perf_counter() - start, 30)
+        self.assertTrue(all(v.timed_out for v in results))
+        self.assertEqual([v.worker for v in results], [0, 1, -1])
+        self.assertEqual(err, 'Timed out after 0.5 s\n')
+
+
+class PoolTestCase(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # speaks the protocol of the driver
+        with open('vim.py', 'w') as fp:
+            fp.write(textwrap.dedent("""\
+                import collections
+                import json
+                import os
+                import socket
+                import sys
+
+                host, port = os.environ['PRIMULA_CHANNEL'].rsplit(':', 1)
+                with socket.create_connection((host, int(port))) as sock, sock.makefile('rw') as fp:
+                    msg = {'worker': int(os.environ['PRIMULA_WORKER']), 'dump': len(sys.argv) < 3}
+                    sourced = collections.Counter()
+                    while True:
+                        fp.write(json.dumps([1, msg]) + '\\n')
+                        fp.flush()
+                        _, req = json.loads(fp.readline())
+                        if not req:
+                            break
+                        script, profile = req
+                        sourced[script] += 1
+                        with open(profile, 'w') as pf:
+                            for path, n in sourced.items():
+                                pf.write(f'SCRIPT  {path}\\n'
+                                         f'Sourced {n} times\\n'
+                                         'Total time:   0.000000\\n'
+                                         ' Self time:   0.000000\\n'
+                                         '\\n'
+                                         'count  total (s)   self (s)\\n'
+                                         f'{n:5}              0.000000 echo 1\\n'
+                                         '\\n')
+                        name = os.path.basename(script)
+                        if name == 'exit.vim':
+                            sys.exit(3)
+                        elif name == 'sleep.vim':
+                            __import__('time').sleep(60)
+                        msg = {'errors': ['failed'] if name == 'fail.vim' else []}
+            """))
+
+    def read(self, path):
+        p = core.Profile(path, mapping=False)
+        return {path: s.sourced for path, s in p.scripts.items()}
+
+    def test_pool(self):
+        scripts = ['spam.vim', 'fail.vim', 'spam.vim', 'exit.vim', 'spam.vim']
+        cmds = [[s] for s in scripts]
+        profiles = [f'profile-{i}.txt' for i in range(len(cmds))]
+        r = runner.Pool([sys.executable, 'vim.py'] + [runner.DRIVER], 'PROFILE', 1)
+        results, out, err = self.run_(r, cmds, profiles)
+        self.assertEqual([v.returncode for v in results], [0, 1, 0, 3, 0])
+        self.assertEqual(out, '')
+        self.assertEqual(err, '[1] failed\n')
+        # profiles of each script
+        for path, script in zip(profiles, scripts):
+            self.assertEqual(self.read(path), {os.path.abspath(script): 1})
+
+    def test_timeout(self):
+        cmds = [['sleep.vim'], ['spam.vim']]
+        r = runner.Pool([sys.executable, 'vim.py'] + [runner.DRIVER], 'PROFILE', 1, timeout=0.5)
+        results, out, err = self.run_(r, cmds, ['profile-0.txt', 'profile-1.txt'])
+        self.assertTrue(results[0].timed_out)
+        self.assertEqual(results[1].returncode, 0)
+        self.assertEqual(err, 'Timed out after 0.5 s: sleep.vim\n')
+        self.assertEqual(self.read('profile-1.txt'), {os.path.abspath('spam.vim'): 1})
+
+    def test_unsupported(self):
+        cmds = [['spam.vim']]
+        r = runner.Pool([sys.executable, 'vim.py'] + [runner.DRIVER, 'nodump'], 'PROFILE', 1)
+        with self.assertRaisesRegex(PoolError, r':profile dump'):
+            self.run_(r, cmds, ['profile-0.txt'])
+
+        r = runner.Pool(self.python('import sys; sys.exit(1)'), 'PROFILE', 1)
+        with self.assertRaisesRegex(PoolError, r'Could not connect to Vim'):
+            self.run_(r, cmds, ['profile-0.txt'])
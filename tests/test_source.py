@@ -0,0 +1,55 @@
+#
+# test_source
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+import textwrap
+
+from primula import source
+from base import PrimulaTestCase
+
+
+class SourceTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._dir = self.tempdir()
+        self.root = self._dir.name
+        os.chdir(self.root)
+
+    def tearDown(self):
+        source.clear()
+        os.chdir(self._cwd)
+        self._dir.cleanup()
+
+    def test_get(self):
+        path = 'spam.vim'
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent("""\
+                let s:list = [
+                      \\ 1,
+                      \\ 2]
+                echo s:list
+            """))
+
+        src = source.get(path)
+        self.assertEqual(src.path, path)
+        self.assertEqual(src.lines, ['let s:list = [', '      \\ 1,', '      \\ 2]', 'echo s:list'])
+        self.assertEqual(src.continuations, {2, 3})
+        self.assertIs(source.get(path), src)
+
+        with open(path, 'a') as fp:
+            fp.write('  \\ [0]\n')
+        src = source.get(path)
+        self.assertEqual(len(src.lines), 5)
+        self.assertEqual(src.continuations, {2, 3, 5})
+
+        source.clear()
+        self.assertIsNot(source.get(path), src)
+
+        with self.assertRaises(OSError):
+            source.get('eggs.vim')
@@ -0,0 +1,57 @@
+#
+# test_sqldata
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+
+from primula import sqldata
+from base import PrimulaTestCase
+
+
+class LineDataTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._dir = self.tempdir()
+        self.path = os.path.join(self._dir.name, '.coverage')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_empty(self):
+        data = sqldata.LineData(self.path)
+        self.assertEqual(data.measured_files(), set())
+        self.assertEqual(data.counts('spam.vim'), {})
+        self.assertEqual(data.times('spam.vim'), {})
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_update(self):
+        data = sqldata.LineData(self.path)
+        data.update({
+            'spam.vim': [
+                (1, 1, 2_000, 1_000),
+                (2, -1, -1, -1),
+                (3, 2, -1, 500),
+            ],
+        })
+        self.assertEqual(data.measured_files(), {'spam.vim'})
+        self.assertEqual(data.counts('spam.vim'), {1: 1, 3: 2})
+        self.assertEqual(data.times('spam.vim'), {1: (2e-6, 1e-6), 3: (None, 5e-7)})
+
+        data.update({
+            'spam.vim': [
+                (1, 1, 2_000, 1_000),
+                (2, 3, 1_000, 1_000),
+                (3, 1, 1_000, -1),
+            ],
+            'eggs.vim': [
+                (1, 1, 1_000, 1_000),
+            ],
+        })
+        self.assertEqual(data.measured_files(), {'spam.vim', 'eggs.vim'})
+        self.assertEqual(data.counts('spam.vim'), {1: 2, 2: 3, 3: 3})
+        self.assertEqual(data.times('spam.vim'), {1: (4e-6, 2e-6), 2: (1e-6, 1e-6), 3: (1e-6, 5e-7)})
+        self.assertEqual(data.counts('eggs.vim'), {1: 1})
@@ -0,0 +1,129 @@
+#
+# test_stack
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import io
+import json
+import os
+import textwrap
+
+from primula import core, stack
+from base import PrimulaTestCase
+
+
+class StackTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._dir = self.tempdir()
+        self.script = os.path.join(self._dir.name, 'spam.vim')
+        path = os.path.join(self._dir.name, 'profile.txt')
+        with open(path, 'w') as fp:
+            fp.write(textwrap.dedent(f"""\
+                SCRIPT  {self.script}
+                Sourced 1 time
+                Total time:   0.000100
+                 Self time:   0.000010
+
+                count  total (s)   self (s)
+                    1              0.000001 function! Outer() abort
+                                              let n = 1
+                                                    \\ + 1
+                                              function! Inner() abort
+                                                return 1
+                                              endfunction
+                                            endfunction
+                    1              0.000001 function! Spam() abort
+                                              return 0
+                                            endfunction
+                    1   0.000090   0.000008 call Outer() | call Inner() | call Spam()
+
+                FUNCTION  Outer()
+                    Defined: {self.script}:1
+                Called 1 time
+                Total time:   0.000030
+                 Self time:   0.000030
+
+                count  total (s)   self (s)
+                    1              0.000010   let n = 1 + 1
+                    1              0.000020   function! Inner() abort
+                                                return 1
+                                              endfunction
+
+                FUNCTION  Inner()
+                    Defined: {self.script}:4
+                Called 1 time
+                Total time:   0.000002
+                 Self time:   0.000002
+
+                count  total (s)   self (s)
+                    1              0.000002   return 1
+
+                FUNCTION  Spam()
+                    Defined: {self.script}:8
+                Called 1 time
+                Total time:   0.000000
+                 Self time:   0.000000
+
+                count  total (s)   self (s)
+                    1              0.000000   return 0
+
+                FUNCTION  Ham()
+                Called 1 time
+                Total time:   0.000001
+                 Self time:   0.000001
+
+                count  total (s)   self (s)
+                    1              0.000001   return 0
+
+                FUNCTIONS SORTED ON TOTAL TIME
+            """))
+        self.profile = core.Profile(path, mapping=False)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_iter_stacks(self):
+        script = (self.script, self.script, None)
+        outer = ('Outer()', self.script, 1)
+        self.assertEqual(list(stack.iter_stacks(self.profile)), [
+            ([script], 10000),
+            ([script, outer], 30000),
+            ([script, outer, ('Inner()', self.script, 4)], 2000),
+            ([('Ham()', None, None)], 1000),
+        ])
+
+    def test_write_folded(self):
+        buf = io.StringIO()
+        stack.write_folded(self.profile, buf)
+        self.assertEqual(buf.getvalue(), textwrap.dedent(f"""\
+            {self.script} 10000
+            {self.script};Outer() 30000
+            {self.script};Outer();Inner() 2000
+            Ham() 1000
+        """))
+
+    def test_write_speedscope(self):
+        buf = io.StringIO()
+        stack.write_speedscope(self.profile, buf, 'profile.txt')
+        data = json.loads(buf.getvalue())
+        self.assertEqual(data['shared'], {
+            'frames': [
+                {'name': self.script, 'file': self.script},
+                {'name': 'Outer()', 'file': self.script, 'line': 1},
+                {'name': 'Inner()', 'file': self.script, 'line': 4},
+                {'name': 'Ham()'},
+            ],
+        })
+        self.assertEqual(data['profiles'], [{
+            'type': 'sampled',
+            'name': 'profile.txt',
+            'unit': 'nanoseconds',
+            'startValue': 0,
+            'endValue': 43000,
+            'samples': [[0], [0, 1], [0, 1, 2], [3]],
+            'weights': [10000, 30000, 2000, 1000],
+        }])
@@ -0,0 +1,39 @@
+#
+# test_suite
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+from primula import suite
+from base import PrimulaTestCase
+
+
+class SuiteTestCase(PrimulaTestCase):
+
+    def test_minimize(self):
+        tests = {
+            'spam.vim': {1, 2, 3, 4},
+            'eggs.vim': {1, 2},
+            'ham.vim': {3, 4},
+            'toast.vim': {5},
+            'beans.vim': set(),
+        }
+        costs = dict.fromkeys(tests, 1.0)
+        self.assertEqual(suite.minimize(tests, costs), ['spam.vim', 'toast.vim'])
+        # cheaper tests cover the same lines
+        costs['spam.vim'] = 3.0
+        self.assertEqual(suite.minimize(tests, costs), ['eggs.vim', 'ham.vim', 'toast.vim'])
+        # free tests
+        costs['toast.vim'] = 0.0
+        self.assertEqual(suite.minimize(tests, costs)[0], 'toast.vim')
+        self.assertEqual(suite.minimize({}, {}), [])
+
+    def test_unique(self):
+        tests = {
+            'spam.vim': {1, 2, 3},
+            'eggs.vim': {1, 2},
+            'ham.vim': {4},
+        }
+        self.assertEqual(suite.unique(tests), {'spam.vim': 1, 'eggs.vim': 0, 'ham.vim': 1})
@@ -0,0 +1,48 @@
+#
+# test_timing
+#
+#   Copyright (c) 2026 Akinori Hattori <hattya@gmail.com>
+#
+#   SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+
+from primula import timing
+from base import PrimulaTestCase
+
+
+class TimingsTestCase(PrimulaTestCase):
+
+    def setUp(self):
+        self._dir = self.tempdir()
+        self.path = os.path.join(self._dir.name, 'timings.json')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_timings(self):
+        t = timing.Timings(self.path)
+        self.assertIsNone(t.cost('spam.vim'))
+        self.assertEqual(t.order(['spam.vim', 'eggs.vim']), [0, 1])
+
+        t.update('spam.vim', 1.0, 0.5)
+        t.update('eggs.vim', 3.0)
+        t.save()
+
+        t = timing.Timings(self.path)
+        self.assertEqual(t.wall('spam.vim'), 1.0)
+        self.assertEqual(t.profile('spam.vim'), 0.5)
+        self.assertEqual(t.cost('spam.vim'), 1.0)
+        self.assertEqual(t.wall('eggs.vim'), 3.0)
+        self.assertIsNone(t.profile('eggs.vim'))
+        # unknown costs are the mean
+        self.assertEqual(t.order(['spam.vim', 'ham.vim', 'eggs.vim', 'toast.vim']), [2, 1, 3, 0])
+
+    def test_broken(self):
+        for data in ('', '[]', '{'):
+            with self.subTest(data=data):
+                with open(self.path, 'w') as fp:
+                    fp.write(data)
+                t = timing.Timings(self.path)
+                self.assertIsNone(t.cost('spam.vim'))